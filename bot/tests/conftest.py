@@ -0,0 +1,42 @@
+import pytest
+
+from local_stream import FakeBinanceClient, LocalWebsocketServer, NoneStrategy, SETTINGS, SYMBOL_INFO
+from wenmoon import UserDataStream as user_data_stream_module
+from wenmoon.Config import Config
+from wenmoon.SymbolFilters import SymbolFilters
+from wenmoon.Trader import Trader
+from wenmoon.UserDataStream import UserDataStream
+
+
+@pytest.fixture
+def server():
+    local_server = LocalWebsocketServer()
+    yield local_server
+    local_server.stop()
+
+
+@pytest.fixture
+def client():
+    return FakeBinanceClient()
+
+
+@pytest.fixture
+def stream(monkeypatch, server, client):
+    monkeypatch.setattr(user_data_stream_module, "KEEPALIVE_INTERVAL_S", 0.05)
+    monkeypatch.setattr(user_data_stream_module, "RECONNECT_DELAY_S", 0.05)
+    user_data_stream = UserDataStream(client, server.url)
+    user_data_stream.start()
+    assert server.wait_for_connection() == "/key1"
+    yield user_data_stream
+    user_data_stream.stop()
+
+
+@pytest.fixture
+def trader(tmp_path, monkeypatch, client, stream):
+    settings = tmp_path / "settings.cfg"
+    settings.write_text(SETTINGS)
+    # The trade CSV is written to the working directory
+    monkeypatch.chdir(tmp_path)
+    live_trader = Trader(Config(str(settings)), NoneStrategy(), stream, "BTCUSDT", client)
+    live_trader.symbol_filters = SymbolFilters(SYMBOL_INFO)
+    return live_trader
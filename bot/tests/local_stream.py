@@ -0,0 +1,267 @@
+"""Local websocket server and recording Binance client shared by the live mode tests.
+
+The server is a minimal RFC 6455 implementation on top of socketserver, so no network access or extra packages are
+needed. The Binance client is replaced by a recording fake passed in through the constructors.
+"""
+import base64
+import hashlib
+import json
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Longest time to wait for something to happen on the stream threads
+TIMEOUT_S = 5
+
+SYMBOL_INFO = {
+    "symbol": "BTCUSDT",
+    "baseAsset": "BTC",
+    "quoteAsset": "USDT",
+    "quoteAssetPrecision": 8,
+    "filters": [
+        {"filterType": "PRICE_FILTER", "tickSize": "0.01", "minPrice": "0.01", "maxPrice": "1000000.00"},
+        {"filterType": "LOT_SIZE", "stepSize": "0.00001", "minQty": "0.00001", "maxQty": "9000.00000"},
+        {"filterType": "NOTIONAL", "minNotional": "10.00"}
+    ]
+}
+
+SETTINGS = """[binance_user_config]
+api_key=key
+secret_key=secret
+test_mode=no
+watch_pair_symbol=BTCUSDT
+start_position=fiat
+start_balance=0
+test_fee=0.075
+max_candles=10
+exchange_info_cache=
+"""
+
+
+def wait_for(condition, timeout_s=TIMEOUT_S):
+    """Polls a condition until it holds.
+
+    Args:
+        condition (callable): Returns True once the expected state is reached.
+        timeout_s (float): Longest time to wait in seconds.
+
+    Returns:
+        bool: Whether the condition held before the timeout.
+    """
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def text_frame(message):
+    """Builds an unmasked websocket text frame, as sent by a server.
+
+    Args:
+        message (str): The message text.
+
+    Returns:
+        bytes: The frame.
+    """
+    payload = message.encode()
+    if len(payload) < 126:
+        header = struct.pack(">BB", 0x81, len(payload))
+    elif len(payload) < 2 ** 16:
+        header = struct.pack(">BBH", 0x81, 126, len(payload))
+    else:
+        header = struct.pack(">BBQ", 0x81, 127, len(payload))
+    return header + payload
+
+
+class WebsocketHandler(socketserver.BaseRequestHandler):
+    """Accepts a websocket connection and keeps it open until the client or the test closes it."""
+
+    def handle(self):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            data = self.request.recv(4096)
+            if not data:
+                return
+            request += data
+
+        lines = request.decode().split("\r\n")
+        path = lines[0].split(" ")[1]
+        headers = dict(line.split(": ", 1) for line in lines[1:] if ": " in line)
+        accept = base64.b64encode(hashlib.sha1((headers["Sec-WebSocket-Key"] + WEBSOCKET_GUID).encode()).digest())
+        self.request.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+        self.server.connections.put((path, self.request))
+
+        # Answer a close frame from the client, so it does not wait for the close timeout
+        while True:
+            try:
+                data = self.request.recv(4096)
+            except OSError:
+                return
+            if not data:
+                return
+            if data[0] & 0x0F == 0x8:
+                self.request.sendall(b"\x88\x00")
+                return
+
+
+class LocalWebsocketServer(socketserver.ThreadingTCPServer):
+    """Websocket server on a free local port, sending messages to the newest connection.
+
+    Attributes:
+        connections (queue.Queue): (path, socket) of each connection, in the order they were opened.
+        paths (list of str): Request path of each connection taken from the queue.
+        connection (socket.socket): The newest connection taken from the queue.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), WebsocketHandler)
+        self.connections = queue.Queue()
+        self.paths = []
+        self.connection = None
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        """str: Base url of the server."""
+        return f"ws://127.0.0.1:{self.server_address[1]}"
+
+    def wait_for_connection(self):
+        """Waits for the next connection.
+
+        Returns:
+            str: The request path, e.g. "/<listen key>".
+        """
+        path, self.connection = self.connections.get(timeout=TIMEOUT_S)
+        self.paths.append(path)
+        return path
+
+    def send(self, event):
+        """Sends an event to the newest connection.
+
+        Args:
+            event (dict): The event, sent as JSON.
+        """
+        self.connection.sendall(text_frame(json.dumps(event)))
+
+    def drop(self):
+        """Closes the newest connection without a close frame, like a dropped network connection."""
+        self.connection.shutdown(socket.SHUT_RDWR)
+        self.connection.close()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeBinanceClient:
+    """Records the requests made through the Binance client and answers them like the exchange.
+
+    Attributes:
+        listen_keys (list of str): Listen keys handed out, in order.
+        keepalives (list of str): Listen key of each keepalive request.
+        expired_keys (set of str): Listen keys whose keepalive fails.
+        listen_key_failures (int): Number of listen key requests still to fail.
+        account (dict): Response to get_account.
+        orders (list of tuple): Name and keyword arguments of each order request.
+        order_error (Exception): Raised by market orders (None to fill them).
+        fill_price (float): Price market orders fill at (0 for a buy which fills nothing).
+        order_statuses (dict): Status returned by get_order, by order id.
+    """
+
+    def __init__(self):
+        self.listen_keys = []
+        self.keepalives = []
+        self.expired_keys = set()
+        self.listen_key_failures = 0
+        self.account = {
+            "updateTime": 1,
+            "balances": [
+                {"asset": "BTC", "free": "0.00000000", "locked": "0.00000000"},
+                {"asset": "USDT", "free": "100.00000000", "locked": "0.00000000"}
+            ]
+        }
+        self.orders = []
+        self.order_error = None
+        self.fill_price = 50000.0
+        self.order_statuses = {}
+
+    def get_account(self):
+        return self.account
+
+    def stream_get_listen_key(self):
+        if self.listen_key_failures:
+            self.listen_key_failures -= 1
+            raise ConnectionError("listen key request failed")
+        self.listen_keys.append(f"key{len(self.listen_keys) + 1}")
+        return self.listen_keys[-1]
+
+    def stream_keepalive(self, listen_key):
+        self.keepalives.append(listen_key)
+        if listen_key in self.expired_keys:
+            raise RuntimeError("listen key expired")
+
+    def stream_close(self, listen_key):
+        pass
+
+    def order_market_buy(self, **params):
+        self.orders.append(("order_market_buy", params))
+        if self.order_error:
+            raise self.order_error
+        quote = float(params["quoteOrderQty"])
+        quantity = quote / self.fill_price if self.fill_price else 0.0
+        return {
+            "executedQty": f"{quantity:.8f}",
+            "cummulativeQuoteQty": f"{quote:.8f}",
+            "fills": [{"commission": f"{quantity * 0.001:.8f}", "commissionAsset": "BTC"}]
+        }
+
+    def order_market_sell(self, **params):
+        self.orders.append(("order_market_sell", params))
+        if self.order_error:
+            raise self.order_error
+        quantity = float(params["quantity"])
+        return {"executedQty": params["quantity"], "cummulativeQuoteQty": f"{quantity * self.fill_price:.8f}"}
+
+    def get_order(self, **params):
+        return {"orderId": params["orderId"], "status": self.order_statuses[params["orderId"]]}
+
+    def cancel_order(self, **params):
+        self.orders.append(("cancel_order", params))
+
+
+class NoneStrategy:
+    """Strategy which never trades, the tests place the orders themselves."""
+
+    def scout(self, historical_candles):
+        return "none"
+
+
+def execution_report(**fields):
+    """Builds a raw executionReport event.
+
+    Args:
+        **fields: Raw fields to set, e.g. X="FILLED".
+
+    Returns:
+        dict: The event.
+    """
+    event = {
+        "e": "executionReport", "E": 2, "s": "BTCUSDT", "c": "client", "S": "SELL", "o": "LIMIT_MAKER",
+        "q": "0.50000000", "p": "60000.00", "P": "0.00", "g": -1, "x": "NEW", "X": "NEW", "r": "NONE", "i": 1,
+        "l": "0.00000000", "z": "0.00000000", "L": "0.00", "n": "0", "N": None, "T": 2, "t": -1,
+        "Z": "0.00000000", "Y": "0.00000000"
+    }
+    event.update(fields)
+    return event
@@ -0,0 +1,164 @@
+"""Tests for the live order paths of the Trader, with the user data stream fed by a local websocket server.
+
+Run from the bot directory with: python -m pytest tests
+"""
+import sqlite3
+
+import pytest
+
+from local_stream import execution_report, wait_for
+from wenmoon.Ledger import Ledger
+
+
+def test_live_buy_below_min_notional_does_not_buy(trader, client, stream, server):
+    pytest.importorskip("binance.exceptions")
+    server.send({"e": "outboundAccountPosition", "E": 3, "u": 3, "B": [{"a": "USDT", "f": "5.00000000", "l": "0"}]})
+    assert wait_for(lambda: stream.get_balance("USDT") == 5.0)
+    trader.position = "long"
+
+    assert trader.buy() is False
+    assert trader.position == "short"
+    assert client.orders == []
+
+
+def test_live_buy_holds_quantity_net_of_commission(trader, client):
+    pytest.importorskip("binance.exceptions")
+    assert trader.buy() is True
+    assert client.orders[0][1]["quoteOrderQty"] == "100.00000000"
+    assert trader.entry_quantity == pytest.approx(0.002 * 0.999)
+
+
+def test_live_buy_refused_stays_short(trader, client):
+    exceptions = pytest.importorskip("binance.exceptions")
+    client.order_error = exceptions.BinanceAPIException(None, 400, '{"code": -2010, "msg": "Insufficient balance"}')
+    trader.position = "long"
+
+    assert trader.buy() is False
+    assert trader.position == "short"
+    assert trader.entry_quantity == 0.0
+
+
+def test_live_buy_filling_nothing_stays_short(trader, client):
+    pytest.importorskip("binance.exceptions")
+    client.fill_price = 0.0
+    trader.position = "long"
+
+    assert trader.buy() is False
+    assert trader.position == "short"
+    assert trader.buy_count == 0
+
+
+def test_live_sell_sells_quantity_locked_by_oco(trader, client, stream, server):
+    pytest.importorskip("binance.exceptions")
+    # The OCO locks the coin, so the free balance does not show it until the cancel is reported
+    server.send({"e": "outboundAccountPosition", "E": 3, "u": 3, "B": [{"a": "BTC", "f": "0", "l": "0.50000000"}]})
+    assert wait_for(lambda: stream.balances["BTC"]["locked"] == 0.5)
+    trader.entry_quantity = 0.5
+    trader.oco_order_list_id = 3
+    trader.oco_order_ids = [11, 12]
+
+    assert trader.sell() is True
+    assert [name for name, params in client.orders] == ["cancel_order", "order_market_sell"]
+    assert client.orders[1][1]["quantity"] == "0.50000"
+    assert trader.entry_quantity == 0.0
+
+
+def test_live_sell_failure_stays_long(trader, client):
+    exceptions = pytest.importorskip("binance.exceptions")
+    client.order_error = exceptions.BinanceAPIException(None, 400, '{"code": -2010, "msg": "Insufficient balance"}')
+    trader.entry_quantity = 0.5
+    trader.position = "short"
+
+    assert trader.sell() is False
+    assert trader.position == "long"
+    assert trader.entry_quantity == 0.5
+
+
+def test_live_sell_below_min_quantity_stays_long(trader, client):
+    pytest.importorskip("binance.exceptions")
+    trader.entry_quantity = 0.000001
+    trader.position = "short"
+
+    assert trader.sell() is False
+    assert trader.position == "long"
+    assert client.orders == []
+
+
+def test_oco_fill_closes_position(trader, server):
+    trader.position = "long"
+    trader.entry_quantity = 0.5
+    trader.oco_order_list_id = 3
+    trader.oco_order_ids = [11, 12]
+
+    server.send(execution_report(i=11, g=3, x="TRADE", X="FILLED", l="0.50000000", z="0.50000000", L="60000.00"))
+    assert wait_for(lambda: trader.position == "short")
+    assert trader.entry_quantity == 0.0
+    assert trader.oco_order_list_id is None
+
+
+def restored_long_state(trader, entry_quantity=0.5):
+    """Gets a snapshot of the trader holding a long position protected by an OCO."""
+    trader.position = "long"
+    trader.entry_quantity = entry_quantity
+    trader.oco_order_list_id = 3
+    trader.oco_order_ids = [11, 12]
+    return trader.get_state()
+
+
+def hold_coin(stream, server, quantity):
+    """Reports an account holding the coin, locked by the OCO."""
+    server.send({"e": "outboundAccountPosition", "E": 3, "u": 3, "B": [{"a": "BTC", "f": "0", "l": str(quantity)}]})
+    assert wait_for(lambda: stream.get_total_balance("BTC") == quantity)
+
+
+def test_restore_keeps_open_oco_and_position(trader, client, stream, server):
+    pytest.importorskip("binance.exceptions")
+    hold_coin(stream, server, 0.5)
+    client.order_statuses = {11: "NEW", 12: "NEW"}
+
+    trader.set_state(restored_long_state(trader), None)
+    assert trader.position == "long"
+    assert trader.entry_quantity == 0.5
+    assert trader.oco_order_list_id == 3
+
+
+def test_restore_drops_oco_filled_while_stopped(trader, client):
+    pytest.importorskip("binance.exceptions")
+    client.order_statuses = {11: "FILLED", 12: "EXPIRED"}
+
+    trader.set_state(restored_long_state(trader), None)
+    assert trader.position == "short"
+    assert trader.entry_quantity == 0.0
+    assert trader.oco_order_list_id is None
+
+
+def test_restore_drops_position_no_longer_held(trader, client):
+    pytest.importorskip("binance.exceptions")
+    client.order_statuses = {11: "CANCELED", 12: "CANCELED"}
+
+    trader.set_state(restored_long_state(trader), None)
+    assert trader.position == "short"
+    assert trader.oco_order_list_id is None
+
+
+def test_restore_caps_position_at_account_coin(trader, client, stream, server):
+    pytest.importorskip("binance.exceptions")
+    hold_coin(stream, server, 0.2)
+    client.order_statuses = {11: "NEW", 12: "NEW"}
+
+    trader.set_state(restored_long_state(trader), None)
+    assert trader.position == "long"
+    assert trader.entry_quantity == 0.2
+
+
+def test_live_trades_record_positions(trader, tmp_path):
+    pytest.importorskip("binance.exceptions")
+    trader.ledger = Ledger(str(tmp_path / "ledger.sqlite"))
+
+    assert trader.buy() is True
+    assert trader.sell() is True
+    trader.ledger.close()
+
+    with sqlite3.connect(trader.ledger.path) as connection:
+        rows = connection.execute("SELECT position, coin_balance FROM positions ORDER BY rowid").fetchall()
+    assert rows == [("long", pytest.approx(0.002 * 0.999)), ("short", 0.0)]
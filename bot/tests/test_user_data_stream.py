@@ -0,0 +1,69 @@
+"""Tests for the user data stream, against a local websocket server.
+
+Run from the bot directory with: python -m pytest tests
+"""
+from local_stream import execution_report, wait_for
+
+
+def test_start_loads_balances(stream):
+    assert stream.get_balance("USDT") == 100.0
+    assert stream.get_balance("ETH") == 0.0
+
+
+def test_keepalive_pings_listen_key(stream, client):
+    assert wait_for(lambda: len(client.keepalives) >= 2)
+    assert set(client.keepalives) == {"key1"}
+
+
+def test_failed_keepalive_reconnects_with_new_listen_key(stream, server, client):
+    client.expired_keys.add("key1")
+    assert server.wait_for_connection() == "/key2"
+    assert stream.listen_key == "key2"
+
+
+def test_keepalive_retries_failed_listen_key_renewal(stream, server, client):
+    client.listen_key_failures = 2
+    client.expired_keys.add("key1")
+    assert server.wait_for_connection() == "/key2"
+    assert client.listen_key_failures == 0
+
+
+def test_account_position_updates_balances(stream, server):
+    server.send({
+        "e": "outboundAccountPosition", "E": 3, "u": 3,
+        "B": [{"a": "BTC", "f": "0.10000000", "l": "0.40000000"}, {"a": "USDT", "f": "5.00000000", "l": "0.0"}]
+    })
+    assert wait_for(lambda: stream.last_update_time_ms == 3)
+    assert stream.balances["BTC"] == {"free": 0.1, "locked": 0.4}
+    assert stream.get_balance("USDT") == 5.0
+
+
+def test_execution_report_updates_orders_and_listeners(stream, server):
+    reports = []
+    fills = []
+    stream.order_listeners.append(reports.append)
+    stream.fill_listeners.append(fills.append)
+
+    server.send(execution_report(i=7))
+    server.send(execution_report(i=7, x="TRADE", X="FILLED", l="0.50000000", z="0.50000000", L="60000.00"))
+    assert wait_for(lambda: len(reports) == 2)
+
+    assert stream.get_order(7)["order_status"] == "FILLED"
+    assert [fill["last_executed_quantity"] for fill in fills] == [0.5]
+
+
+def test_reconnects_after_server_drops(stream, server):
+    server.drop()
+    assert server.wait_for_connection() == "/key1"
+
+    # The new connection still updates the cache
+    server.send({"e": "balanceUpdate", "E": 4, "a": "USDT", "d": "10.00000000", "T": 4})
+    assert wait_for(lambda: stream.get_balance("USDT") == 110.0)
+
+
+def test_reconnect_reloads_balances(stream, server, client):
+    # A fill while the stream is down is only seen through the account request
+    client.account["balances"][1]["free"] = "80.00000000"
+    server.drop()
+    assert server.wait_for_connection() == "/key1"
+    assert stream.get_balance("USDT") == 80.0
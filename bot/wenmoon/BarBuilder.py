@@ -0,0 +1,143 @@
+from datetime import datetime, timezone
+
+BAR_TYPES = ("tick", "volume", "dollar")
+
+
+class BarBuilder:
+    """Builds information driven bars from the aggregate trade stream.
+
+    A bar closes once the running total of its measure reaches the bar size:
+
+    - tick bars count aggregate trades,
+    - volume bars sum the coin quantity traded,
+    - dollar bars sum the fiat (quote) value traded.
+
+    Closed bars use the same candle layout as format_historical_candle, so strategies can consume them unchanged.
+    Each bar also gets a bar_number, as several bars can start in the same ms (see candle_order_key).
+    The running totals are plain attributes and each trade is a handful of additions, so the builder keeps up with
+    peak trade rates. A single trade larger than the bar size closes the bar on its own; trades are never split.
+
+    See the following link for the aggregate trade stream:
+    https://github.com/binance/binance-spot-api-docs/blob/master/web-socket-streams.md#aggregate-trade-streams
+
+    Attributes:
+        bar_type (str): The bar type (options: "tick", "volume", "dollar").
+        bar_size (float): The measure at which a bar closes.
+        bar_count (int): Number of bars closed so far.
+    """
+    __slots__ = ("bar_type", "bar_size", "bar_count", "measure_type", "total", "start_time_ms", "open_price",
+                 "high_price", "low_price", "close_price", "volume", "quote_volume", "number_of_trades",
+                 "taker_buy_volume", "taker_buy_quote_volume")
+
+    def __init__(self, bar_type, bar_size):
+        """Initialise the bar builder.
+
+        Args:
+            bar_type (str): The bar type (options: "tick", "volume", "dollar").
+            bar_size (float): The number of trades, coin volume or fiat volume at which a bar closes.
+        """
+        if bar_type not in BAR_TYPES:
+            raise ValueError(f"Supplied bar type is invalid, required one of {BAR_TYPES}")
+        self.bar_type = bar_type
+        self.bar_size = bar_size
+        self.bar_count = 0
+        self.measure_type = BAR_TYPES.index(bar_type)
+        self.reset()
+
+    def reset(self):
+        """Starts a new, empty bar."""
+        self.total = 0.0
+        self.start_time_ms = None
+        self.open_price = 0.0
+        self.high_price = 0.0
+        self.low_price = 0.0
+        self.close_price = 0.0
+        self.volume = 0.0
+        self.quote_volume = 0.0
+        self.number_of_trades = 0
+        self.taker_buy_volume = 0.0
+        self.taker_buy_quote_volume = 0.0
+
+    def add_trade(self, price, quantity, trade_time_ms, trade_count=1, is_buyer_maker=False):
+        """Adds an aggregate trade to the current bar.
+
+        Args:
+            price (float): Trade price.
+            quantity (float): Coin quantity traded.
+            trade_time_ms (int): Trade time in ms.
+            trade_count (int): Number of trades in the aggregate trade.
+            is_buyer_maker (bool): True if the seller was the taker.
+
+        Returns:
+            dict: The closed bar if this trade closed it, otherwise None.
+        """
+        quote = price * quantity
+
+        if self.start_time_ms is None:
+            self.start_time_ms = trade_time_ms
+            self.open_price = self.high_price = self.low_price = price
+        elif price > self.high_price:
+            self.high_price = price
+        elif price < self.low_price:
+            self.low_price = price
+
+        self.close_price = price
+        self.volume += quantity
+        self.quote_volume += quote
+        self.number_of_trades += trade_count
+        if not is_buyer_maker:
+            self.taker_buy_volume += quantity
+            self.taker_buy_quote_volume += quote
+
+        if self.measure_type == 0:
+            self.total += 1
+        elif self.measure_type == 1:
+            self.total += quantity
+        else:
+            self.total += quote
+
+        if self.total < self.bar_size:
+            return None
+
+        bar = self.close_bar(trade_time_ms)
+        self.reset()
+        return bar
+
+    def add_agg_trade(self, msg):
+        """Adds a raw aggregate trade message from the websocket.
+
+        Args:
+            msg (dict): The raw aggTrade message.
+
+        Returns:
+            dict: The closed bar if this trade closed it, otherwise None.
+        """
+        return self.add_trade(float(msg["p"]), float(msg["q"]), msg["T"], msg["l"] - msg["f"] + 1, msg["m"])
+
+    def close_bar(self, close_time_ms):
+        """Builds the candle for the current bar.
+
+        Args:
+            close_time_ms (int): Time of the final trade in ms.
+
+        Returns:
+            dict: Human readable candle data.
+        """
+        self.bar_count += 1
+        return {
+            "candle_start_time_ms": self.start_time_ms,
+            "candle_start_time": str(datetime.fromtimestamp(self.start_time_ms/1000, tz=timezone.utc)),
+            "open_price": self.open_price,
+            "high_price": self.high_price,
+            "low_price": self.low_price,
+            "close_price": self.close_price,
+            "volume": self.volume,
+            "candle_close_time_ms": close_time_ms,
+            "candle_close_time": str(datetime.fromtimestamp(close_time_ms/1000, tz=timezone.utc)),
+            "quote_asset_volume": self.quote_volume,
+            "number_of_trades": self.number_of_trades,
+            "taker_buy_base_asset_volume": self.taker_buy_volume,
+            "taker_buy_quote_asset_volume": self.taker_buy_quote_volume,
+            "interval": f"{self.bar_type}:{self.bar_size:g}",
+            "bar_number": self.bar_count
+        }
@@ -1,7 +1,10 @@
 import json
-from binance import Client
-from wenmoon.bot_utils import format_websocket_result, format_historical_candles, calculate_start_date
+import time
+from wenmoon.bot_utils import format_websocket_result, format_historical_candles, calculate_start_date, \
+    interval_to_milliseconds, strategy_lookback, candle_buffer_length
 from wenmoon.Trader import Trader
+from wenmoon.Resampler import TimeframeFeed
+from wenmoon.BarBuilder import BarBuilder
 
 
 class Bot:
@@ -15,11 +18,28 @@ class Bot:
         candles (list of dict): The most recent list of closed historic candles.
         strategy (class): The class definition for the chosen strategy.
         newest_candle (dict): The most recent candle from the websocket.
+        symbol (str): The symbol pair being traded.
         symbol_info (dict): Information about the symbol being traded; rules, filters etc.
-        trader (Trader): Instance of the trader class.
+        trader (Trader): Instance of the trader class (or a portfolio view with the same set_position method).
+        archive (CandleArchive): On-disk archive of closed candles (None if archive_dir is not set).
+        timeframes (TimeframeFeed): Builds higher interval candles from the closed candles of this bot.
+        timeframe_candles (dict): Closed candle buffer for each higher interval.
+        timeframe_traders (dict): Trader for each higher interval.
+        bar_builder (BarBuilder): Builds tick, volume or dollar bars from trades (None for time bars).
+        provisional (bool): Whether the strategy is evaluated on the candle in progress (needs a strategy with
+            prime, update and peek methods, and a trader with set_provisional_position).
+        provisional_interval_s (float): Minimum time between provisional evaluations in seconds.
+        last_provisional_time (float): Monotonic time of the most recent provisional evaluation.
+        trigger_levels (TriggerLevels): Price bands for the candle in progress, for strategies which publish them.
+        max_candles (int): Number of closed candles fetched and kept, sized from the strategy's lookback unless set
+            in the config.
+        timeframe_max_candles (dict): Number of closed candles fetched and kept for each higher interval.
+        candle_cache (dict): Most recently fetched historical candles for each (symbol, interval), shared by the bots
+            in this process (None to not share).
     """
 
-    def __init__(self, config, strategy, binance_client):
+    def __init__(self, config, strategy, binance_client, user_data_stream=None, symbol=None, trader=None,
+                 candle_cache=None):
         """Initialise the bot.
 
         This class handles the connections to the binance API, including websockets for live data, and client for
@@ -27,7 +47,7 @@ class Bot:
 
         It also feeds this data to the Trader object, where a decision is made on the current position.
 
-        When the Bot is initialised, it is logged in using the API credentials, and historical candle data is requested.
+        Historical candle data is requested when the websocket first starts, after that only missing candles are fetched.
 
         Note: Requests made to the normal binance api are subject to limits, websockets are not limited.
 
@@ -35,16 +55,152 @@ class Bot:
             config: An instance of the configuration class, which should already be initialised.
             strategy: A class definition for the strategy to be used.
             binance_client: Instance of the Binance client, used for getting historical data and placing orders.
+            user_data_stream (UserDataStream): Balance and order cache for live mode (None in test mode).
+            symbol (str): The symbol pair to trade, defaults to watch_pair_symbol from the config.
+            trader: Trader to use instead of a new Trader, e.g. a view on a shared PortfolioTrader.
+            candle_cache (dict): Historical candles shared by the bots in this process (None to not share).
 
         """
         self.config = config
         self.binance_client = binance_client
-        self.candles = None
+        self.candles = []
         self.strategy = strategy
         self.newest_candle = None
+        self.symbol = symbol or config.watch_symbol_pair
         self.symbol_info = None
-        self.trader = Trader(config, strategy)
-        self.get_historical_candles()
+        self.trader = trader or Trader(config, strategy, user_data_stream, self.symbol, binance_client)
+        self.archive = None
+        if config.archive_dir:
+            # Imported here as the archive needs NumPy, which is slow to import and not needed otherwise
+            from wenmoon.CandleArchive import CandleArchive
+            self.archive = CandleArchive(config.archive_dir, self.symbol, config.interval, config.bar_type,
+                                         config.bar_size)
+        self.timeframes = TimeframeFeed()
+        self.timeframe_candles = {}
+        self.timeframe_traders = {}
+        self.bar_builder = BarBuilder(config.bar_type, config.bar_size) if config.bar_type != "time" else None
+        self.provisional = config.provisional and hasattr(strategy, "peek") and \
+            hasattr(self.trader, "set_provisional_position")
+        self.provisional_interval_s = 1 / config.provisional_hz if config.provisional_hz else 0.0
+        self.last_provisional_time = 0.0
+        self.trigger_levels = None
+        self.max_candles = self.size_candle_buffer(strategy, self.symbol)
+        self.timeframe_max_candles = {}
+        self.candle_cache = candle_cache
+
+    def size_candle_buffer(self, strategy, name):
+        """Gets the candle buffer length for a strategy, warning when the configured length is too short.
+
+        Args:
+            strategy (Strategy): The strategy the candles are for.
+            name (str): Name of the candle series for the warning, e.g. the symbol.
+
+        Returns:
+            int: Candle buffer length.
+        """
+        max_candles = candle_buffer_length(strategy, self.config.max_candles)
+        minimum, converged = strategy_lookback(strategy)
+        if minimum and max_candles < minimum:
+            print(f"Warning: {name} max_candles={max_candles} is shorter than the {minimum} candles the strategy "
+                  f"needs, set max_candles=0 to size it automatically")
+        elif converged and max_candles < converged:
+            print(f"Warning: {name} max_candles={max_candles} is shorter than the {converged} candles the strategy "
+                  f"needs for its indicators to converge, signals depend on where the buffer starts")
+        print(f"{name}: keeping {max_candles} candles")
+        return max_candles
+
+    def set_strategy(self, strategy):
+        """Swaps in a new strategy, e.g. after the settings are reloaded, keeping the candle buffer.
+
+        If the new strategy needs more candles than are stored, the buffer grows as new candles close.
+
+        Args:
+            strategy (Strategy): The new strategy.
+        """
+        self.strategy = strategy
+        self.max_candles = self.size_candle_buffer(strategy, self.symbol)
+        if len(self.candles) > self.max_candles:
+            del self.candles[:-self.max_candles]
+        self.trader.set_strategy(strategy, self.max_candles, self.candles)
+
+        self.provisional = self.config.provisional and hasattr(strategy, "peek") and \
+            hasattr(self.trader, "set_provisional_position")
+        self.trigger_levels = None
+        if self.provisional and self.candles:
+            self.prime_strategy()
+
+    def set_timeframe_strategy(self, interval, strategy):
+        """Swaps in a new strategy for a higher interval, keeping its candle buffer.
+
+        Args:
+            interval (str): The higher interval, e.g. "1h".
+            strategy (Strategy): The new strategy.
+        """
+        max_candles = self.size_candle_buffer(strategy, f"{self.symbol}@{interval}")
+        self.timeframe_max_candles[interval] = max_candles
+        candles = self.timeframe_candles[interval]
+        if len(candles) > max_candles:
+            del candles[:-max_candles]
+        self.timeframe_traders[interval].set_strategy(strategy, max_candles, candles)
+
+    def refresh_settings(self):
+        """Applies reloaded settings which are held outside the config, the provisional rate and exit prices."""
+        self.provisional_interval_s = 1 / self.config.provisional_hz if self.config.provisional_hz else 0.0
+        for trader in [self.trader, *self.timeframe_traders.values()]:
+            if hasattr(trader, "refresh_exits"):
+                trader.refresh_exits()
+
+    def get_state(self):
+        """Gets the candle buffers, the higher interval candles in progress and the traders' state for a snapshot.
+
+        A portfolio view trader is left out, the portfolio is snapshotted once for all of its bots.
+
+        Returns:
+            dict: Picklable bot state.
+        """
+        return {
+            "symbol": self.symbol,
+            "candles": self.candles,
+            "candle_type": (self.config.interval, self.config.bar_type, self.config.bar_size),
+            "timeframe_candles": self.timeframe_candles,
+            "timeframe_current": {
+                interval: resampler.current for interval, resampler in self.timeframes.resamplers.items()
+            },
+            "trader": self.trader.get_state() if hasattr(self.trader, "get_state") else None,
+            "timeframe_traders": {
+                interval: trader.get_state() for interval, trader in self.timeframe_traders.items()
+            }
+        }
+
+    def set_state(self, snapshot):
+        """Restores the state from a snapshot taken by get_state, before the websocket starts.
+
+        With candles restored, start only fetches the candles which closed since the snapshot and replays them, as
+        after a reconnect. Candles of a different pair, interval or bar type are not restored.
+
+        Args:
+            snapshot (dict): Bot state from get_state.
+        """
+        candle_type = (self.config.interval, self.config.bar_type, self.config.bar_size)
+        if (snapshot["symbol"], snapshot["candle_type"]) != (self.symbol, candle_type):
+            print(f"{self.symbol}: snapshot is for other candles, getting full history")
+            return
+
+        self.candles = snapshot["candles"][-self.max_candles:]
+        if snapshot["trader"] is not None:
+            self.trader.set_state(snapshot["trader"], self.candles)
+
+        for interval, trader in self.timeframe_traders.items():
+            if interval not in snapshot["timeframe_candles"]:
+                continue
+            candles = snapshot["timeframe_candles"][interval][-self.timeframe_max_candles[interval]:]
+            self.timeframe_candles[interval] = candles
+            self.timeframes.resamplers[interval].current = snapshot["timeframe_current"][interval]
+            trader.set_state(snapshot["timeframe_traders"][interval], candles)
+
+        if self.provisional and self.candles:
+            self.prime_strategy()
+        print(f"{self.symbol}: restored {len(self.candles)} candles from the snapshot")
 
     def get_historical_candles(self):
         """Gets the historic price candle data from the binance api.
@@ -54,22 +210,97 @@ class Bot:
         The documentation for the returned candle data at this endpoint can be found at the following link:
         https://github.com/binance/binance-public-data/#klines
         """
+        # Another bot on the same pair and interval may have fetched enough recent candles already
+        key = (self.symbol, self.config.interval)
+        cached = self.candle_cache.get(key) if self.candle_cache is not None else None
+        interval_ms = interval_to_milliseconds(self.config.interval)
+        if cached and len(cached) >= self.max_candles and \
+                int(time.time() * 1000) - cached[-1]["candle_close_time_ms"] < interval_ms:
+            self.candles = cached[-self.max_candles:]
+            print("Historical candle data taken from the shared cache")
+            return
+
         print("Getting historical candle data")
         # Calculate time to query for
         start_time = calculate_start_date(
-            self.config.interval_number * self.config.max_candles,
+            self.config.interval_number * self.max_candles,
             self.config.interval_unit
         )
         # Get the candles as a generator
         historical_candles = self.binance_client.get_historical_klines_generator(
-            symbol=self.config.watch_symbol_pair,
+            symbol=self.symbol,
             interval=self.config.interval,
             start_str=str(start_time.timestamp())
         )
 
         self.candles = format_historical_candles(historical_candles)
+        if self.candle_cache is not None and len(self.candles) >= len(cached or []):
+            self.candle_cache[key] = list(self.candles)
         print("Historical candle data received")
 
+    def add_timeframe(self, interval, trader):
+        """Runs a trader on a higher interval, built locally from this bot's candle stream.
+
+        Args:
+            interval (str): The higher interval, e.g. "1h". Must be a multiple of the bot interval.
+            trader (Trader): Trader (with its own strategy) for the higher interval.
+        """
+        self.timeframe_traders[interval] = trader
+        trader.name = f"{self.config.name or self.symbol}@{interval}"
+        self.timeframe_candles[interval] = []
+        self.timeframe_max_candles[interval] = self.size_candle_buffer(trader.strategy, f"{self.symbol}@{interval}")
+        self.timeframes.subscribe(interval, lambda candle: self.add_timeframe_candle(interval, candle))
+
+    def get_timeframe_history(self, interval):
+        """Gets the historic candles for a higher interval and lines its resampler up with the bot candles.
+
+        The candle currently in progress on the higher interval is rebuilt from the bot's candles since it started,
+        so it is complete when it closes. The bot's buffer is sized for its own strategy and may start after the
+        higher interval candle did (e.g. a 12h candle over 1m candles), the missing base candles are then fetched.
+
+        Args:
+            interval (str): The higher interval, e.g. "1h".
+        """
+        start_ms = int(time.time() * 1000) - interval_to_milliseconds(interval) * self.timeframe_max_candles[interval]
+        candles = format_historical_candles(self.binance_client.get_historical_klines_generator(
+            symbol=self.symbol,
+            interval=interval,
+            start_str=start_ms
+        ))
+        self.timeframe_candles[interval] = candles
+
+        resampler = self.timeframes.resamplers[interval]
+        resampler.current = None
+        newest_close_ms = candles[-1]["candle_close_time_ms"] if candles else 0
+        base_candles = self.candles
+        if candles and self.candles and self.candles[0]["candle_start_time_ms"] > newest_close_ms + 1:
+            newest_base_ms = self.candles[-1]["candle_start_time_ms"]
+            base_candles = [
+                candle for candle in format_historical_candles(self.binance_client.get_historical_klines_generator(
+                    symbol=self.symbol,
+                    interval=self.config.interval,
+                    start_str=newest_close_ms + 1
+                ))
+                if candle["candle_start_time_ms"] <= newest_base_ms
+            ]
+        for candle in base_candles:
+            if candle["candle_start_time_ms"] > newest_close_ms:
+                candles.extend(resampler.update(candle))
+
+    def add_timeframe_candle(self, interval, candle):
+        """Stores a closed higher interval candle and gives it to the trader for that interval.
+
+        Args:
+            interval (str): The higher interval, e.g. "1h".
+            candle (dict): Human readable closed candle.
+        """
+        candles = self.timeframe_candles[interval]
+        candles.append(candle)
+        if len(candles) > self.timeframe_max_candles[interval]:
+            candles.pop(0)
+
+        self.timeframe_traders[interval].set_position(candles)
+
     def handle_websocket_message(self, msg):
         """When a websocket message is received, this function is called.
 
@@ -82,11 +313,19 @@ class Bot:
         https://github.com/binance/binance-spot-api-docs/blob/master/web-socket-streams.md#klinecandlestick-streams
 
         Args:
-            msg (dict): A dictionary containing the candle data
+            msg (str): The raw kline message received from the websocket.
 
         """
+        self.handle_kline(json.loads(msg))
 
-        candle = format_websocket_result(json.loads(msg))
+    def handle_kline(self, data):
+        """Handles a decoded kline message, either from a single or a combined stream.
+
+        Args:
+            data (dict): A dictionary containing the raw candle data.
+
+        """
+        candle = format_websocket_result(data)
 
         # Store the recent candle
         self.newest_candle = candle
@@ -96,37 +335,175 @@ class Bot:
             print("Error: websocket connection issue")
         else:
             # For normal messages
-            if candle["is_candle_closed"]:
-                # Update historical candles
-                self.add_new_candle(candle)
-
-                # Print the candle data if requested in the config
-                if self.config.output_candles:
-                    print(self.candles[-1])
-                        # print("To stop candles output, enter 'c'")
-
-                # Give the trader the new candle data and take action if required
-                self.trader.set_position(self.candles)
+            if candle["is_candle_closed"] and not self.is_known_candle(candle):
+                self.process_closed_candle(candle)
+            elif self.provisional and not candle["is_candle_closed"]:
+                self.evaluate_provisional(candle)
 
             if self.config.output_websocket:
                 print(candle)
                 # print("To stop the websocket output, enter 'w'")
 
+    def handle_agg_trade(self, data):
+        """Handles a decoded aggregate trade message when trading tick, volume or dollar bars.
+
+        Args:
+            data (dict): A dictionary containing the raw aggregate trade data.
+
+        """
+        bar = self.bar_builder.add_agg_trade(data)
+        if bar:
+            self.process_closed_candle(bar)
+
+    def evaluate_provisional(self, candle):
+        """Evaluates the strategy as if the candle in progress closed now, and lets the trader act on the signal.
+
+        If the strategy publishes trigger levels, the price is only compared with them, on every update. Otherwise
+        the strategy peeks at its incremental indicator state, throttled to provisional_hz. Either way the committed
+        candles and indicators are not changed and nothing is recalculated over the candle buffer.
+
+        Args:
+            candle (dict): Human readable candle data for the candle in progress.
+        """
+        if self.trigger_levels is not None:
+            recommended_action = self.trigger_levels.check(candle["close_price"])
+            if recommended_action != "none":
+                print(f"Provisional action: {recommended_action} ({self.trigger_levels})")
+                # The levels hold until the candle closes, so only act on the first crossing
+                self.trigger_levels = None
+                self.trader.set_provisional_position(candle, recommended_action)
+            return
+
+        now = time.monotonic()
+        if now - self.last_provisional_time < self.provisional_interval_s or not self.candles:
+            return
+        self.last_provisional_time = now
+
+        recommended_action = self.strategy.peek(candle)
+        if recommended_action != "none":
+            print(f"Provisional action: {recommended_action}")
+            self.trader.set_provisional_position(candle, recommended_action)
+
+    def prime_strategy(self):
+        """Rebuilds the strategy's incremental indicator state from the stored candles."""
+        self.strategy.prime(self.candles)
+        self.update_trigger_levels()
+
+    def update_trigger_levels(self):
+        """Gets the trigger levels for the next candle from the strategy, if it publishes them."""
+        if hasattr(self.strategy, "trigger_levels"):
+            self.trigger_levels = self.strategy.trigger_levels()
+
+    def process_closed_candle(self, candle):
+        """Stores a closed candle (or bar) and gives the trader the new candle data.
+
+        Args:
+            candle (dict): Human readable closed candle data.
+
+        """
+        # Update historical candles
+        self.add_new_candle(candle)
+
+        # Print the candle data if requested in the config
+        if self.config.output_candles:
+            print(self.candles[-1])
+            # print("To stop candles output, enter 'c'")
+
+        # Bars are built from live trades only, so wait until there are enough of them
+        if len(self.candles) < self.max_candles and self.bar_builder:
+            print(f"Warming up: {len(self.candles)}/{self.max_candles} bars")
+            return
+
+        # Give the trader the new candle data and take action if required
+        self.trader.set_position(self.candles)
+
     def start(self):
         """This function is called whenever the websocket connection starts.
 
-        A start can happen at the initial running of the bot, or after an error.
+        A start can happen at the initial running of the bot, or after an error. On the first start the full candle
+        history is fetched, unless the candles were restored from a snapshot. After a reconnect or a restore only the
+        candles missed since are fetched and replayed.
         """
+        if self.bar_builder:
+            # There is no history for trade driven bars, the buffer fills from the live trades
+            return
+
+        if not self.candles:
+            self.get_historical_candles()
+            for interval in self.timeframe_traders:
+                self.get_timeframe_history(interval)
+            if self.provisional:
+                self.prime_strategy()
+
+            # Ensure we are in the correct position
+            self.trader.set_position(self.candles)
+        else:
+            # Higher intervals added since a restored snapshot still need their history
+            for interval, candles in self.timeframe_candles.items():
+                if not candles:
+                    self.get_timeframe_history(interval)
+            self.repair_gap()
 
-        # Delete old candle data (we might be missing a few) and get historical candles
-        self.candles = []
-        self.get_historical_candles()
+    def repair_gap(self):
+        """Fetches the candles which closed while the websocket was disconnected and replays them in order.
 
-        # Ensure we are in the correct position (in the case of a restart we might have missed a buy/sell signal)
-        self.trader.set_position(self.candles)
+        Each recovered candle is passed to the trader as if it had arrived from the websocket, so no buy/sell signal
+        is missed. If the bot was disconnected for longer than the candle buffer, the full history is fetched instead.
+
+        Returns:
+            int: Number of candles recovered.
+        """
+        newest_close_ms = self.candles[-1]["candle_close_time_ms"]
+        missed_ms = int(time.time() * 1000) - newest_close_ms
+        interval_ms = interval_to_milliseconds(self.config.interval)
+
+        # Nothing can have closed since the newest stored candle
+        if missed_ms < interval_ms:
+            return 0
+
+        if missed_ms > interval_ms * self.max_candles:
+            print("Disconnected for longer than the candle buffer, getting full history")
+            self.candles = []
+            self.get_historical_candles()
+            for interval in self.timeframe_traders:
+                self.get_timeframe_history(interval)
+            if self.provisional:
+                self.prime_strategy()
+            self.trader.set_position(self.candles)
+            return len(self.candles)
+
+        print(f"Getting candles missed since {self.candles[-1]['candle_close_time']}")
+        missed_candles = format_historical_candles(self.binance_client.get_historical_klines_generator(
+            symbol=self.symbol,
+            interval=self.config.interval,
+            start_str=newest_close_ms + 1
+        ))
+
+        recovered = 0
+        for candle in missed_candles:
+            # The websocket may have delivered some of these already
+            if self.is_known_candle(candle):
+                continue
+            self.add_new_candle(candle)
+            self.trader.set_position(self.candles)
+            recovered += 1
+
+        print(f"Recovered {recovered} missed candles")
+        return recovered
+
+    def is_known_candle(self, candle):
+        """Checks whether a closed candle is already stored (or older than the newest stored candle).
+
+        Args:
+            candle (dict): Human readable candle data.
+
+        Returns:
+            bool: True if the candle should be ignored.
+        """
+        return bool(self.candles) and candle["candle_start_time_ms"] <= self.candles[-1]["candle_start_time_ms"]
 
     def add_new_candle(self, candle):
-        """Adds the newest candle from the websocket and deletes the oldest one.
+        """Adds the newest candle from the websocket and deletes the oldest one once the buffer is full.
 
         The formats for the historical klines and websocket klines are slightly different, however the OHLC is
         the same for both.
@@ -137,5 +514,18 @@ class Bot:
         # Add the new candle
         self.candles.append(candle)
 
+        # Keep a permanent copy on disk
+        if self.archive:
+            self.archive.append(candle)
+
+        # Build the higher interval candles
+        self.timeframes.add_candle(candle)
+
+        # Commit the candle to the incremental indicators used for provisional evaluation
+        if self.provisional:
+            self.strategy.update(candle)
+            self.update_trigger_levels()
+
         # Remove the first item
-        self.candles.pop(0)
+        if len(self.candles) > self.max_candles:
+            self.candles.pop(0)
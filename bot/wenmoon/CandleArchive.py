@@ -0,0 +1,208 @@
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Fixed width record for one candle, the fields follow the keys of format_historical_candle
+CANDLE_DTYPE = np.dtype([
+    ("candle_start_time_ms", "<i8"),
+    ("open_price", "<f8"),
+    ("high_price", "<f8"),
+    ("low_price", "<f8"),
+    ("close_price", "<f8"),
+    ("volume", "<f8"),
+    ("candle_close_time_ms", "<i8"),
+    ("quote_asset_volume", "<f8"),
+    ("number_of_trades", "<i8"),
+    ("taker_buy_base_asset_volume", "<f8"),
+    ("taker_buy_quote_asset_volume", "<f8")
+])
+
+# Longest time appended candles stay in the OS cache before they are fsynced to disk
+SYNC_INTERVAL_S = 5.0
+
+
+def candles_to_records(candles):
+    """Converts human readable candles into archive records.
+
+    Args:
+        candles (list of dict): Candles in the format_historical_candle layout.
+
+    Returns:
+        numpy.ndarray: Structured array with CANDLE_DTYPE.
+    """
+    return np.array([tuple(candle[name] for name in CANDLE_DTYPE.names) for candle in candles], dtype=CANDLE_DTYPE)
+
+
+def records_to_candles(records):
+    """Converts archive records back into human readable candles.
+
+    Args:
+        records (numpy.ndarray): Structured array with CANDLE_DTYPE.
+
+    Returns:
+        list of dict: Candles in the format_historical_candle layout.
+    """
+    candles = []
+    for record in records.tolist():
+        candle = dict(zip(CANDLE_DTYPE.names, record))
+        candle["candle_start_time"] = str(datetime.fromtimestamp(candle["candle_start_time_ms"]/1000, tz=timezone.utc))
+        candle["candle_close_time"] = str(datetime.fromtimestamp(candle["candle_close_time_ms"]/1000, tz=timezone.utc))
+        candles.append(candle)
+    return candles
+
+
+class CandleArchive:
+    """Append-only on-disk candle store for a single symbol and interval, or a single tick, volume or dollar bar size.
+
+    Candles are stored as fixed width binary records (CANDLE_DTYPE) in start time order. The file is memory-mapped
+    for reading, so each column is available as a NumPy view without copying or loading the whole file.
+
+    Time candles have unique start times, so candles which are not newer than the newest archived one are skipped as
+    already archived. Several bars can start in the same ms, so bars are only skipped if they start earlier.
+
+    Appends are written to the OS before returning, so they survive the process dying, and are fsynced at most every
+    SYNC_INTERVAL_S (and on close), so tick and volume bars do not pay for an fsync each. If the process dies part way
+    through a write, the incomplete trailing record is cut off the next time the archive is opened.
+
+    Attributes:
+        path (str): Path to the archive file.
+        last_start_time_ms (int): Start time of the newest archived candle (-1 if the archive is empty).
+        bar_type (str): The bar type (options: "time", "tick", "volume", "dollar").
+        last_sync (float): Monotonic time of the most recent fsync.
+    """
+
+    def __init__(self, directory, symbol, interval, bar_type="time", bar_size=0):
+        """Opens (or creates) the archive.
+
+        Args:
+            directory (str): Directory holding the archive files.
+            symbol (str): The symbol pair, e.g. "BTCUSDT".
+            interval (str): The candle interval, e.g. "1m".
+            bar_type (str): The bar type (options: "time", "tick", "volume", "dollar").
+            bar_size (float): The bar size for tick, volume and dollar bars.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.bar_type = bar_type
+        # Each bar type and size gets its own file, time candles keep the file name of older archives
+        name = f"{symbol}_{interval}" if bar_type == "time" else f"{symbol}_{bar_type}_{bar_size:g}"
+        self.path = os.path.join(directory, f"{name}.candles")
+        self._mmap = None
+        self._file = None
+        self.last_sync = time.monotonic()
+        self.repair()
+        self.last_start_time_ms = int(self.data["candle_start_time_ms"][-1]) if len(self) else -1
+
+    def repair(self):
+        """Truncates an incomplete trailing record left by an interrupted append."""
+        if not os.path.exists(self.path):
+            open(self.path, "wb").close()
+            return
+
+        size = os.path.getsize(self.path)
+        excess = size % CANDLE_DTYPE.itemsize
+        if excess:
+            print(f"Removing incomplete record from {self.path}")
+            with open(self.path, "r+b") as archive_file:
+                archive_file.truncate(size - excess)
+
+    def __len__(self):
+        return os.path.getsize(self.path) // CANDLE_DTYPE.itemsize
+
+    @property
+    def data(self):
+        """numpy.ndarray: Read-only memory-mapped view of all archived records."""
+        length = len(self)
+        if self._mmap is None or len(self._mmap) != length:
+            if length:
+                self._mmap = np.memmap(self.path, dtype=CANDLE_DTYPE, mode="r", shape=(length,))
+            else:
+                self._mmap = np.empty(0, dtype=CANDLE_DTYPE)
+        return self._mmap
+
+    def column(self, name):
+        """Gets one field for all archived candles without copying.
+
+        Args:
+            name (str): Field name, e.g. "close_price".
+
+        Returns:
+            numpy.ndarray: Memory-mapped column view.
+        """
+        return self.data[name]
+
+    def search(self, time_ms):
+        """Finds the position of the first candle starting at or after a time, by binary search.
+
+        Args:
+            time_ms (int): Time in ms.
+
+        Returns:
+            int: Index into the archive.
+        """
+        return int(np.searchsorted(self.data["candle_start_time_ms"], time_ms, side="left"))
+
+    def range(self, start_ms, end_ms=None):
+        """Gets the candles starting within a time range.
+
+        Args:
+            start_ms (int): Start of the range in ms (inclusive).
+            end_ms (int): End of the range in ms (exclusive), None for all candles after start_ms.
+
+        Returns:
+            numpy.ndarray: Memory-mapped view of the records in the range.
+        """
+        start = self.search(start_ms)
+        end = len(self) if end_ms is None else self.search(end_ms)
+        return self.data[start:end]
+
+    def append(self, candle):
+        """Appends a single closed candle.
+
+        Args:
+            candle (dict): Human readable candle data.
+
+        Returns:
+            bool: True if the candle was written, False if it was already archived.
+        """
+        return self.extend(candles_to_records([candle])) > 0
+
+    def extend(self, records):
+        """Appends candle records, skipping any which are already archived.
+
+        Args:
+            records (numpy.ndarray): Structured array with CANDLE_DTYPE, in start time order.
+
+        Returns:
+            int: Number of records written.
+        """
+        if self.bar_type == "time":
+            records = records[records["candle_start_time_ms"] > self.last_start_time_ms]
+        else:
+            records = records[records["candle_start_time_ms"] >= self.last_start_time_ms]
+        if not len(records):
+            return 0
+
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(records.astype(CANDLE_DTYPE, copy=False).tobytes())
+        self._file.flush()
+        if time.monotonic() - self.last_sync >= SYNC_INTERVAL_S:
+            self.sync()
+
+        self.last_start_time_ms = int(records["candle_start_time_ms"][-1])
+        return len(records)
+
+    def sync(self):
+        """Fsyncs the appended candles to disk."""
+        self.last_sync = time.monotonic()
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """Fsyncs the appended candles and closes the file, a later append opens it again."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
@@ -0,0 +1,329 @@
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+from wenmoon.CandleArchive import CANDLE_DTYPE
+
+MAGIC = b"WMCS"
+VERSION = 1
+
+# magic, version, codec, tick size, step size, interval in ms
+FILE_HEADER = struct.Struct("<4sHHddq")
+
+# rows, compressed length, first start time, last start time, first close in ticks
+BLOCK_HEADER = struct.Struct("<IIqqq")
+
+CODECS = {
+    "zlib": (1, lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (2, lzma.compress, lzma.decompress)
+}
+CODEC_IDS = {codec_id: (name, decompress) for name, (codec_id, _, decompress) in CODECS.items()}
+
+# Number of candles per compressed block (about two months of 1m candles)
+BLOCK_SIZE = 1 << 16
+
+# Column encodings
+ENCODING_RAW = 0
+ENCODING_UNITS = 1
+
+
+def _shuffle(values):
+    """Groups the bytes of 8 byte values by significance, so the mostly-zero high bytes compress together."""
+    return np.ascontiguousarray(values.view(np.uint8).reshape(-1, 8).T).tobytes()
+
+
+def _unshuffle(data, count, dtype):
+    """Reverses _shuffle."""
+    return np.ascontiguousarray(np.frombuffer(data, dtype=np.uint8).reshape(8, count).T).view(dtype).ravel()
+
+
+def _to_units(values, unit):
+    """Converts values to whole multiples of a unit, if that can be done without losing precision.
+
+    Args:
+        values (numpy.ndarray): Float values.
+        unit (float): Unit size, e.g. the tick size.
+
+    Returns:
+        numpy.ndarray: int64 units, or None if the values are not exact multiples of the unit.
+    """
+    if not unit:
+        return None
+    units = np.rint(values / unit).astype(np.int64)
+    if not np.array_equal(_from_units(units, unit), values):
+        return None
+    return units
+
+
+def _from_units(units, unit):
+    """Converts whole multiples of a unit back into float values."""
+    decimals = max(0, int(np.ceil(-np.log10(unit) - 1e-9)))
+    return np.round(units * unit, decimals)
+
+
+class ColdStorageWriter:
+    """Writes candles into a compressed cold storage file.
+
+    The file is a header followed by independently compressed blocks of candles. Within each block:
+
+    - start times are stored as the difference from the expected interval, so a continuous history is all zeros,
+    - prices are converted into whole ticks, with the close delta-encoded from the previous close and the open, high
+      and low stored relative to the candle body,
+    - volumes are converted into whole lot steps,
+    - all columns are 8 byte integers with their bytes grouped by significance before compression.
+
+    Columns which are not exact multiples of the tick or step size fall back to raw float64, so encoding is always
+    lossless. Only stdlib codecs (zlib or lzma) are used.
+
+    Attributes:
+        path (str): Path to the cold storage file.
+        tick_size (float): Price tick size for the symbol.
+        step_size (float): Quantity step size for the symbol.
+        interval_ms (int): Candle interval in ms.
+        codec (str): Compression codec ("zlib" or "lzma").
+    """
+
+    def __init__(self, path, tick_size, step_size, interval_ms, codec="zlib"):
+        """Creates the file and writes the header.
+
+        Args:
+            path (str): Path to the cold storage file, overwritten if it exists.
+            tick_size (float): Price tick size for the symbol (SymbolFilters.tick_size).
+            step_size (float): Quantity step size for the symbol (SymbolFilters.step_size).
+            interval_ms (int): Candle interval in ms.
+            codec (str): Compression codec ("zlib" or "lzma").
+        """
+        self.path = path
+        self.tick_size = tick_size
+        self.step_size = step_size
+        self.interval_ms = interval_ms
+        self.codec = codec
+        self.compress = CODECS[codec][1]
+        self.pending = []
+        self.pending_rows = 0
+        self.file = open(path, "wb")
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, CODECS[codec][0], tick_size, step_size, interval_ms))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, records):
+        """Adds candle records, writing a block whenever enough are buffered.
+
+        Args:
+            records (numpy.ndarray): Structured array with CANDLE_DTYPE, in start time order.
+        """
+        self.pending.append(np.asarray(records, dtype=CANDLE_DTYPE))
+        self.pending_rows += len(records)
+
+        if self.pending_rows >= BLOCK_SIZE:
+            buffered = np.concatenate(self.pending)
+            full = len(buffered) - len(buffered) % BLOCK_SIZE
+            for start in range(0, full, BLOCK_SIZE):
+                self.write_block(buffered[start:start + BLOCK_SIZE])
+            self.pending = [buffered[full:]]
+            self.pending_rows = len(buffered) - full
+
+    def close(self):
+        """Writes any buffered candles and closes the file."""
+        if self.pending_rows:
+            self.write_block(np.concatenate(self.pending))
+        self.pending = []
+        self.pending_rows = 0
+        self.file.close()
+
+    def encode_column(self, values, unit):
+        """Encodes a float column as whole units if possible, otherwise raw.
+
+        Returns:
+            bytes: Encoding flag followed by the shuffled column bytes.
+        """
+        units = _to_units(values, unit)
+        if units is None:
+            return bytes([ENCODING_RAW]) + _shuffle(np.ascontiguousarray(values, dtype=np.float64))
+        return bytes([ENCODING_UNITS]) + _shuffle(units)
+
+    def write_block(self, records):
+        """Encodes, compresses and writes one block of candles.
+
+        Args:
+            records (numpy.ndarray): Structured array with CANDLE_DTYPE.
+        """
+        start_times = records["candle_start_time_ms"]
+        start_deltas = np.diff(start_times, prepend=start_times[0] - self.interval_ms) - self.interval_ms
+        close_offsets = records["candle_close_time_ms"] - start_times - (self.interval_ms - 1)
+
+        prices = {name: _to_units(records[name], self.tick_size)
+                  for name in ("open_price", "high_price", "low_price", "close_price")}
+
+        parts = [_shuffle(start_deltas), _shuffle(close_offsets)]
+        first_close = 0
+
+        if all(units is not None for units in prices.values()):
+            close = prices["close_price"]
+            first_close = int(close[0])
+            body_high = np.maximum(prices["open_price"], close)
+            body_low = np.minimum(prices["open_price"], close)
+            parts.append(bytes([ENCODING_UNITS]))
+            parts.append(_shuffle(np.diff(close, prepend=close[0])))
+            parts.append(_shuffle(prices["open_price"] - close))
+            parts.append(_shuffle(prices["high_price"] - body_high))
+            parts.append(_shuffle(body_low - prices["low_price"]))
+        else:
+            parts.append(bytes([ENCODING_RAW]))
+            for name in ("close_price", "open_price", "high_price", "low_price"):
+                parts.append(_shuffle(np.ascontiguousarray(records[name])))
+
+        parts.append(self.encode_column(records["volume"], self.step_size))
+        parts.append(self.encode_column(records["taker_buy_base_asset_volume"], self.step_size))
+        parts.append(_shuffle(np.ascontiguousarray(records["quote_asset_volume"])))
+        parts.append(_shuffle(np.ascontiguousarray(records["taker_buy_quote_asset_volume"])))
+        parts.append(_shuffle(np.ascontiguousarray(records["number_of_trades"])))
+
+        compressed = self.compress(b"".join(parts))
+        self.file.write(BLOCK_HEADER.pack(len(records), len(compressed), int(start_times[0]), int(start_times[-1]),
+                                          first_close))
+        self.file.write(compressed)
+
+
+class ColdStorageReader:
+    """Streams candles from a cold storage file, one decompressed block at a time.
+
+    Only one block is held in memory at once and blocks outside a requested time range are skipped without being
+    read or decompressed, so a backtest can scan a history much larger than RAM.
+
+    Attributes:
+        path (str): Path to the cold storage file.
+        tick_size (float): Price tick size for the symbol.
+        step_size (float): Quantity step size for the symbol.
+        interval_ms (int): Candle interval in ms.
+        codec (str): Compression codec used in the file.
+    """
+
+    def __init__(self, path):
+        """Reads the file header.
+
+        Args:
+            path (str): Path to the cold storage file.
+        """
+        self.path = path
+        with open(path, "rb") as cold_file:
+            magic, version, codec_id, self.tick_size, self.step_size, self.interval_ms = \
+                FILE_HEADER.unpack(cold_file.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a cold storage file (version {VERSION})")
+        self.codec, self.decompress = CODEC_IDS[codec_id]
+
+    def iter_blocks(self, start_ms=None, end_ms=None):
+        """Yields the candles one block at a time.
+
+        Args:
+            start_ms (int): Only yield candles starting at or after this time (ms), None for no limit.
+            end_ms (int): Only yield candles starting before this time (ms), None for no limit.
+
+        Yields:
+            numpy.ndarray: Structured array with CANDLE_DTYPE for each block.
+        """
+        with open(self.path, "rb") as cold_file:
+            cold_file.seek(FILE_HEADER.size)
+            while True:
+                header = cold_file.read(BLOCK_HEADER.size)
+                if len(header) < BLOCK_HEADER.size:
+                    return
+                rows, length, first_start, last_start, first_close = BLOCK_HEADER.unpack(header)
+
+                # Skip blocks outside the requested range without reading them
+                if (start_ms is not None and last_start < start_ms) or (end_ms is not None and first_start >= end_ms):
+                    cold_file.seek(length, 1)
+                    continue
+
+                records = self.decode_block(self.decompress(cold_file.read(length)), rows, first_start, first_close)
+                if start_ms is not None or end_ms is not None:
+                    start_times = records["candle_start_time_ms"]
+                    lo = 0 if start_ms is None else np.searchsorted(start_times, start_ms)
+                    hi = len(records) if end_ms is None else np.searchsorted(start_times, end_ms)
+                    records = records[lo:hi]
+                yield records
+
+    def decode_block(self, data, rows, first_start, first_close):
+        """Decodes one decompressed block.
+
+        Args:
+            data (bytes): Decompressed block contents.
+            rows (int): Number of candles in the block.
+            first_start (int): Start time of the first candle in ms.
+            first_close (int): Close price of the first candle in ticks.
+
+        Returns:
+            numpy.ndarray: Structured array with CANDLE_DTYPE.
+        """
+        column_size = rows * 8
+        position = 0
+
+        def take(dtype=np.int64):
+            nonlocal position
+            values = _unshuffle(data[position:position + column_size], rows, dtype)
+            position += column_size
+            return values
+
+        def take_flag():
+            nonlocal position
+            position += 1
+            return data[position - 1]
+
+        def take_units(unit):
+            if take_flag() == ENCODING_UNITS:
+                return _from_units(take(), unit)
+            return take(np.float64)
+
+        records = np.empty(rows, dtype=CANDLE_DTYPE)
+        start_times = first_start + np.cumsum(take() + self.interval_ms) - self.interval_ms
+        records["candle_start_time_ms"] = start_times
+        records["candle_close_time_ms"] = start_times + take() + self.interval_ms - 1
+
+        if take_flag() == ENCODING_UNITS:
+            close = first_close + np.cumsum(take())
+            open_ = close + take()
+            high = np.maximum(open_, close) + take()
+            low = np.minimum(open_, close) - take()
+            for name, units in (("close_price", close), ("open_price", open_), ("high_price", high),
+                                ("low_price", low)):
+                records[name] = _from_units(units, self.tick_size)
+        else:
+            for name in ("close_price", "open_price", "high_price", "low_price"):
+                records[name] = take(np.float64)
+
+        records["volume"] = take_units(self.step_size)
+        records["taker_buy_base_asset_volume"] = take_units(self.step_size)
+        records["quote_asset_volume"] = take(np.float64)
+        records["taker_buy_quote_asset_volume"] = take(np.float64)
+        records["number_of_trades"] = take()
+        return records
+
+
+def compress_archive(archive, path, tick_size, step_size, interval_ms, end_ms=None, codec="zlib"):
+    """Copies the older part of a CandleArchive into a cold storage file.
+
+    Args:
+        archive (CandleArchive): Source archive.
+        path (str): Path of the cold storage file to write.
+        tick_size (float): Price tick size for the symbol.
+        step_size (float): Quantity step size for the symbol.
+        interval_ms (int): Candle interval in ms.
+        end_ms (int): Only copy candles starting before this time (ms), None for the whole archive.
+        codec (str): Compression codec ("zlib" or "lzma").
+
+    Returns:
+        int: Number of candles written.
+    """
+    records = archive.data if end_ms is None else archive.data[:archive.search(end_ms)]
+    with ColdStorageWriter(path, tick_size, step_size, interval_ms, codec) as writer:
+        # Feed the memory map in block sized slices so only one block is copied into memory at a time
+        for start in range(0, len(records), BLOCK_SIZE):
+            writer.write(np.array(records[start:start + BLOCK_SIZE]))
+    return len(records)
@@ -3,11 +3,31 @@ import re
 import configparser
 from datetime import datetime
 
+from wenmoon.bot_utils import interval_to_milliseconds
+
 CONFIG_FILE = "wenmoon/settings.cfg"
 CONFIG_SECTION = "binance_user_config"
+STRATEGY_PARAMETERS_SECTION = "strategy_parameters"
+# Each [bot:<name>] section defines a bot, with its own [strategy_parameters:<name>] section
+BOT_SECTION_PREFIX = "bot:"
+
+# Settings which apply to the whole process, so they cannot be set in a bot section
+SHARED_SETTINGS = (
+    "api_key", "secret_key", "test_mode", "user_stream_url", "watch_pair_symbols", "max_open_positions",
+    "exchange_info_cache", "exchange_info_ttl_s", "startup_target_ms", "config_reload_s", "profile_strategy",
+    "profile_seconds", "snapshot_path", "snapshot_interval_s"
+)
+
+# Settings which can change while the bot is running, everything else is read once at startup
+RELOADABLE_SETTINGS = (
+    "profit_target", "stop_loss", "test_fee", "strategy", "strategy_parameters", "member_parameters",
+    "provisional_hz",
+    "strategy_time_budget_ms", "profile_strategy", "profile_seconds", "output_candles", "output_websocket",
+    "config_reload_s", "snapshot_interval_s"
+)
 
 class Config:
-    def __init__(self):
+    def __init__(self, config_file=CONFIG_FILE, name=""):
         # Initialise config parser
         config = configparser.ConfigParser()
 
@@ -16,21 +36,58 @@ class Config:
             "coin_symbol": "BTC",
             "fiat_symbol": "USDT",
             "watch_pair_symbol": "BTCUSDT",
+            "watch_pair_symbols": "%(watch_pair_symbol)s",
+            "max_open_positions": 0,
             "interval": "1h",
             "start_position": "fiat",
-            "max_candles": 50,
+            "max_candles": 0,
             "test_mode": "yes",
-            "strategy": "wenmoon",
+            "strategy": "macd_rsi",
             "profit_target": 0,
-            "stop_loss": 0
+            "stop_loss": 0,
+            "user_stream_url": "wss://stream.binance.com:9443/ws",
+            "ledger_path": "",
+            "archive_dir": "",
+            "timeframes": "",
+            "bar_type": "time",
+            "bar_size": 0,
+            "order_book": "no",
+            "tick_exits": "yes",
+            "provisional": "no",
+            "provisional_hz": 0,
+            "oco_orders": "no",
+            "oco_stop_limit_offset": 0.1,
+            "strategy_time_budget_ms": 0,
+            "profile_strategy": "",
+            "profile_seconds": 60,
+            "exchange_info_cache": "exchange_info.json",
+            "exchange_info_ttl_s": 3600,
+            "startup_target_ms": 300,
+            "output_candles": "no",
+            "output_websocket": "no",
+            "config_reload_s": 5,
+            "max_order_value": 0,
+            "snapshot_path": "",
+            "snapshot_interval_s": 60
         }
 
         # Open configuration file
-        if not os.path.exists(CONFIG_FILE):
-            print("Configuration file not found, should be in wenmoon/settings.cfg")
+        if not os.path.exists(config_file):
+            print(f"Configuration file not found, should be in {config_file}")
             raise FileNotFoundError
         else:
-            config.read(CONFIG_FILE)
+            config.read(config_file)
+        self.config_file = config_file
+        self.name = name
+
+        # A bot section overrides the settings of the main section for that bot
+        if name:
+            overrides = self._explicit_options(config_file, f"{BOT_SECTION_PREFIX}{name}")
+            shared = sorted(set(overrides) & set(SHARED_SETTINGS))
+            if shared:
+                raise ValueError(f"Bot {name} cannot set {shared}, they are shared by all bots")
+            for key, value in overrides.items():
+                config.set(CONFIG_SECTION, key, value)
 
         # Set configuration attributes
         self.api_key = config.get(CONFIG_SECTION, "api_key")
@@ -38,6 +95,8 @@ class Config:
         self.coin_symbol = config.get(CONFIG_SECTION, "coin_symbol")
         self.fiat_symbol = config.get(CONFIG_SECTION, "fiat_symbol")
         self.watch_symbol_pair = config.get(CONFIG_SECTION, "watch_pair_symbol")
+        self.watch_symbol_pairs = [s.strip() for s in config.get(CONFIG_SECTION, "watch_pair_symbols").split(",")]
+        self.max_open_positions = config.getint(CONFIG_SECTION, "max_open_positions")
         self.interval = self._validate_interval(config.get(CONFIG_SECTION, "interval"))
         self.interval_number = int(re.search(r"\d+", self.interval)[0])
         self.interval_unit = re.search(r"\D+", self.interval)[0]
@@ -49,10 +108,109 @@ class Config:
         self.strategy = config.get(CONFIG_SECTION, "strategy")
         self.profit_target = config.getfloat(CONFIG_SECTION, "profit_target")
         self.stop_loss = config.getfloat(CONFIG_SECTION, "stop_loss")
-        self.output_candles = False
-        self.output_websocket = False
+        self.user_stream_url = config.get(CONFIG_SECTION, "user_stream_url")
+        self.ledger_path = config.get(CONFIG_SECTION, "ledger_path")
+        self.archive_dir = config.get(CONFIG_SECTION, "archive_dir")
+        self.timeframes = [
+            self._validate_timeframe(self._validate_interval(s.strip()), self.interval)
+            for s in config.get(CONFIG_SECTION, "timeframes").split(",") if s.strip()
+        ]
+        self.bar_type = self._validate_bar_type(config.get(CONFIG_SECTION, "bar_type"))
+        self.bar_size = self._validate_bar_size(self.bar_type, config.getfloat(CONFIG_SECTION, "bar_size"))
+        self.order_book = config.getboolean(CONFIG_SECTION, "order_book")
+        self.tick_exits = config.getboolean(CONFIG_SECTION, "tick_exits")
+        self.provisional = config.getboolean(CONFIG_SECTION, "provisional")
+        self.provisional_hz = config.getfloat(CONFIG_SECTION, "provisional_hz")
+        self.oco_orders = config.getboolean(CONFIG_SECTION, "oco_orders")
+        self.oco_stop_limit_offset = config.getfloat(CONFIG_SECTION, "oco_stop_limit_offset")
+        self.strategy_time_budget_ms = config.getfloat(CONFIG_SECTION, "strategy_time_budget_ms")
+        self.profile_strategy = config.get(CONFIG_SECTION, "profile_strategy")
+        self.profile_seconds = config.getfloat(CONFIG_SECTION, "profile_seconds")
+        self.exchange_info_cache = config.get(CONFIG_SECTION, "exchange_info_cache")
+        self.exchange_info_ttl_s = config.getfloat(CONFIG_SECTION, "exchange_info_ttl_s")
+        self.startup_target_ms = config.getfloat(CONFIG_SECTION, "startup_target_ms")
+        # Overrides for the parameters declared by the strategy (the DEFAULT options are not strategy parameters)
+        self.strategy_parameters = {}
+        if config.has_section(STRATEGY_PARAMETERS_SECTION):
+            self.strategy_parameters = {
+                key: value for key, value in config.items(STRATEGY_PARAMETERS_SECTION) if key not in config.defaults()
+            }
+        # Overrides for the members of a strategy with members (e.g. the ensemble), from the
+        # [strategy_parameters:<member>] sections which do not belong to a bot
+        bot_names = {section[len(BOT_SECTION_PREFIX):] for section in config.sections()
+                     if section.startswith(BOT_SECTION_PREFIX)}
+        member_prefix = f"{STRATEGY_PARAMETERS_SECTION}:"
+        self.member_parameters = {
+            section[len(member_prefix):]: {
+                key: value for key, value in config.items(section) if key not in config.defaults()
+            }
+            for section in config.sections()
+            if section.startswith(member_prefix) and section[len(member_prefix):] not in bot_names
+        }
+        self.output_candles = config.getboolean(CONFIG_SECTION, "output_candles")
+        self.output_websocket = config.getboolean(CONFIG_SECTION, "output_websocket")
+        self.config_reload_s = config.getfloat(CONFIG_SECTION, "config_reload_s")
+        self.max_order_value = config.getfloat(CONFIG_SECTION, "max_order_value")
+        self.snapshot_path = config.get(CONFIG_SECTION, "snapshot_path")
+        self.snapshot_interval_s = config.getfloat(CONFIG_SECTION, "snapshot_interval_s")
+        if name:
+            self.strategy_parameters.update(
+                self._explicit_options(config_file, f"{STRATEGY_PARAMETERS_SECTION}:{name}", required=False)
+            )
+        # Settings for each bot defined in a [bot:<name>] section (empty when the main section is the only bot)
+        self.bot_configs = [] if name else [
+            Config(config_file, section[len(BOT_SECTION_PREFIX):])
+            for section in config.sections() if section.startswith(BOT_SECTION_PREFIX)
+        ]
+        # Several pairs without bot sections trade from one simulated balance, there is no live portfolio
+        if not (self.test_mode or name or self.bot_configs) and len(self.watch_symbol_pairs) > 1:
+            raise ValueError("Trading several watch_pair_symbols from one balance is only available with "
+                             "test_mode=yes, use a [bot:<name>] section for each pair to trade live")
         self.run_mode = os.getenv("RUN_MODE", "python")
 
+    def changes(self, other):
+        """Compares the settings with another configuration.
+
+        Args:
+            other (Config): The other configuration, e.g. the settings file read again.
+
+        Returns:
+            list of str: Names of the settings which differ.
+        """
+        return [
+            name for name, value in vars(other).items() if name != "bot_configs" and getattr(self, name, None) != value
+        ]
+
+    def update(self, other, names):
+        """Copies settings from another configuration, in place so every object holding this one sees them.
+
+        Args:
+            other (Config): The configuration to copy from.
+            names (list of str): Names of the settings to copy.
+        """
+        for name in names:
+            setattr(self, name, getattr(other, name))
+
+    @staticmethod
+    def _explicit_options(config_file, section, required=True):
+        """Reads the options set in a section of the file itself, without the defaults.
+
+        Args:
+            config_file (str): Path of the settings file.
+            section (str): Name of the section.
+            required (bool): Whether a missing section is an error.
+
+        Returns:
+            dict: Raw option values by name.
+        """
+        parser = configparser.ConfigParser(interpolation=None)
+        parser.read(config_file)
+        if not parser.has_section(section):
+            if required:
+                raise configparser.NoSectionError(section)
+            return {}
+        return dict(parser.items(section))
+
     @staticmethod
     def _validate_interval(interval):
         valid_intervals = ["1m", "3m", "5m", "15m", "30m", "1h", "2h", "4h", "6h", "12h"]
@@ -61,4 +219,27 @@ class Config:
         else:
             raise ValueError(f"Supplied interval is invalid, required one of {valid_intervals}")
 
+    @staticmethod
+    def _validate_timeframe(timeframe, interval):
+        timeframe_ms = interval_to_milliseconds(timeframe)
+        interval_ms = interval_to_milliseconds(interval)
+        if timeframe_ms > interval_ms and timeframe_ms % interval_ms == 0:
+            return timeframe
+        else:
+            raise ValueError(f"Supplied timeframe {timeframe} is invalid, required a longer interval which is a "
+                             f"multiple of {interval}")
+
+    @staticmethod
+    def _validate_bar_type(bar_type):
+        valid_bar_types = ["time", "tick", "volume", "dollar"]
+        if bar_type in valid_bar_types:
+            return bar_type
+        else:
+            raise ValueError(f"Supplied bar type is invalid, required one of {valid_bar_types}")
 
+    @staticmethod
+    def _validate_bar_size(bar_type, bar_size):
+        if bar_type == "time" or bar_size > 0:
+            return bar_size
+        else:
+            raise ValueError(f"Supplied bar size is invalid, {bar_type} bars require a bar_size above 0")
@@ -0,0 +1,107 @@
+import configparser
+import os
+import time
+
+from wenmoon.Config import Config, RELOADABLE_SETTINGS
+
+
+class ConfigWatcher:
+    """Applies changes to the settings file while the bot is running.
+
+    poll is called after every websocket message, so changes are applied on the websocket thread, between messages.
+    It only looks at the file every config_reload_s seconds, and only reads it again when its modification time or
+    size has changed.
+
+    A changed file is read into a new Config, so it goes through the same validation as at startup. Settings which
+    need a restart are reported and left unchanged. The remaining changes are passed to on_reload, which can reject
+    them by raising ValueError or TypeError (e.g. for an unknown strategy or an invalid parameter) before the running
+    config is updated. The main section and each [bot:<name>] section are applied separately.
+
+    Attributes:
+        config (Config): The running configuration, updated in place.
+        on_reload (callable): Called with the running Config, the same Config read again and the names of the
+            changed reloadable settings, applies them to the running config and the objects using it.
+        last_check (float): Monotonic time of the most recent file check.
+        signature (tuple): Modification time and size of the file when it was last read.
+    """
+
+    def __init__(self, config, on_reload):
+        """Initialise the watcher.
+
+        Args:
+            config (Config): The running configuration.
+            on_reload (callable): Applies a validated change, see the class description.
+        """
+        self.config = config
+        self.on_reload = on_reload
+        self.last_check = time.monotonic()
+        self.signature = self.file_signature()
+
+    def file_signature(self):
+        """Gets the modification time and size of the settings file.
+
+        Returns:
+            tuple: Modification time in ns and size in bytes (None if the file cannot be read).
+        """
+        try:
+            stat = os.stat(self.config.config_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self):
+        """Reloads the settings if the file has changed since it was last read, at most every config_reload_s."""
+        if not self.config.config_reload_s:
+            return
+        now = time.monotonic()
+        if now - self.last_check < self.config.config_reload_s:
+            return
+        self.last_check = now
+
+        signature = self.file_signature()
+        if signature is None or signature == self.signature:
+            return
+        self.signature = signature
+        self.reload()
+
+    def reload(self):
+        """Reads the settings file and applies the reloadable settings which changed, for the main section and for
+        each bot section."""
+        try:
+            new_config = Config(self.config.config_file)
+        except (configparser.Error, ValueError, OSError) as err:
+            print(f"Settings change rejected, the file is invalid: {err!r}")
+            return
+
+        bot_names = [bot_config.name for bot_config in self.config.bot_configs]
+        if [bot_config.name for bot_config in new_config.bot_configs] != bot_names:
+            print("Adding or removing bot sections needs a restart, the change is ignored")
+        new_bot_configs = {bot_config.name: bot_config for bot_config in new_config.bot_configs}
+
+        self.apply(self.config, new_config)
+        for bot_config in self.config.bot_configs:
+            if bot_config.name in new_bot_configs:
+                self.apply(bot_config, new_bot_configs[bot_config.name])
+
+    def apply(self, running_config, new_config):
+        """Applies the reloadable settings which changed in one configuration.
+
+        Args:
+            running_config (Config): The configuration in use, updated in place.
+            new_config (Config): The same configuration read again from the file.
+        """
+        label = f"bot {running_config.name}" if running_config.name else "settings"
+        changed = running_config.changes(new_config)
+        restart = [name for name in changed if name not in RELOADABLE_SETTINGS]
+        if restart:
+            print(f"Changes to {label} which need a restart are ignored: {', '.join(restart)}")
+        changed = [name for name in changed if name in RELOADABLE_SETTINGS]
+        if not changed:
+            return
+
+        try:
+            self.on_reload(running_config, new_config, changed)
+        except (ValueError, TypeError) as err:
+            print(f"Change to {label} rejected: {err}")
+            return
+        print(f"Reloaded {label}: {', '.join(f'{name}={getattr(running_config, name)}' for name in changed)}")
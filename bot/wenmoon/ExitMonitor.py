@@ -0,0 +1,79 @@
+class ExitMonitor:
+    """Checks the profit target and stop loss of an open position on every best bid/ask update.
+
+    When a position is opened the profit target and stop loss are converted into bid prices with
+    Trader.price_for_profit, so each bookTicker update is a float conversion and two comparisons. The
+    bookTicker stream is only subscribed to while a position is open.
+
+    See the following link for the book ticker stream:
+    https://github.com/binance/binance-spot-api-docs/blob/master/web-socket-streams.md#individual-symbol-book-ticker-streams
+
+    Attributes:
+        trader (Trader): The trader holding the position, sold through Trader.exit_position.
+        mux (StreamMux): The combined stream to subscribe the bookTicker stream on.
+        stream (str): The bookTicker stream name for the symbol.
+        take_profit_price (float): Bid price at or above which the profit target is reached (None if not set).
+        stop_loss_price (float): Bid price at or below which the stop loss is reached (None if not set).
+        armed (bool): Whether a position is being monitored.
+    """
+
+    def __init__(self, trader, mux):
+        """Initialise the exit monitor.
+
+        Args:
+            trader (Trader): The trader holding the position.
+            mux (StreamMux): The combined stream to subscribe the bookTicker stream on.
+        """
+        self.trader = trader
+        self.mux = mux
+        self.stream = f"{trader.symbol.lower()}@bookTicker"
+        self.take_profit_price = None
+        self.stop_loss_price = None
+        self.armed = False
+
+    def arm(self, buy_price):
+        """Starts monitoring a newly opened position.
+
+        Args:
+            buy_price (float): The buy price of the position.
+        """
+        config = self.trader.config
+        if not buy_price or not (config.profit_target or config.stop_loss):
+            return
+
+        price_for_profit = self.trader.price_for_profit
+        self.take_profit_price = price_for_profit(buy_price, config.profit_target) if config.profit_target else None
+        self.stop_loss_price = price_for_profit(buy_price, config.stop_loss) if config.stop_loss else None
+
+        if not self.armed:
+            self.armed = True
+            self.mux.add_stream(self.stream, self.handle_book_ticker)
+
+        print(f"Watching exits for {self.trader.symbol} (profit target at {self.take_profit_price}, stop loss at "
+              f"{self.stop_loss_price})")
+
+    def disarm(self):
+        """Stops monitoring once the position is closed."""
+        if self.armed:
+            self.armed = False
+            self.mux.remove_stream(self.stream, self.handle_book_ticker)
+
+    def handle_book_ticker(self, data):
+        """Handles a decoded bookTicker message from the websocket.
+
+        A long position is sold into the bids, so the exit thresholds are checked against the best bid.
+
+        Args:
+            data (dict): The raw bookTicker message.
+        """
+        # Updates already in flight when the stream is unsubscribed are ignored
+        if not self.armed:
+            return
+
+        bid = float(data["b"])
+        if self.take_profit_price is not None and bid >= self.take_profit_price:
+            self.disarm()
+            self.trader.exit_position("Profit target reached", bid)
+        elif self.stop_loss_price is not None and bid <= self.stop_loss_price:
+            self.disarm()
+            self.trader.exit_position("Stop loss reached", bid)
@@ -0,0 +1,65 @@
+import bisect
+
+# Bucket upper bounds in seconds, doubling from 50 microseconds to about 1.6 seconds
+BUCKET_BOUNDS_S = [0.00005 * 2 ** i for i in range(16)]
+
+
+class LatencyHistogram:
+    """Histogram of call durations with logarithmic buckets, cheap enough to record every call.
+
+    Attributes:
+        counts (list of int): Number of durations in each bucket, the last bucket holds everything above the largest
+            bound.
+        count (int): Number of recorded durations.
+        total_s (float): Sum of the recorded durations in seconds.
+        max_s (float): Longest recorded duration in seconds.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_S) + 1)
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def record(self, duration_s):
+        """Adds a duration to the histogram.
+
+        Args:
+            duration_s (float): Call duration in seconds.
+        """
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_S, duration_s)] += 1
+        self.count += 1
+        self.total_s += duration_s
+        self.max_s = max(self.max_s, duration_s)
+
+    def percentile(self, percent):
+        """Gets an upper bound for a percentile of the recorded durations.
+
+        Args:
+            percent (float): The percentile, e.g. 99.
+
+        Returns:
+            float: Upper bound of the bucket holding the percentile in seconds (the maximum for the last bucket, 0
+                when nothing has been recorded).
+        """
+        if not self.count:
+            return 0.0
+        rank = percent / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(BUCKET_BOUNDS_S[i], self.max_s) if i < len(BUCKET_BOUNDS_S) else self.max_s
+        return self.max_s
+
+    def summary(self):
+        """Formats the histogram as a one line summary.
+
+        Returns:
+            str: Count, mean, p50, p99 and maximum in milliseconds.
+        """
+        if not self.count:
+            return "no calls"
+        return (f"n={self.count} mean={1000 * self.total_s / self.count:.2f}ms "
+                f"p50<={1000 * self.percentile(50):.2f}ms p99<={1000 * self.percentile(99):.2f}ms "
+                f"max={1000 * self.max_s:.2f}ms")
@@ -0,0 +1,49 @@
+import threading
+
+
+class LazyClient:
+    """Binance client which is created in a background thread, so startup does not wait for it.
+
+    Importing python-binance is slow, and creating the Client sends a ping request. Both happen in a background
+    thread while the rest of the bot starts up. Any attribute access waits for the client, and is then passed on to
+    it, so a LazyClient can be used wherever a Client is expected.
+
+    Attributes:
+        api_key (str): Binance API key.
+        secret_key (str): Binance API secret.
+    """
+
+    def __init__(self, api_key, secret_key):
+        """Starts creating the client.
+
+        Args:
+            api_key (str): Binance API key.
+            secret_key (str): Binance API secret.
+        """
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self._client = None
+        self._error = None
+        self._ready = threading.Event()
+        threading.Thread(target=self._create, daemon=True, name="binance-client").start()
+
+    def _create(self):
+        try:
+            from binance import Client
+            self._client = Client(self.api_key, self.secret_key)
+        except Exception as err:
+            self._error = err
+        finally:
+            self._ready.set()
+
+    @property
+    def client(self):
+        """binance.Client: The client, waits until it has been created and raises any error from creating it."""
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self._client
+
+    def __getattr__(self, name):
+        # Only called for attributes which are not set on the LazyClient itself
+        return getattr(self.client, name)
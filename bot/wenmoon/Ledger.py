@@ -0,0 +1,351 @@
+import queue
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    time_ms INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    order_id TEXT,
+    side TEXT,
+    order_type TEXT,
+    price REAL,
+    quantity REAL,
+    status TEXT
+);
+CREATE TABLE IF NOT EXISTS fills (
+    time_ms INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    order_id TEXT,
+    side TEXT NOT NULL,
+    price REAL NOT NULL,
+    quantity REAL NOT NULL,
+    quote_quantity REAL NOT NULL,
+    commission REAL,
+    commission_asset TEXT,
+    realized_pnl REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS positions (
+    time_ms INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    position TEXT NOT NULL,
+    coin_balance REAL,
+    entry_price REAL
+);
+CREATE TABLE IF NOT EXISTS status (
+    time_ms INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    fiat_balance REAL,
+    coin_balance REAL,
+    fiat_value REAL,
+    coin_value REAL,
+    total_value REAL,
+    trader TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_symbol_time ON orders (symbol, time_ms);
+CREATE INDEX IF NOT EXISTS orders_time ON orders (time_ms);
+CREATE INDEX IF NOT EXISTS fills_symbol_time ON fills (symbol, time_ms);
+CREATE INDEX IF NOT EXISTS fills_time ON fills (time_ms);
+CREATE INDEX IF NOT EXISTS positions_symbol_time ON positions (symbol, time_ms);
+CREATE INDEX IF NOT EXISTS status_symbol_time ON status (symbol, time_ms);
+CREATE INDEX IF NOT EXISTS status_time ON status (time_ms);
+"""
+
+# Columns added to existing tables since they were first created, with their types
+ADDED_COLUMNS = {
+    "status": {"trader": "TEXT"}
+}
+
+INSERTS = {
+    "orders": "INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "fills": "INSERT INTO fills VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "positions": "INSERT INTO positions VALUES (?, ?, ?, ?, ?)",
+    "status": "INSERT INTO status VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+}
+
+# Maximum number of rows written in one transaction
+BATCH_SIZE = 500
+
+# Maximum time a row waits in the queue before being written
+FLUSH_INTERVAL_S = 1.0
+
+
+# Ledgers opened through Ledger.shared, by path
+_shared_ledgers = {}
+
+
+def _where(symbol, since_ms, until_ms, trader=None):
+    """Builds a WHERE clause for the symbol, time range and trader filters of the query helpers.
+
+    Args:
+        symbol (str): Symbol pair to filter on, None for all symbols.
+        since_ms (int): Start of the time range (inclusive), None for no start.
+        until_ms (int): End of the time range (exclusive), None for no end.
+        trader (str): Trader to filter on, None for all traders.
+
+    Returns:
+        str: The WHERE clause (empty if there are no filters).
+        tuple: The parameters for the clause.
+    """
+    clauses = []
+    params = []
+    if symbol is not None:
+        clauses.append("symbol = ?")
+        params.append(symbol)
+    if since_ms is not None:
+        clauses.append("time_ms >= ?")
+        params.append(since_ms)
+    if until_ms is not None:
+        clauses.append("time_ms < ?")
+        params.append(until_ms)
+    if trader is not None:
+        clauses.append("trader = ?")
+        params.append(trader)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", tuple(params)
+
+
+class Ledger:
+    """Records orders, fills, positions and status snapshots in an SQLite database.
+
+    Records are put on a queue and written by a background thread in batched transactions, so the trading path only
+    pays for a queue put. The database uses WAL mode, so the query helpers can read while the writer is running.
+
+    Attributes:
+        path (str): Path to the SQLite database file.
+        queue (queue.Queue): Rows waiting to be written, as (table, row) tuples.
+    """
+
+    def __init__(self, path):
+        """Opens (or creates) the ledger and starts the writer thread.
+
+        Args:
+            path (str): Path to the SQLite database file.
+        """
+        self.path = path
+        self.queue = queue.Queue()
+
+        # Create the schema up front, so queries work before the first write
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+                for column, column_type in columns.items():
+                    if column not in existing:
+                        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+        self.writer = threading.Thread(target=self.run_writer, daemon=True)
+        self.writer.start()
+
+    @classmethod
+    def shared(cls, path):
+        """Gets the ledger for a path, opening it on first use, so traders writing to the same file share a writer.
+
+        Args:
+            path (str): Path to the SQLite database file.
+
+        Returns:
+            Ledger: The shared ledger.
+        """
+        if path not in _shared_ledgers:
+            _shared_ledgers[path] = cls(path)
+        return _shared_ledgers[path]
+
+    def connect(self):
+        """Opens a new connection to the ledger.
+
+        Returns:
+            sqlite3.Connection: Connection to the database.
+        """
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def run_writer(self):
+        """Writes queued rows in batches until a None sentinel is received."""
+        connection = self.connect()
+        running = True
+
+        while running:
+            # Wait for the first row, then collect whatever else is queued up to the batch size
+            batch = {}
+            count = 0
+            try:
+                item = self.queue.get(timeout=FLUSH_INTERVAL_S)
+            except queue.Empty:
+                continue
+
+            while True:
+                if item is None:
+                    running = False
+                else:
+                    table, row = item
+                    batch.setdefault(table, []).append(row)
+                count += 1
+                if not running or count >= BATCH_SIZE:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                with connection:
+                    for table, rows in batch.items():
+                        connection.executemany(INSERTS[table], rows)
+            except sqlite3.Error as err:
+                print(f"ERROR: ledger write failed: {err}")
+            finally:
+                for _ in range(count):
+                    self.queue.task_done()
+
+        connection.close()
+
+    def flush(self):
+        """Blocks until every queued row has been written."""
+        self.queue.join()
+
+    def close(self):
+        """Writes the remaining rows and stops the writer thread."""
+        if not self.writer.is_alive():
+            return
+        self.queue.put(None)
+        self.writer.join()
+
+    @staticmethod
+    def close_shared():
+        """Closes every ledger opened through shared, so rows queued just before shutdown are written."""
+        for ledger in _shared_ledgers.values():
+            ledger.close()
+
+    def record_order(self, time_ms, symbol, order_id, side, order_type, price, quantity, status):
+        """Queues an order state change.
+
+        Args:
+            time_ms (int): Time of the order event in ms.
+            symbol (str): Symbol pair of the order.
+            order_id (str): Exchange order id.
+            side (str): "BUY" or "SELL".
+            order_type (str): Order type, e.g. "MARKET".
+            price (float): Order price (0 for market orders).
+            quantity (float): Order quantity.
+            status (str): Order status, e.g. "NEW", "FILLED".
+        """
+        self.queue.put(("orders", (time_ms, symbol, order_id, side, order_type, price, quantity, status)))
+
+    def record_fill(self, time_ms, symbol, order_id, side, price, quantity, quote_quantity, commission=0.0,
+                    commission_asset=None, realized_pnl=0.0):
+        """Queues a fill.
+
+        Args:
+            time_ms (int): Time of the fill in ms.
+            symbol (str): Symbol pair traded.
+            order_id (str): Exchange order id (None for simulated fills).
+            side (str): "BUY" or "SELL".
+            price (float): Fill price.
+            quantity (float): Coin quantity filled.
+            quote_quantity (float): Fiat value of the fill.
+            commission (float): Trading fee paid.
+            commission_asset (str): Asset the fee was paid in.
+            realized_pnl (float): Profit realised by the fill in fiat (0 for entries).
+        """
+        self.queue.put(("fills", (time_ms, symbol, order_id, side, price, quantity, quote_quantity, commission,
+                                  commission_asset, realized_pnl)))
+
+    def record_position(self, time_ms, symbol, position, coin_balance, entry_price):
+        """Queues a position change.
+
+        Args:
+            time_ms (int): Time of the change in ms.
+            symbol (str): Symbol pair.
+            position (str): The new position ("long" or "short").
+            coin_balance (float): Coin held after the change.
+            entry_price (float): Buy price of the position.
+        """
+        self.queue.put(("positions", (time_ms, symbol, position, coin_balance, entry_price)))
+
+    def record_status(self, time_ms, symbol, fiat_balance, coin_balance, fiat_value, coin_value, trader=None):
+        """Queues a status snapshot.
+
+        Args:
+            time_ms (int): Candle close time of the snapshot in ms.
+            symbol (str): Symbol pair.
+            fiat_balance (float): Fiat balance.
+            coin_balance (float): Coin balance.
+            fiat_value (float): Fiat value of the coin balance.
+            coin_value (float): Coin value of the fiat balance.
+            trader (str): Name of the trader the snapshot belongs to, when several trade the same pair.
+        """
+        self.queue.put(("status", (time_ms, symbol, fiat_balance, coin_balance, fiat_value, coin_value,
+                                   fiat_balance + fiat_value, trader)))
+
+    def query_one(self, sql, params):
+        """Runs a query returning a single value.
+
+        Args:
+            sql (str): The query.
+            params (tuple): Query parameters.
+
+        Returns:
+            The first column of the first row.
+        """
+        connection = self.connect()
+        try:
+            return connection.execute(sql, params).fetchone()[0]
+        finally:
+            connection.close()
+
+    def pnl(self, symbol=None, since_ms=None, until_ms=None):
+        """Calculates the realised profit over a time range.
+
+        Args:
+            symbol (str): Symbol pair to include, None for all symbols.
+            since_ms (int): Start of the time range in ms (inclusive), None for no start.
+            until_ms (int): End of the time range in ms (exclusive), None for no end.
+
+        Returns:
+            float: Total realised profit in fiat.
+        """
+        where, params = _where(symbol, since_ms, until_ms)
+        return self.query_one(f"SELECT COALESCE(SUM(realized_pnl), 0.0) FROM fills{where}", params)
+
+    def trade_count(self, symbol=None, since_ms=None, until_ms=None, side=None):
+        """Counts the fills over a time range.
+
+        Args:
+            symbol (str): Symbol pair to include, None for all symbols.
+            since_ms (int): Start of the time range in ms (inclusive), None for no start.
+            until_ms (int): End of the time range in ms (exclusive), None for no end.
+            side (str): "BUY" or "SELL" to count one side only, None for both.
+
+        Returns:
+            int: Number of fills.
+        """
+        where, params = _where(symbol, since_ms, until_ms)
+        if side is not None:
+            where += " AND side = ?" if where else " WHERE side = ?"
+            params += (side,)
+        return self.query_one(f"SELECT COUNT(*) FROM fills{where}", params)
+
+    def max_drawdown(self, symbol=None, since_ms=None, until_ms=None, trader=None):
+        """Calculates the largest drop in total value from a previous peak, using the status snapshots.
+
+        Each trader (and symbol) has its own balance, so the peaks are tracked per trader and symbol, and the largest
+        drawdown of any of them is returned.
+
+        Args:
+            symbol (str): Symbol pair to include, None for all symbols.
+            since_ms (int): Start of the time range in ms (inclusive), None for no start.
+            until_ms (int): End of the time range in ms (exclusive), None for no end.
+            trader (str): Trader to include, None for all traders.
+
+        Returns:
+            float: Maximum drawdown as a percentage of the peak value (0 if there are no snapshots).
+        """
+        where, params = _where(symbol, since_ms, until_ms, trader)
+        return self.query_one(
+            "SELECT COALESCE(MAX(100.0 * (peak - total_value) / peak), 0.0) FROM ("
+            "SELECT total_value, MAX(total_value) OVER (PARTITION BY trader, symbol ORDER BY time_ms "
+            f"ROWS UNBOUNDED PRECEDING) AS peak FROM status{where}) WHERE peak > 0",
+            params
+        )
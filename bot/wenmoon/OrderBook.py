@@ -0,0 +1,308 @@
+import threading
+import time
+
+# Time to wait before requesting another order book snapshot, doubled after each out of date snapshot up to the
+# maximum, so a book which keeps failing to synchronise does not use up the request weight (a snapshot weighs 50)
+RESYNC_INTERVAL_S = 2.0
+MAX_RESYNC_INTERVAL_S = 60.0
+
+
+class BookSide:
+    """One side of the order book, with price levels kept in a dictionary and sorted when they are read.
+
+    Updates only change the dictionary of quantities, which is O(1). The sorted list of keys is rebuilt the first
+    time it is read after a level was added or removed. The keys are the prices for asks and the negated prices for
+    bids, so the best level is always at index 0.
+
+    Attributes:
+        sign (int): 1 for asks, -1 for bids.
+        quantities (dict): Quantity at each price.
+    """
+
+    def __init__(self, sign):
+        self.sign = sign
+        self.quantities = {}
+        self._keys = []
+
+    def clear(self):
+        self.quantities = {}
+        self._keys = []
+
+    @property
+    def keys(self):
+        """list of float: Sorted level keys, best first."""
+        if self._keys is None:
+            self._keys = sorted(self.sign * price for price in self.quantities)
+        return self._keys
+
+    def set_level(self, price, quantity):
+        """Sets (or removes, for a zero quantity) the quantity at a price level.
+
+        Args:
+            price (float): Level price.
+            quantity (float): New total quantity at the level.
+        """
+        if quantity == 0:
+            if self.quantities.pop(price, None) is not None:
+                self._keys = None
+        else:
+            if price not in self.quantities:
+                self._keys = None
+            self.quantities[price] = quantity
+
+    def best(self):
+        """float: The best price on this side, None if the side is empty."""
+        return self.sign * self.keys[0] if self.keys else None
+
+    def top(self, n):
+        """Gets the best n levels.
+
+        Args:
+            n (int): Number of levels.
+
+        Returns:
+            list of tuple: (price, quantity) for each level, best first.
+        """
+        return [(self.sign * key, self.quantities[self.sign * key]) for key in self.keys[:n]]
+
+    def fill(self, quantity=None, quote_quantity=None):
+        """Walks the levels to estimate a market order fill.
+
+        Exactly one of quantity and quote_quantity should be given.
+
+        Args:
+            quantity (float): Coin quantity to fill.
+            quote_quantity (float): Fiat amount to fill.
+
+        Returns:
+            float: Coin quantity filled.
+            float: Fiat value filled.
+        """
+        filled = 0.0
+        filled_quote = 0.0
+        for key in self.keys:
+            price = self.sign * key
+            available = self.quantities[price]
+            if quantity is not None:
+                take = min(available, quantity - filled)
+            else:
+                take = min(available, (quote_quantity - filled_quote) / price)
+            filled += take
+            filled_quote += take * price
+            if (quantity is not None and filled >= quantity) or \
+                    (quote_quantity is not None and filled_quote >= quote_quantity * (1 - 1e-12)):
+                break
+        return filled, filled_quote
+
+
+class OrderBook:
+    """Local order book for a symbol, kept up to date from the diff depth stream.
+
+    The book is built from a REST snapshot plus the buffered diff events, following the procedure in the Binance
+    documentation. Every diff must continue from the previous one (its first update id must not be past the last
+    applied update id + 1); if a sequence gap is found the book is rebuilt from a new snapshot.
+
+    Snapshots are requested on a background thread, so the websocket thread carries on with the other streams, and
+    the snapshot is applied on the websocket thread with the next diff event. Requests are spaced by the resync
+    interval, which doubles after each out of date snapshot.
+
+    See the following link for managing a local order book:
+    https://github.com/binance/binance-spot-api-docs/blob/master/web-socket-streams.md#how-to-manage-a-local-order-book-correctly
+
+    Attributes:
+        symbol (str): The symbol pair, e.g. "BTCUSDT".
+        binance_client: Instance of the Binance client, used for getting snapshots.
+        snapshot_limit (int): Number of levels requested in each snapshot.
+        bids (BookSide): Bid levels.
+        asks (BookSide): Ask levels.
+        last_update_id (int): Update id of the most recently applied event (None when not synchronised).
+        buffer (list of dict): Diff events received while not synchronised.
+        snapshot (dict): Snapshot fetched by the background thread and not applied yet (None if there is none).
+        fetching (bool): Whether a snapshot request is in flight.
+        last_request_time (float): Monotonic time of the most recent snapshot request.
+        resync_interval_s (float): Time to wait between snapshot requests.
+    """
+
+    def __init__(self, symbol, binance_client, snapshot_limit=1000):
+        """Initialise an empty, unsynchronised book.
+
+        Args:
+            symbol (str): The symbol pair, e.g. "BTCUSDT".
+            binance_client: Instance of the Binance client, used for getting snapshots.
+            snapshot_limit (int): Number of levels requested in each snapshot.
+        """
+        self.symbol = symbol
+        self.binance_client = binance_client
+        self.snapshot_limit = snapshot_limit
+        self.bids = BookSide(-1)
+        self.asks = BookSide(1)
+        self.last_update_id = None
+        self.buffer = []
+        self.snapshot = None
+        self.fetching = False
+        self.last_request_time = None
+        self.resync_interval_s = RESYNC_INTERVAL_S
+
+    @property
+    def is_synced(self):
+        """bool: Whether the book is synchronised with the exchange."""
+        return self.last_update_id is not None
+
+    def resync(self):
+        """Drops the book so it is rebuilt from a new snapshot, requested with the next diff event."""
+        self.last_update_id = None
+        self.buffer = []
+        self.snapshot = None
+
+    def request_snapshot(self):
+        """Starts fetching a REST snapshot on a background thread, unless one is in flight or was requested within the
+        resync interval."""
+        now = time.monotonic()
+        if self.fetching or (self.last_request_time is not None and
+                             now - self.last_request_time < self.resync_interval_s):
+            return
+        self.fetching = True
+        self.last_request_time = now
+        threading.Thread(target=self.fetch_snapshot, name=f"order-book-{self.symbol}", daemon=True).start()
+
+    def fetch_snapshot(self):
+        """Gets a REST snapshot for the websocket thread to apply, run on a background thread."""
+        try:
+            self.snapshot = self.binance_client.get_order_book(symbol=self.symbol, limit=self.snapshot_limit)
+        except Exception as err:
+            print(f"ERROR: order book snapshot for {self.symbol} failed: {err}")
+        finally:
+            self.fetching = False
+
+    def load_snapshot(self, snapshot):
+        """Applies a REST snapshot and the buffered diff events on top of it.
+
+        If the snapshot is older than the buffered events, it is dropped, the events are kept and another snapshot
+        is requested after a longer interval.
+
+        Args:
+            snapshot (dict): The order book snapshot from the REST api.
+        """
+        first_update_id = next((msg["U"] for msg in self.buffer if msg["u"] > snapshot["lastUpdateId"]), None)
+        if first_update_id is not None and first_update_id > snapshot["lastUpdateId"] + 1:
+            self.resync_interval_s = min(2 * self.resync_interval_s, MAX_RESYNC_INTERVAL_S)
+            print(f"Order book snapshot for {self.symbol} is out of date, retrying in {self.resync_interval_s:g}s")
+            return
+        self.resync_interval_s = RESYNC_INTERVAL_S
+
+        self.bids.clear()
+        self.asks.clear()
+        for price, quantity in snapshot["bids"]:
+            self.bids.set_level(float(price), float(quantity))
+        for price, quantity in snapshot["asks"]:
+            self.asks.set_level(float(price), float(quantity))
+        self.last_update_id = snapshot["lastUpdateId"]
+
+        buffered = self.buffer
+        self.buffer = []
+        for msg in buffered:
+            # Drop events already included in the snapshot
+            if msg["u"] > self.last_update_id:
+                self.apply(msg)
+
+    def apply(self, msg):
+        """Applies a diff event to the book.
+
+        Args:
+            msg (dict): The raw depthUpdate message.
+        """
+        for price, quantity in msg["b"]:
+            self.bids.set_level(float(price), float(quantity))
+        for price, quantity in msg["a"]:
+            self.asks.set_level(float(price), float(quantity))
+        self.last_update_id = msg["u"]
+
+    def handle_depth_update(self, data):
+        """Handles a decoded diff depth message from the websocket.
+
+        Args:
+            data (dict): The raw depthUpdate message.
+        """
+        if not self.is_synced:
+            self.buffer.append(data)
+            snapshot, self.snapshot = self.snapshot, None
+            if snapshot is not None:
+                self.load_snapshot(snapshot)
+            if not self.is_synced:
+                self.request_snapshot()
+            return
+
+        # Drop events already applied, every other event must continue from the last applied update id
+        if data["u"] <= self.last_update_id:
+            return
+        if data["U"] > self.last_update_id + 1:
+            print(f"Order book for {self.symbol} missed updates {self.last_update_id + 1} to {data['U'] - 1}, "
+                  f"resynchronising")
+            self.resync()
+            self.buffer.append(data)
+            self.request_snapshot()
+            return
+
+        self.apply(data)
+
+    def best_bid(self):
+        """float: The highest bid price, None if there are no bids."""
+        return self.bids.best()
+
+    def best_ask(self):
+        """float: The lowest ask price, None if there are no asks."""
+        return self.asks.best()
+
+    def mid_price(self):
+        """float: The midpoint between the best bid and ask, None if either side is empty."""
+        if not self.bids.keys or not self.asks.keys:
+            return None
+        return (self.bids.best() + self.asks.best()) / 2
+
+    def top(self, n=5):
+        """Gets the best levels on both sides.
+
+        Args:
+            n (int): Number of levels per side.
+
+        Returns:
+            list of tuple: (price, quantity) bids, best first.
+            list of tuple: (price, quantity) asks, best first.
+        """
+        return self.bids.top(n), self.asks.top(n)
+
+    def vwap(self, side, quantity=None, quote_quantity=None):
+        """Estimates the average fill price of a market order from the visible depth.
+
+        Args:
+            side (str): "buy" (takes the asks) or "sell" (takes the bids).
+            quantity (float): Coin quantity of the order.
+            quote_quantity (float): Fiat amount of the order (instead of a coin quantity).
+
+        Returns:
+            float: Average fill price, None if the visible depth cannot fill the order.
+        """
+        book_side = self.asks if side == "buy" else self.bids
+        filled, filled_quote = book_side.fill(quantity, quote_quantity)
+        target_filled = quantity is None or filled >= quantity * (1 - 1e-12)
+        target_quote = quote_quantity is None or filled_quote >= quote_quantity * (1 - 1e-9)
+        if not filled or not target_filled or not target_quote:
+            return None
+        return filled_quote / filled
+
+    def slippage(self, side, quantity=None, quote_quantity=None):
+        """Estimates the slippage of a market order against the best price.
+
+        Args:
+            side (str): "buy" (takes the asks) or "sell" (takes the bids).
+            quantity (float): Coin quantity of the order.
+            quote_quantity (float): Fiat amount of the order (instead of a coin quantity).
+
+        Returns:
+            float: Slippage as a percentage of the best price (positive means a worse fill), None if unknown.
+        """
+        best = self.best_ask() if side == "buy" else self.best_bid()
+        price = self.vwap(side, quantity, quote_quantity)
+        if best is None or price is None:
+            return None
+        return 100 * (price - best) / best if side == "buy" else 100 * (best - price) / best
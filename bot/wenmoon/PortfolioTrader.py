@@ -0,0 +1,323 @@
+from wenmoon.StrategyRunner import StrategyRunner
+from wenmoon.bot_utils import candle_buffer_length
+from wenmoon.Trader import Trader
+
+CSV_PATH = "portfolio.csv"
+
+# Position attributes kept in a snapshot, the rest come from the configuration
+POSITION_STATE = ("position", "coin_balance", "newest_buy_price", "newest_price", "current_trade_profit", "buy_count",
+                  "sell_count")
+
+
+class Position:
+    """Trading state for a single symbol within the portfolio.
+
+    Attributes:
+        symbol (str): The symbol pair being traded, e.g. "BTCUSDT".
+        coin_symbol (str): The base asset of the pair, e.g. "BTC".
+        strategy (Strategy): The strategy instance used for this symbol.
+        strategy_runner (StrategyRunner): Feeds new candles to the strategy and keeps its indicator state.
+        position (str): The current position for the symbol (options: "long", "short").
+        coin_balance (float): The balance of coin held for this symbol.
+        newest_buy_price (float): The buy price from the most recent buy.
+        newest_price (float): The most recent close price.
+        current_trade_profit (float): The profit from the most recent buy (expressed as a percentage).
+        buy_count (int): Running count of the number of buy trades made.
+        sell_count (int): Running count of the number of sell trades made.
+    """
+    __slots__ = ("symbol", "coin_symbol", "strategy", "strategy_runner", "position", "coin_balance",
+                 "newest_buy_price", "newest_price", "current_trade_profit", "buy_count", "sell_count")
+
+    def __init__(self, symbol, coin_symbol, strategy, max_candles, time_budget_s=0.0):
+        self.symbol = symbol
+        self.coin_symbol = coin_symbol
+        self.strategy = strategy
+        self.strategy_runner = StrategyRunner(strategy, max_candles, time_budget_s, symbol)
+        self.position = "short"
+        self.coin_balance = 0.0
+        self.newest_buy_price = 0.0
+        self.newest_price = 0.0
+        self.current_trade_profit = 0.0
+        self.buy_count = 0
+        self.sell_count = 0
+
+
+class SymbolTrader:
+    """View of the portfolio for a single symbol, so a Bot can drive it the same way as a Trader.
+
+    Attributes:
+        portfolio (PortfolioTrader): The shared portfolio.
+        symbol (str): The symbol pair this view trades.
+    """
+
+    def __init__(self, portfolio, symbol):
+        self.portfolio = portfolio
+        self.symbol = symbol
+
+    @property
+    def strategy_runner(self):
+        """StrategyRunner: The runner of the strategy for this symbol."""
+        return self.portfolio.positions[self.symbol].strategy_runner
+
+    def set_position(self, candles):
+        """Passes the newest candle data for this symbol to the portfolio.
+
+        Args:
+            candles (list of dict): The most recent list of closed historic candles.
+        """
+        self.portfolio.set_position(self.symbol, candles)
+
+    def set_strategy(self, strategy, max_candles, candles):
+        """Swaps in a new strategy for this symbol, without fetching the history again.
+
+        Args:
+            strategy (Strategy): The new strategy.
+            max_candles (int): Candle buffer length for the new strategy.
+            candles (list of dict): The most recent list of closed historic candles for the symbol.
+        """
+        position = self.portfolio.positions[self.symbol]
+        position.strategy = strategy
+        position.strategy_runner.replace_strategy(strategy, max_candles, candles)
+
+
+class PortfolioTrader:
+    """Trades several symbols in one process from a single, shared fiat balance.
+
+    Every symbol has its own strategy and position, and the profit target and stop loss are applied to each position
+    separately. When a strategy goes long, the position is funded with an equal share of the free fiat across the
+    remaining position slots, so capital is never split up front between symbols which are not trading.
+
+    Each closed candle only touches the position for its own symbol, and the fiat value of the holdings is kept up to
+    date incrementally, so the cost per candle does not grow with the number of symbols.
+
+    The portfolio only simulates trades, Config rejects live mode with several pairs.
+
+    Attributes:
+        config (Config): Instance of the Config class - holds settings for the bot.
+        positions (dict): Position for each symbol, keyed by symbol pair.
+        fiat_balance (float): The shared balance of fiat currency available for new positions.
+        holdings_value (float): The fiat value of all coin balances at their most recent close price.
+        max_open_positions (int): Maximum number of long positions held at the same time.
+        open_positions (int): Number of long positions currently held.
+    """
+
+    def __init__(self, config, strategies, coin_symbols):
+        """Initialise the portfolio.
+
+        The portfolio always starts in fiat, with start_balance shared between all symbols.
+
+        Args:
+            config (Config): Instance of the Config class - holds settings for the bot.
+            strategies (dict): Strategy instance for each symbol pair.
+            coin_symbols (dict): Base asset for each symbol pair.
+        """
+        self.config = config
+        self.positions = {
+            symbol: Position(symbol, coin_symbols[symbol], strategy,
+                             candle_buffer_length(strategy, config.max_candles), config.strategy_time_budget_ms / 1000)
+            for symbol, strategy in strategies.items()
+        }
+        self.fiat_balance = config.start_balance
+        self.holdings_value = 0.0
+        self.max_open_positions = config.max_open_positions or len(self.positions)
+        self.open_positions = 0
+
+    def trader_for(self, symbol):
+        """Gets a single-symbol view of the portfolio which can be given to a Bot.
+
+        Args:
+            symbol (str): The symbol pair to trade.
+
+        Returns:
+            SymbolTrader: Trader view for the symbol.
+        """
+        return SymbolTrader(self, symbol)
+
+    def get_state(self):
+        """Gets the shared balance and the state of every position for a snapshot.
+
+        Returns:
+            dict: Picklable portfolio state.
+        """
+        return {
+            "fiat_balance": self.fiat_balance,
+            "open_positions": self.open_positions,
+            "positions": {
+                symbol: {
+                    **{name: getattr(position, name) for name in POSITION_STATE},
+                    "strategy_runner": position.strategy_runner.get_state()
+                }
+                for symbol, position in self.positions.items()
+            }
+        }
+
+    def set_state(self, snapshot):
+        """Restores the state from a snapshot taken by get_state, instead of starting in fiat.
+
+        Symbols which are no longer traded are left out, and their value with them.
+
+        Args:
+            snapshot (dict): Portfolio state from get_state.
+        """
+        self.fiat_balance = snapshot["fiat_balance"]
+        self.holdings_value = 0.0
+        for symbol, position_state in snapshot["positions"].items():
+            position = self.positions.get(symbol)
+            if position is None:
+                print(f"{symbol} is no longer traded, not restoring its position")
+                continue
+            for name in POSITION_STATE:
+                setattr(position, name, position_state[name])
+            position.strategy_runner.set_state(position_state["strategy_runner"])
+            self.holdings_value += position.coin_balance * position.newest_price
+        self.open_positions = sum(position.position == "long" for position in self.positions.values())
+
+    def allocation(self):
+        """Calculates the fiat to spend on the next long position.
+
+        Returns:
+            float: Equal share of the free fiat across the remaining position slots.
+        """
+        free_slots = self.max_open_positions - self.open_positions
+        if free_slots <= 0:
+            return 0.0
+        return self.fiat_balance / free_slots
+
+    def update_price(self, position, price):
+        """Stores the newest price for a position and updates the holdings value and trade profit.
+
+        Args:
+            position (Position): The position to update.
+            price (float): The newest close price.
+        """
+        self.holdings_value += position.coin_balance * (price - position.newest_price)
+        position.newest_price = price
+
+        if position.position == "long":
+            position.current_trade_profit = 100 * (1 - self.config.test_fee) * (price - position.newest_buy_price)\
+                                            / position.newest_buy_price
+        else:
+            position.current_trade_profit = 0.0
+
+    def fake_buy(self, position):
+        """Simulates a buy order for a position, funded from the shared fiat balance.
+
+        Args:
+            position (Position): The position to open.
+        """
+        price = position.newest_price
+        fiat_spent = self.allocation()
+
+        # Calculate coin buy quantity and subtract trading fee
+        coin_buy_quantity = fiat_spent / price
+        coin_buy_quantity *= 1 - self.config.test_fee / 100
+
+        # Make the fake purchase
+        self.fiat_balance -= fiat_spent
+        self.holdings_value += coin_buy_quantity * price
+        position.coin_balance = coin_buy_quantity
+        position.newest_buy_price = price
+        position.buy_count += 1
+
+        print(f"Bought {coin_buy_quantity} {position.coin_symbol} at price of {price} {self.config.fiat_symbol}")
+
+    def fake_sell(self, position):
+        """Simulates a sell order for a position, returning the proceeds to the shared fiat balance.
+
+        Args:
+            position (Position): The position to close.
+        """
+        price = position.newest_price
+
+        # Calculate fiat buy quantity and subtract trading fee
+        fiat_buy_quantity = price * position.coin_balance
+        fiat_buy_quantity *= 1 - self.config.test_fee / 100
+
+        # Make the fake sell
+        self.holdings_value -= position.coin_balance * price
+        self.fiat_balance += fiat_buy_quantity
+        position.coin_balance = 0.0
+        position.sell_count += 1
+
+        print(f"Sold {position.coin_symbol} at price of {price} {self.config.fiat_symbol} for {fiat_buy_quantity}"
+              f" {self.config.fiat_symbol}")
+
+    def buy(self, position):
+        """Function triggered when a long position is requested by the strategy for a symbol (test mode only)."""
+        self.fake_buy(position)
+
+    def sell(self, position):
+        """Function triggered when a short position is requested by the strategy for a symbol (test mode only)."""
+        self.fake_sell(position)
+
+    def set_position(self, symbol, candles):
+        """Main decision function for a single symbol.
+
+        Called when a new candle comes in for the symbol. Follows the same rules as Trader.set_position, but only
+        opens a new long position while a position slot and fiat are available.
+
+        Args:
+            symbol (str): The symbol pair the candles belong to.
+            candles (list of dict): The most recent list of closed historic candles for the symbol.
+        """
+        position = self.positions[symbol]
+        self.update_price(position, candles[-1]["close_price"])
+
+        recommended_action = position.strategy_runner.next_action(candles)
+
+        # Check for exits
+        if position.position == "long":
+            if recommended_action == "sell":
+                print(f"{symbol}: Strategy sell indicator triggered - selling")
+                self.close_position(position)
+            elif self.config.profit_target and position.current_trade_profit >= self.config.profit_target:
+                print(f"{symbol}: Profit target reached - selling")
+                self.close_position(position)
+            elif self.config.stop_loss and position.current_trade_profit <= self.config.stop_loss:
+                print(f"{symbol}: Stop loss reached - selling")
+                self.close_position(position)
+
+        # Check for entries
+        elif recommended_action == "buy" and self.allocation() > 0:
+            print(f"{symbol}: Going long")
+            position.position = "long"
+            self.buy(position)
+            self.open_positions += 1
+
+        self.output_status(position, candles[-1])
+
+    def close_position(self, position):
+        """Moves a position back to fiat.
+
+        Args:
+            position (Position): The position to close.
+        """
+        position.position = "short"
+        self.open_positions -= 1
+        self.sell(position)
+
+        # Clear any rounding drift from the incremental holdings value once everything is back in fiat
+        if not self.open_positions:
+            self.holdings_value = 0.0
+
+    def output_status(self, position, candle):
+        """Outputs a one line status for the symbol and the portfolio, and logs it to the csv file.
+
+        Args:
+            position (Position): The position which has just been updated.
+            candle (dict): The newest candle for the position.
+        """
+        total_value = self.fiat_balance + self.holdings_value
+        print(f"{position.symbol} {position.position:<5} close={position.newest_price} "
+              f"coin={position.coin_balance:,.4e} | fiat={self.fiat_balance:,.4e} "
+              f"open={self.open_positions}/{self.max_open_positions} total={total_value:,.4e} "
+              f"{self.config.fiat_symbol}")
+
+        Trader.write_csv_row({
+            "time": candle["candle_close_time"],
+            "symbol": position.symbol,
+            "fiat_balance": self.fiat_balance,
+            "coin_balance": position.coin_balance,
+            "fiat_value": position.coin_balance * position.newest_price,
+            "total_value": total_value
+        }, CSV_PATH)
@@ -0,0 +1,116 @@
+from datetime import datetime, timezone
+
+from wenmoon.bot_utils import interval_to_milliseconds
+
+
+class Resampler:
+    """Builds candles of a higher interval from a stream of closed lower interval candles.
+
+    Candles are aligned to epoch boundaries (the same boundaries Binance uses), and each input candle is folded into
+    the current bucket in constant time. A bucket is emitted as soon as its last input candle closes. If a candle
+    arrives for a later bucket before the current one has finished (e.g. data was missed), the incomplete bucket is
+    emitted first.
+
+    Attributes:
+        interval (str): The output interval, e.g. "1h".
+        interval_ms (int): The output interval in ms.
+        current (dict): The bucket currently being built, None before the first candle.
+    """
+
+    def __init__(self, interval):
+        """Initialise the resampler.
+
+        Args:
+            interval (str): The output interval, e.g. "1h".
+        """
+        self.interval = interval
+        self.interval_ms = interval_to_milliseconds(interval)
+        self.current = None
+
+    def update(self, candle):
+        """Adds a closed input candle.
+
+        Args:
+            candle (dict): Human readable closed candle of the input interval.
+
+        Returns:
+            list of dict: Higher interval candles closed by this input (usually empty or a single candle).
+        """
+        closed = []
+        bucket_start = candle["candle_start_time_ms"] - candle["candle_start_time_ms"] % self.interval_ms
+        current = self.current
+
+        if current is not None and current["candle_start_time_ms"] != bucket_start:
+            # The previous bucket never received its final candle
+            closed.append(current)
+            current = None
+
+        if current is None:
+            bucket_close = bucket_start + self.interval_ms - 1
+            current = {
+                "candle_start_time_ms": bucket_start,
+                "candle_start_time": str(datetime.fromtimestamp(bucket_start/1000, tz=timezone.utc)),
+                "open_price": candle["open_price"],
+                "high_price": candle["high_price"],
+                "low_price": candle["low_price"],
+                "close_price": candle["close_price"],
+                "volume": candle["volume"],
+                "candle_close_time_ms": bucket_close,
+                "candle_close_time": str(datetime.fromtimestamp(bucket_close/1000, tz=timezone.utc)),
+                "quote_asset_volume": candle["quote_asset_volume"],
+                "number_of_trades": candle["number_of_trades"],
+                "taker_buy_base_asset_volume": candle["taker_buy_base_asset_volume"],
+                "taker_buy_quote_asset_volume": candle["taker_buy_quote_asset_volume"],
+                "interval": self.interval
+            }
+        else:
+            current["high_price"] = max(current["high_price"], candle["high_price"])
+            current["low_price"] = min(current["low_price"], candle["low_price"])
+            current["close_price"] = candle["close_price"]
+            current["volume"] += candle["volume"]
+            current["quote_asset_volume"] += candle["quote_asset_volume"]
+            current["number_of_trades"] += candle["number_of_trades"]
+            current["taker_buy_base_asset_volume"] += candle["taker_buy_base_asset_volume"]
+            current["taker_buy_quote_asset_volume"] += candle["taker_buy_quote_asset_volume"]
+
+        if candle["candle_close_time_ms"] >= current["candle_close_time_ms"]:
+            closed.append(current)
+            current = None
+
+        self.current = current
+        return closed
+
+
+class TimeframeFeed:
+    """Shares one closed candle stream between all the higher timeframes built from it.
+
+    Attributes:
+        resamplers (dict): Resampler for each subscribed interval.
+        subscribers (dict): List of callback functions for each subscribed interval.
+    """
+
+    def __init__(self):
+        self.resamplers = {}
+        self.subscribers = {}
+
+    def subscribe(self, interval, callback):
+        """Registers a function to call with each closed candle of an interval.
+
+        Args:
+            interval (str): The interval to build, e.g. "1h".
+            callback (callable): Function called with each closed candle of the interval.
+        """
+        if interval not in self.resamplers:
+            self.resamplers[interval] = Resampler(interval)
+        self.subscribers.setdefault(interval, []).append(callback)
+
+    def add_candle(self, candle):
+        """Passes a closed input candle to every resampler, and notifies subscribers of closed candles.
+
+        Args:
+            candle (dict): Human readable closed candle of the input interval.
+        """
+        for interval, resampler in self.resamplers.items():
+            for closed in resampler.update(candle):
+                for callback in self.subscribers[interval]:
+                    callback(closed)
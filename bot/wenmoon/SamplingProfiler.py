@@ -0,0 +1,107 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """Statistical profiler which samples the stack of one thread while it is running a strategy.
+
+    A background thread looks at the target thread's current frame at a fixed interval, so the strategy itself is
+    not slowed down by tracing, and the profiler can be started and stopped in a running bot.
+
+    Attributes:
+        name (str): Name of the profiled strategy, for the report.
+        get_thread_id (callable): Returns the id of the thread currently running the strategy, or None when idle.
+        interval_s (float): Time between samples in seconds.
+        root_code (code): Code object of the outermost function to count, frames calling it are left out of the
+            report (None to count the whole stack).
+        inclusive (collections.Counter): Samples in which each function was on the stack.
+        exclusive (collections.Counter): Samples in which each function was running itself.
+        samples (int): Number of samples taken while the strategy was running.
+    """
+
+    def __init__(self, name, get_thread_id, interval_s=0.005, root_code=None):
+        self.name = name
+        self.get_thread_id = get_thread_id
+        self.interval_s = interval_s
+        self.root_code = root_code
+        self.inclusive = Counter()
+        self.exclusive = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        """bool: Whether the profiler is sampling."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration_s=None, on_finish=None):
+        """Starts sampling in a background thread.
+
+        Args:
+            duration_s (float): Stop automatically after this many seconds (None to run until stop is called).
+            on_finish (callable): Called with the profiler after it stops, e.g. to print the report.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(duration_s, on_finish), daemon=True,
+                                        name=f"profiler-{self.name}")
+        self._thread.start()
+
+    def stop(self):
+        """Stops sampling, the on_finish callback runs in the sampling thread."""
+        self._stop.set()
+
+    def _run(self, duration_s, on_finish):
+        deadline = time.monotonic() + duration_s if duration_s else None
+        while not self._stop.wait(self.interval_s):
+            self.sample()
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        if on_finish:
+            on_finish(self)
+
+    def sample(self):
+        """Records the stack of the target thread, if it is running the strategy."""
+        thread_id = self.get_thread_id()
+        frame = sys._current_frames().get(thread_id) if thread_id is not None else None
+        if frame is None:
+            return
+
+        self.samples += 1
+        self.exclusive[self._describe(frame)] += 1
+        seen = set()
+        while frame is not None:
+            function = self._describe(frame)
+            # Count recursive functions once per sample
+            if function not in seen:
+                seen.add(function)
+                self.inclusive[function] += 1
+            if frame.f_code is self.root_code:
+                break
+            frame = frame.f_back
+
+    @staticmethod
+    def _describe(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def report(self, top=15):
+        """Formats the functions with the most samples.
+
+        Args:
+            top (int): Number of functions to list.
+
+        Returns:
+            str: Multi-line report of inclusive and exclusive sample percentages.
+        """
+        lines = [f"Profile of {self.name}: {self.samples} samples every {1000 * self.interval_s:g}ms"]
+        if not self.samples:
+            return "\n".join(lines)
+        lines.append(f"  {'incl':>6} {'excl':>6}  function")
+        for function, count in self.inclusive.most_common(top):
+            lines.append(f"  {100 * count / self.samples:5.1f}% {100 * self.exclusive[function] / self.samples:5.1f}%"
+                         f"  {function}")
+        return "\n".join(lines)
@@ -0,0 +1,111 @@
+import os
+import pickle
+import time
+
+# Increased whenever the layout of the snapshot changes, older snapshots are then ignored
+SNAPSHOT_VERSION = 2
+
+
+class Snapshot:
+    """Saves the state of all bots to a binary file at regular intervals, and restores it on startup.
+
+    The snapshot holds the candle buffers, the strategies' incremental indicator state and attributes, and the
+    positions, balances and trade counts of the traders (or the portfolio), so a restarted bot carries on where it
+    stopped. After a restore each bot only fetches the candles which closed since the snapshot.
+
+    The state is pickled to a temporary file which then replaces the snapshot, so a crash while saving leaves the
+    previous snapshot intact. poll is called after every websocket message, so the state is saved on the websocket
+    thread, between messages, and is consistent across the bots.
+
+    Attributes:
+        config (Config): The running configuration, for snapshot_path and snapshot_interval_s.
+        bots (list of Bot): The bots to save and restore.
+        portfolio (PortfolioTrader): The portfolio shared by the bots (None without a portfolio).
+        last_save (float): Monotonic time of the most recent save.
+    """
+
+    def __init__(self, config, bots, portfolio=None):
+        """Initialise the snapshot.
+
+        Args:
+            config (Config): The running configuration.
+            bots (list of Bot): The bots to save and restore.
+            portfolio (PortfolioTrader): The portfolio shared by the bots (None without a portfolio).
+        """
+        self.config = config
+        self.bots = bots
+        self.portfolio = portfolio
+        self.last_save = time.monotonic()
+
+    @staticmethod
+    def bot_key(bot):
+        """Gets the name a bot's state is saved under.
+
+        Args:
+            bot (Bot): The bot.
+
+        Returns:
+            str: The bot name, or the symbol pair without bot sections.
+        """
+        return bot.config.name or bot.symbol
+
+    def poll(self):
+        """Saves the state if snapshot_interval_s has passed since the last save."""
+        if not self.config.snapshot_path or not self.config.snapshot_interval_s:
+            return
+        if time.monotonic() - self.last_save >= self.config.snapshot_interval_s:
+            self.save()
+
+    def save(self):
+        """Writes the state of every bot to the snapshot file, replacing the previous snapshot atomically."""
+        self.last_save = time.monotonic()
+        state = {
+            "version": SNAPSHOT_VERSION,
+            "time_ms": int(time.time() * 1000),
+            "bots": {self.bot_key(bot): bot.get_state() for bot in self.bots},
+            "portfolio": self.portfolio.get_state() if self.portfolio else None
+        }
+
+        path = self.config.snapshot_path
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                pickle.dump(state, file, pickle.HIGHEST_PROTOCOL)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, path)
+        except (OSError, pickle.PicklingError) as err:
+            print(f"Could not save the snapshot to {path}: {err}")
+
+    def restore(self):
+        """Restores the state of the bots from the snapshot file, if there is one.
+
+        Bots which are not in the snapshot, or whose candles do not match, start from their history as usual.
+
+        Returns:
+            bool: Whether a snapshot was restored.
+        """
+        path = self.config.snapshot_path
+        if not path or not os.path.exists(path):
+            return False
+
+        try:
+            with open(path, "rb") as file:
+                state = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as err:
+            print(f"Could not read the snapshot {path}, getting full history: {err}")
+            return False
+        if not isinstance(state, dict) or state.get("version") != SNAPSHOT_VERSION:
+            print(f"Snapshot {path} is from another version, getting full history")
+            return False
+
+        if self.portfolio and state["portfolio"]:
+            self.portfolio.set_state(state["portfolio"])
+        for bot in self.bots:
+            bot_state = state["bots"].get(self.bot_key(bot))
+            if bot_state is not None:
+                bot.set_state(bot_state)
+
+        age_s = (time.time() * 1000 - state["time_ms"]) / 1000
+        print(f"Restored the snapshot from {path}, saved {age_s:.0f}s ago")
+        return True
@@ -0,0 +1,46 @@
+import time
+
+
+class StartupTimer:
+    """Measures how long each startup phase takes, up to the first websocket subscription.
+
+    Attributes:
+        start (float): perf_counter time the timer was created.
+        last (float): perf_counter time the previous phase ended.
+        phases (list of tuple): Name and duration in seconds of each finished phase.
+        reported (bool): Whether the report has been printed.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+        self.reported = False
+
+    def mark(self, phase):
+        """Ends a phase, which started when the previous phase ended.
+
+        Args:
+            phase (str): Name of the phase.
+        """
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self, target_ms=None):
+        """Prints the duration of each phase and the total, once.
+
+        Args:
+            target_ms (float): Startup time to compare the total with (None for no comparison).
+        """
+        if self.reported:
+            return
+        self.reported = True
+
+        total_ms = 1000 * (self.last - self.start)
+        print(" Startup ".center(72, "-"))
+        for phase, duration in self.phases:
+            print(f" {phase:<50} {1000 * duration:>10.1f} ms")
+        target = f" (target {target_ms:g} ms)" if target_ms else ""
+        print(f" {'Total':<50} {total_ms:>10.1f} ms{target}")
+        print("-" * 72)
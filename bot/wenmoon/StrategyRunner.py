@@ -0,0 +1,311 @@
+import pickle
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from wenmoon.LatencyHistogram import LatencyHistogram
+from wenmoon.bot_utils import candle_order_key
+
+# Strategy attributes which come from the configuration rather than the candles, so are not kept in a snapshot
+CONFIGURATION_FIELDS = ("symbol_info", "parameters")
+
+
+class ScoutAdapter:
+    """Runs a strategy with the scout(historical_candles) interface through the incremental interface.
+
+    The state is a rolling buffer of the most recent candles, and scout is called on it for each new candle, so the
+    strategy sees the same candle list as before.
+
+    Attributes:
+        strategy (Strategy): The wrapped strategy, with a scout method.
+        max_candles (int): Number of candles kept in the buffer.
+    """
+
+    def __init__(self, strategy, max_candles):
+        """Initialise the adapter.
+
+        Args:
+            strategy (Strategy): The strategy to wrap, with a scout method.
+            max_candles (int): Number of candles kept in the buffer.
+        """
+        self.strategy = strategy
+        self.max_candles = max_candles
+
+    def new_state(self):
+        """Creates the state for a new candle series.
+
+        Returns:
+            collections.deque: Empty candle buffer.
+        """
+        return deque(maxlen=self.max_candles)
+
+    def warm_up(self, candle, state):
+        """Adds a historical candle to the buffer without evaluating the strategy.
+
+        Args:
+            candle (dict): Human readable closed candle.
+            state (collections.deque): Candle buffer.
+        """
+        state.append(candle)
+
+    def on_candle(self, candle, state):
+        """Adds a closed candle to the buffer and scouts the whole buffer.
+
+        Args:
+            candle (dict): Human readable closed candle.
+            state (collections.deque): Candle buffer.
+
+        Returns:
+            string: The position chosen by the strategy (options: "none", "buy", "sell")
+        """
+        state.append(candle)
+        return self.strategy.scout(list(state))
+
+
+class StrategyRunner:
+    """Feeds closed candles to a strategy through the incremental interface, and keeps its state.
+
+    Strategies opt into the incremental interface by defining:
+
+    - new_state(): returns the persistent indicator state for a new candle series,
+    - on_candle(candle, state): updates the state with a closed candle and returns the recommended action,
+    - warm_up(candle, state) (optional): updates the state with a historical candle without evaluating,
+    - state_key() (optional): the parameters the state depends on, so it is kept when the strategy is replaced by one
+      with the same key,
+    - close() (optional): releases worker threads or processes when the strategy is replaced.
+
+    The per-candle cost of such a strategy does not depend on the candle buffer length. Strategies which only define
+    scout are wrapped in a ScoutAdapter.
+
+    Only candles newer than the last one fed are passed on, so the full candle buffer can be given on every call:
+    the first call warms the state up from the history, later calls add the newest candle (or every candle recovered
+    after a reconnect).
+
+    The duration of every evaluation (on_candle, or scout through the adapter) is recorded in a latency histogram.
+    With a time budget, evaluations run in a worker thread and the runner waits at most the budget for the action,
+    falling back to "none" so a slow strategy cannot hold up the websocket thread. A call which overruns keeps
+    running in the worker (Python threads cannot be interrupted), and new candles are held back until it finishes,
+    then fed together so the indicator state does not miss any.
+
+    Attributes:
+        strategy: The strategy, or a ScoutAdapter around it.
+        state: The strategy's persistent indicator state.
+        last_candle_key (tuple): candle_order_key of the newest candle fed to the strategy (None before the first).
+        name (str): Name of the runner for logging, e.g. the symbol.
+        time_budget_s (float): Maximum time to wait for an evaluation in seconds (0 for no budget).
+        latency (LatencyHistogram): Duration of every evaluation.
+        overruns (int): Number of evaluations which exceeded the time budget.
+        active_thread_id (int): Id of the thread running an evaluation, None while idle (used by the profiler).
+        executor (ThreadPoolExecutor): Single worker for evaluations with a time budget (None without a budget).
+        pending (Future): Evaluation still running after overrunning its budget.
+    """
+
+    def __init__(self, strategy, max_candles, time_budget_s=0.0, name=""):
+        """Initialise the runner.
+
+        Args:
+            strategy (Strategy): The strategy to run.
+            max_candles (int): Candle buffer length for strategies run through a ScoutAdapter.
+            time_budget_s (float): Maximum time to wait for an evaluation in seconds (0 for no budget).
+            name (str): Name of the runner for logging, e.g. the symbol.
+        """
+        self.strategy = strategy if hasattr(strategy, "on_candle") else ScoutAdapter(strategy, max_candles)
+        self.state = self.strategy.new_state()
+        self.last_candle_key = None
+        self.name = name
+        self.time_budget_s = time_budget_s
+        self.latency = LatencyHistogram()
+        self.overruns = 0
+        self.active_thread_id = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="strategy") if time_budget_s else None
+        self.pending = None
+
+    @property
+    def is_incremental(self):
+        """bool: Whether the strategy implements the incremental interface itself."""
+        return not isinstance(self.strategy, ScoutAdapter)
+
+    @property
+    def base_strategy(self):
+        """Strategy: The strategy itself, without the ScoutAdapter."""
+        return self.strategy.strategy if isinstance(self.strategy, ScoutAdapter) else self.strategy
+
+    def next_action(self, candles):
+        """Feeds the candles not seen yet to the strategy and gets the action for the newest one.
+
+        Args:
+            candles (list of dict): The most recent list of closed historic candles.
+
+        Returns:
+            string: The position chosen by the strategy (options: "none", "buy", "sell")
+        """
+        if self.pending is not None:
+            if not self.pending.done():
+                print(f"{self.name}: strategy still running past its time budget, holding back the new candle")
+                return "none"
+            self.pending = None
+
+        # Walk back to the first candle which has not been fed yet
+        first_new = len(candles)
+        while first_new > 0 and (self.last_candle_key is None or
+                                 candle_order_key(candles[first_new - 1]) > self.last_candle_key):
+            first_new -= 1
+
+        new_candles = candles[first_new:]
+        if not new_candles:
+            return "none"
+
+        self.last_candle_key = candle_order_key(new_candles[-1])
+        if not self.time_budget_s:
+            return self.evaluate(new_candles)
+
+        future = self.executor.submit(self.evaluate, new_candles)
+        try:
+            return future.result(timeout=self.time_budget_s)
+        except TimeoutError:
+            self.pending = future
+            self.overruns += 1
+            print(f"{self.name}: strategy exceeded its time budget of {1000 * self.time_budget_s:g}ms, "
+                  f"using action none ({self.overruns} overruns)")
+            return "none"
+
+    def evaluate(self, new_candles):
+        """Feeds candles to the strategy and records how long the newest one took.
+
+        Args:
+            new_candles (list of dict): Closed candles not fed yet, oldest first.
+
+        Returns:
+            string: The position chosen by the strategy (options: "none", "buy", "sell")
+        """
+        # The strategy may be replaced while an overrunning evaluation is still running, keep using the old one
+        strategy, state = self.strategy, self.state
+        warm_up = getattr(strategy, "warm_up", strategy.on_candle)
+        for candle in new_candles[:-1]:
+            warm_up(candle, state)
+
+        self.active_thread_id = threading.get_ident()
+        start = time.perf_counter()
+        try:
+            return strategy.on_candle(new_candles[-1], state)
+        finally:
+            self.latency.record(time.perf_counter() - start)
+            self.active_thread_id = None
+
+    def set_time_budget(self, time_budget_s):
+        """Changes the time budget, e.g. after the settings are reloaded.
+
+        Args:
+            time_budget_s (float): Maximum time to wait for an evaluation in seconds (0 for no budget).
+        """
+        self.time_budget_s = time_budget_s
+        if time_budget_s and self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="strategy")
+
+    def replace_strategy(self, strategy, max_candles, candles):
+        """Swaps in a new strategy, keeping the indicator state where the new strategy can use it.
+
+        A strategy run through a ScoutAdapter keeps the candle buffer. An incremental strategy keeps the state when
+        it is the same class as the old one and declares the same state_key(), e.g. when only a threshold changed.
+        Otherwise the state is rebuilt from the candles already fed, so no history needs to be fetched. The old
+        strategy's close() is called if it has one, to release its workers.
+
+        Args:
+            strategy (Strategy): The new strategy.
+            max_candles (int): Candle buffer length for a strategy run through a ScoutAdapter.
+            candles (list of dict): The most recent list of closed historic candles.
+        """
+        old_strategy = self.base_strategy
+        if old_strategy is not strategy and hasattr(old_strategy, "close"):
+            # An evaluation which overran its budget may still be using the old strategy
+            if self.pending is not None and not self.pending.done():
+                self.pending.add_done_callback(lambda future: old_strategy.close())
+            else:
+                old_strategy.close()
+        seen_candles = [
+            candle for candle in candles
+            if self.last_candle_key is not None and candle_order_key(candle) <= self.last_candle_key
+        ]
+
+        if not hasattr(strategy, "on_candle"):
+            buffer = self.state if isinstance(self.strategy, ScoutAdapter) else seen_candles
+            self.strategy = ScoutAdapter(strategy, max_candles)
+            self.state = deque(buffer, maxlen=max_candles)
+            return
+
+        same_state = type(old_strategy) is type(strategy) and hasattr(strategy, "state_key") and \
+            old_strategy.state_key() == strategy.state_key()
+        self.strategy = strategy
+        if not same_state:
+            self.state = strategy.new_state()
+            warm_up = getattr(strategy, "warm_up", strategy.on_candle)
+            for candle in seen_candles:
+                warm_up(candle, self.state)
+
+    def strategy_identity(self):
+        """Gets what the strategy's state depends on, to check a snapshot belongs to the same strategy.
+
+        Returns:
+            tuple: Module and class name of the strategy, and its parameter values (None without parameters).
+        """
+        strategy = self.base_strategy
+        parameters = getattr(strategy, "parameters", None)
+        return type(strategy).__module__, type(strategy).__qualname__, getattr(parameters, "values", None)
+
+    def get_state(self):
+        """Gets the indicator state and the strategy's own attributes (e.g. long_stop_prev) for a snapshot.
+
+        Attributes which cannot be pickled, such as worker pools, are left out.
+
+        Returns:
+            dict: Picklable runner state (None while an evaluation is still running past its time budget).
+        """
+        if self.pending is not None and not self.pending.done():
+            return None
+
+        fields = {}
+        for name, value in vars(self.base_strategy).items():
+            if name in CONFIGURATION_FIELDS:
+                continue
+            try:
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                continue
+            fields[name] = value
+
+        return {
+            "strategy": self.strategy_identity(),
+            "fields": fields,
+            "state": self.state,
+            "last_candle_key": self.last_candle_key
+        }
+
+    def set_state(self, snapshot):
+        """Restores the state from a snapshot taken by get_state.
+
+        A snapshot of a different strategy, or of the same strategy with other parameters, is not restored. The
+        state is then warmed up from the candles on the next call to next_action.
+
+        Args:
+            snapshot (dict): Runner state from get_state (None if it was not taken).
+
+        Returns:
+            bool: Whether the state was restored.
+        """
+        if snapshot is None:
+            print(f"{self.name}: no strategy state in the snapshot, warming it up from the candles")
+            return False
+        if snapshot["strategy"] != self.strategy_identity():
+            print(f"{self.name}: strategy changed since the snapshot, warming it up from the candles")
+            return False
+
+        strategy = self.base_strategy
+        for name, value in snapshot["fields"].items():
+            setattr(strategy, name, value)
+        state = snapshot["state"]
+        if isinstance(self.strategy, ScoutAdapter):
+            state = deque(state, maxlen=self.strategy.max_candles)
+        self.state = state
+        self.last_candle_key = snapshot["last_candle_key"]
+        return True
@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+
+import websocket
+
+STREAM_URL = "wss://stream.binance.com:9443/stream"
+
+# Time to wait before reconnecting after the websocket closes
+RECONNECT_DELAY_S = 10
+
+
+class StreamMux:
+    """Runs several Binance market streams over a single combined websocket connection.
+
+    Each message on a combined stream is wrapped as {"stream": <stream name>, "data": <raw payload>}, so the payload
+    is routed to the handlers registered for its stream name.
+
+    See the following link for combined streams:
+    https://github.com/binance/binance-spot-api-docs/blob/master/web-socket-streams.md#general-wss-information
+
+    Attributes:
+        stream_url (str): Base url for combined streams.
+        handlers (dict): List of handler functions for each stream name.
+        open_handlers (list of callable): Functions called whenever the connection (re)opens.
+        poll_handlers (list of callable): Functions called after every message.
+        stopped (threading.Event): Set by stop, ends the reconnect loop.
+    """
+
+    def __init__(self, stream_url=STREAM_URL):
+        """Initialise the multiplexer.
+
+        Args:
+            stream_url (str): Base url for combined streams.
+        """
+        self.stream_url = stream_url
+        self.handlers = {}
+        self.open_handlers = []
+        self.poll_handlers = []
+        self.ws = None
+        self.request_id = 0
+        self.stopped = threading.Event()
+
+    def subscribe(self, stream, handler):
+        """Registers a handler for a stream.
+
+        Several handlers can share a stream, the stream is only subscribed to once.
+
+        Args:
+            stream (str): Stream name (case-sensitive), e.g. "btcusdt@kline_1m".
+            handler (callable): Function called with the decoded payload of each message on the stream.
+        """
+        self.handlers.setdefault(stream, []).append(handler)
+
+    def add_stream(self, stream, handler):
+        """Registers a handler for a stream and subscribes to it on the open connection, without reconnecting.
+
+        If the websocket is not connected, the stream is included in the url of the next connection.
+
+        Args:
+            stream (str): Stream name (case-sensitive), e.g. "btcusdt@bookTicker".
+            handler (callable): Function called with the decoded payload of each message on the stream.
+        """
+        is_new = stream not in self.handlers
+        self.subscribe(stream, handler)
+        if is_new:
+            self.send_method("SUBSCRIBE", [stream])
+
+    def remove_stream(self, stream, handler):
+        """Removes a handler, and unsubscribes from the stream on the open connection once it has no handlers left.
+
+        Args:
+            stream (str): Stream name (case-sensitive), e.g. "btcusdt@bookTicker".
+            handler (callable): The handler passed to add_stream.
+        """
+        handlers = self.handlers.get(stream, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers and self.handlers.pop(stream, None) is not None:
+            self.send_method("UNSUBSCRIBE", [stream])
+
+    def send_method(self, method, params):
+        """Sends a live subscription request on the open connection.
+
+        The response ({"result": null, "id": <id>}) has no stream name, so handle_message ignores it.
+
+        See the following link for live subscribing:
+        https://github.com/binance/binance-spot-api-docs/blob/master/web-socket-streams.md#live-subscribingunsubscribing-to-streams
+
+        Args:
+            method (str): "SUBSCRIBE" or "UNSUBSCRIBE".
+            params (list of str): Stream names.
+        """
+        if self.ws is None or not self.ws.sock or not self.ws.sock.connected:
+            return
+        self.request_id += 1
+        self.ws.send(json.dumps({"method": method, "params": params, "id": self.request_id}))
+
+    def add_open_handler(self, handler):
+        """Registers a function to call whenever the websocket connection opens.
+
+        Args:
+            handler (callable): Function called without arguments.
+        """
+        self.open_handlers.append(handler)
+
+    def add_poll_handler(self, handler):
+        """Registers a function to call after every message, on the websocket thread, e.g. to check for changes.
+
+        Args:
+            handler (callable): Function called without arguments, should return quickly when there is nothing to do.
+        """
+        self.poll_handlers.append(handler)
+
+    @property
+    def url(self):
+        """str: The combined stream url for all subscribed streams."""
+        return f"{self.stream_url}?streams={'/'.join(self.handlers)}"
+
+    def handle_message(self, message):
+        """Routes a combined stream message to the handlers for its stream.
+
+        Args:
+            message (str): The raw message received from the websocket.
+        """
+        msg = json.loads(message)
+        for handler in self.handlers.get(msg.get("stream"), ()):
+            handler(msg["data"])
+
+        for handler in self.poll_handlers:
+            handler()
+
+    def on_open(self, ws):
+        """Called when the websocket is opened, passes the event on to the open handlers.
+
+        Args:
+            ws: Websocket instance
+        """
+        print("Starting bot")
+        for handler in self.open_handlers:
+            handler()
+
+    def on_message(self, ws, message):
+        """Called when the websocket receives a message.
+
+        Args:
+            ws: Websocket instance
+            message (str): The decoded message received from the websocket
+        """
+        self.handle_message(message)
+
+    @staticmethod
+    def on_error(ws, error):
+        """Called when the websocket encounters an error.
+
+        After an error, the websocket is automatically closed, and the on_close function is called.
+
+        Args:
+            ws: Websocket instance
+            error (str): Error message
+        """
+        print(f"ERROR: {error}")
+
+    @staticmethod
+    def on_close(ws, close_status_code, close_msg):
+        """Called when the websocket closes, the connection is retried by run_forever.
+
+        Args:
+            ws: Websocket instance
+            close_status_code (str):
+            close_msg (str):
+        """
+        print("Websocket closed")
+        print(f"Closing with status code {close_status_code}")
+        print("Retry : %s" % time.ctime())
+
+    def run_forever(self):
+        """Connects to the combined stream and keeps reconnecting every 10 seconds if the connection closes, until
+        stop is called."""
+        while not self.stopped.is_set():
+            print(f"Watching prices on {self.url}")
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self.on_open,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close
+            )
+            self.ws.run_forever()
+            self.stopped.wait(RECONNECT_DELAY_S)
+
+    def stop(self):
+        """Closes the connection and ends run_forever, e.g. from a signal handler."""
+        self.stopped.set()
+        if self.ws is not None:
+            self.ws.close()
+
+    def start(self):
+        """Runs the websocket on a daemon thread.
+
+        Returns:
+            threading.Thread: The websocket thread.
+        """
+        thread = threading.Thread(target=self.run_forever, daemon=True)
+        thread.start()
+        return thread
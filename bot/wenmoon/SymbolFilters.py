@@ -0,0 +1,258 @@
+import json
+import os
+import time
+
+# NumPy is imported by the methods which use it, so parsing exchangeInfo at startup does not wait for it
+
+
+def _decimals(step):
+    """Gets the number of decimal places in a step size string from exchangeInfo.
+
+    Args:
+        step (str): Step size, e.g. "0.01000000".
+
+    Returns:
+        int: Number of significant decimal places, e.g. 2.
+    """
+    step = step.rstrip("0")
+    return len(step.split(".")[1]) if "." in step else 0
+
+
+def _as_result(values):
+    """Returns a plain float for scalar input, and the array otherwise."""
+    import numpy as np
+    return float(values) if np.ndim(values) == 0 else values
+
+
+class SymbolFilters:
+    """Numeric trading rules for a single symbol, parsed once from exchangeInfo.
+
+    Binance returns the filter values as strings inside a list of filter dicts. These are converted to floats once, so
+    order checks and rounding do not need to scan the filter list again.
+
+    See the following link for the filter definitions:
+    https://github.com/binance/binance-spot-api-docs/blob/master/filters.md
+
+    Attributes:
+        symbol (str): The symbol pair, e.g. "BTCUSDT".
+        symbol_info (dict): The raw symbol information from exchangeInfo.
+        base_asset (str): The coin being traded, e.g. "BTC".
+        quote_asset (str): The currency it is priced in, e.g. "USDT".
+        tick_size (float): Price increment (PRICE_FILTER).
+        min_price (float): Minimum order price (PRICE_FILTER).
+        max_price (float): Maximum order price (PRICE_FILTER).
+        price_decimals (int): Number of decimal places in the tick size.
+        step_size (float): Quantity increment (LOT_SIZE).
+        min_qty (float): Minimum order quantity (LOT_SIZE).
+        max_qty (float): Maximum order quantity (LOT_SIZE).
+        quantity_decimals (int): Number of decimal places in the step size.
+        market_step_size (float): Quantity increment for market orders (MARKET_LOT_SIZE).
+        market_min_qty (float): Minimum quantity for market orders (MARKET_LOT_SIZE).
+        market_max_qty (float): Maximum quantity for market orders (MARKET_LOT_SIZE).
+        min_notional (float): Minimum order value in the quote asset (MIN_NOTIONAL or NOTIONAL).
+        max_num_orders (int): Maximum number of open orders (MAX_NUM_ORDERS).
+        max_num_algo_orders (int): Maximum number of open stop orders (MAX_NUM_ALGO_ORDERS).
+    """
+    __slots__ = ("symbol", "symbol_info", "base_asset", "quote_asset", "tick_size", "min_price", "max_price",
+                 "price_decimals", "step_size", "min_qty", "max_qty", "quantity_decimals", "market_step_size",
+                 "market_min_qty", "market_max_qty", "min_notional", "max_num_orders", "max_num_algo_orders")
+
+    def __init__(self, symbol_info):
+        """Parses the filters for a symbol.
+
+        Filters which are not set for the symbol are left at values which never restrict an order.
+
+        Args:
+            symbol_info (dict): The symbol information from exchangeInfo (or get_symbol_info).
+        """
+        self.symbol = symbol_info["symbol"]
+        self.symbol_info = symbol_info
+        self.base_asset = symbol_info.get("baseAsset")
+        self.quote_asset = symbol_info.get("quoteAsset")
+        self.tick_size = 0.0
+        self.min_price = 0.0
+        self.max_price = float("inf")
+        self.price_decimals = 8
+        self.step_size = 0.0
+        self.min_qty = 0.0
+        self.max_qty = float("inf")
+        self.quantity_decimals = 8
+        self.market_step_size = 0.0
+        self.market_min_qty = 0.0
+        self.market_max_qty = float("inf")
+        self.min_notional = 0.0
+        self.max_num_orders = 0
+        self.max_num_algo_orders = 0
+
+        for symbol_filter in symbol_info["filters"]:
+            filter_type = symbol_filter["filterType"]
+            if filter_type == "PRICE_FILTER":
+                self.tick_size = float(symbol_filter["tickSize"])
+                self.min_price = float(symbol_filter["minPrice"])
+                self.max_price = float(symbol_filter["maxPrice"]) or float("inf")
+                self.price_decimals = _decimals(symbol_filter["tickSize"])
+            elif filter_type == "LOT_SIZE":
+                self.step_size = float(symbol_filter["stepSize"])
+                self.min_qty = float(symbol_filter["minQty"])
+                self.max_qty = float(symbol_filter["maxQty"])
+                self.quantity_decimals = _decimals(symbol_filter["stepSize"])
+            elif filter_type == "MARKET_LOT_SIZE":
+                self.market_step_size = float(symbol_filter["stepSize"])
+                self.market_min_qty = float(symbol_filter["minQty"])
+                self.market_max_qty = float(symbol_filter["maxQty"]) or float("inf")
+            elif filter_type in ("MIN_NOTIONAL", "NOTIONAL"):
+                self.min_notional = float(symbol_filter["minNotional"])
+            elif filter_type == "MAX_NUM_ORDERS":
+                self.max_num_orders = int(symbol_filter["maxNumOrders"])
+            elif filter_type == "MAX_NUM_ALGO_ORDERS":
+                self.max_num_algo_orders = int(symbol_filter["maxNumAlgoOrders"])
+
+    def round_price(self, prices):
+        """Rounds prices to the nearest tick.
+
+        Args:
+            prices (float or array_like): Price or prices to round.
+
+        Returns:
+            float or numpy.ndarray: The rounded price(s), a float for scalar input.
+        """
+        import numpy as np
+
+        prices = np.asarray(prices, dtype=np.float64)
+        if self.tick_size:
+            prices = np.round(prices / self.tick_size) * self.tick_size
+        return _as_result(np.round(prices, self.price_decimals))
+
+    def round_quantity(self, quantities):
+        """Rounds quantities down to the lot step size, so an order never exceeds the available balance.
+
+        Args:
+            quantities (float or array_like): Quantity or quantities to round.
+
+        Returns:
+            float or numpy.ndarray: The rounded quantity (or quantities), a float for scalar input.
+        """
+        import numpy as np
+
+        quantities = np.asarray(quantities, dtype=np.float64)
+        if self.step_size:
+            # Small offset so values already on a step are not floored to the step below by float error
+            quantities = np.floor(quantities / self.step_size + 1e-9) * self.step_size
+        return _as_result(np.round(quantities, self.quantity_decimals))
+
+    def is_valid_order(self, prices, quantities):
+        """Checks orders against the price, lot size and notional filters.
+
+        Args:
+            prices (float or array_like): Order price(s), already rounded.
+            quantities (float or array_like): Order quantity (or quantities), already rounded.
+
+        Returns:
+            bool or numpy.ndarray: Whether each order passes the filters.
+        """
+        import numpy as np
+
+        prices = np.asarray(prices, dtype=np.float64)
+        quantities = np.asarray(quantities, dtype=np.float64)
+        valid = (
+            (prices >= self.min_price) & (prices <= self.max_price)
+            & (quantities >= self.min_qty) & (quantities <= self.max_qty)
+            & (prices * quantities >= self.min_notional)
+        )
+        return bool(valid) if np.ndim(valid) == 0 else valid
+
+
+class SymbolFilterIndex:
+    """Index of the trading rules for every symbol on the exchange, built once at startup.
+
+    A single exchangeInfo request covers all symbols, lookups are then a dictionary access.
+
+    Attributes:
+        filters (dict): SymbolFilters for each symbol pair.
+    """
+
+    def __init__(self, exchange_info):
+        """Builds the index.
+
+        Args:
+            exchange_info (dict): Response from the exchangeInfo endpoint.
+        """
+        self.filters = {
+            symbol_info["symbol"]: SymbolFilters(symbol_info) for symbol_info in exchange_info["symbols"]
+        }
+
+    @classmethod
+    def from_client(cls, binance_client):
+        """Builds the index from a single exchangeInfo request.
+
+        Args:
+            binance_client: Instance of the Binance client.
+
+        Returns:
+            SymbolFilterIndex: Index over all symbols on the exchange.
+        """
+        return cls(binance_client.get_exchange_info())
+
+    @classmethod
+    def from_cache(cls, binance_client, cache_path, ttl_s, symbols):
+        """Builds the index from an on-disk copy of exchangeInfo, refreshing it when it is stale.
+
+        Only the symbols which are traded are stored, so the cache stays small and fast to read. The exchangeInfo
+        request is only sent when the cache is older than the TTL, cannot be read, or does not cover every symbol.
+
+        Args:
+            binance_client: Instance of the Binance client.
+            cache_path (str): Path of the JSON cache file.
+            ttl_s (float): Maximum age of the cache in seconds.
+            symbols (list of str): Symbol pairs which must be in the index.
+
+        Returns:
+            SymbolFilterIndex: Index over the cached symbols.
+        """
+        try:
+            if time.time() - os.path.getmtime(cache_path) < ttl_s:
+                with open(cache_path) as f:
+                    exchange_info = json.load(f)
+                if all(any(info["symbol"] == symbol for info in exchange_info["symbols"]) for symbol in symbols):
+                    return cls(exchange_info)
+        except (OSError, ValueError, KeyError) as err:
+            print(f"Exchange info cache could not be read: {err}")
+
+        print("Getting exchange info")
+        exchange_info = binance_client.get_exchange_info()
+        exchange_info = {"symbols": [info for info in exchange_info["symbols"] if info["symbol"] in symbols]}
+
+        # Write to a temporary file first, so a crash cannot leave a partial cache behind
+        temporary_path = f"{cache_path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(exchange_info, f)
+        os.replace(temporary_path, cache_path)
+        return cls(exchange_info)
+
+    def __getitem__(self, symbol):
+        return self.filters[symbol]
+
+    def __contains__(self, symbol):
+        return symbol in self.filters
+
+    def get(self, symbol):
+        """Gets the filters for a symbol.
+
+        Args:
+            symbol (str): The symbol pair, e.g. "BTCUSDT".
+
+        Returns:
+            SymbolFilters: Parsed filters, or None if the symbol does not exist.
+        """
+        return self.filters.get(symbol)
+
+    def symbol_info(self, symbol):
+        """Gets the raw symbol information, as returned by get_symbol_info.
+
+        Args:
+            symbol (str): The symbol pair, e.g. "BTCUSDT".
+
+        Returns:
+            dict: Raw symbol information.
+        """
+        return self.filters[symbol].symbol_info
@@ -1,46 +1,105 @@
 import os
+import re
 import csv
+import math
+import threading
+import time
+
+
+from wenmoon.Ledger import Ledger
+from wenmoon.StrategyRunner import StrategyRunner
+from wenmoon.bot_utils import candle_buffer_length
 
 CSV_PATH = "trades.csv"
 
+# Binance client order ids are at most 36 characters, the prefix leaves room for a tag and a ms timestamp
+CLIENT_ORDER_ID_PREFIX_LENGTH = 18
+
 class Trader:
     """This class handles decision making from the strategy, and places buy/sell orders.
 
     Attributes:
         config (Config): Instance of the Config class - holds settings for the bot.
         strategy (Strategy): An instance of the strategy class for the chosen strategy.
+        strategy_runner (StrategyRunner): Feeds new candles to the strategy and keeps its indicator state.
+        user_data_stream (UserDataStream): Balance and order cache for live mode (None in test mode).
+        symbol (str): The symbol pair being traded.
+        name (str): Name of the trader in the ledger and in client order ids, the bot name (or symbol pair) with
+            @interval for a timeframe trader.
+        ledger (Ledger): SQLite trade ledger, shared by the traders using the same file (None if ledger_path is not
+            set).
+        csv_path (str): Status csv file, one per named bot.
+        order_book (OrderBook): Local order book used to estimate fills (None to fill at the close price).
+        exit_monitor (ExitMonitor): Checks the profit target and stop loss on every best bid/ask update (None to
+            only check them when a candle closes).
+        binance_client: Instance of the Binance client, used for placing orders in live mode.
+        symbol_filters (SymbolFilters): Trading rules for the symbol, used to round live order prices and quantities.
+        oco_order_list_id (int): Order list id of the open OCO protecting the current position (None if there is none).
+        oco_order_ids (list of int): Order ids of the two legs of the open OCO.
+        lock (threading.RLock): Guards the position against OCO fills reported on the user data stream thread.
         position (str): The current position for the strategy (options: "long", "short").
         coin_balance (float): The balance of coin currently trading.
         fiat_balance (float): The balance of fiat currency currently trading.
         candles (list of dict): Candle data (candles[0] is the oldest, candles[-1] is the newest).
         newest_buy_price (float): The buy price from the most recent buy.
+        entry_fiat (float): The fiat spent on the most recent buy.
+        entry_quantity (float): Live mode: the coin this trader holds, received from the most recent buy net of
+            commission (or start_balance for a long start position), which is what the next sell sells.
         current_trade_profit (float): The profit from the most recent buy (expressed as a percentage).
         buy_count (int): Running count of the number of buy trades made.
         sell_count (int): Running count of the number of sell trades made.
     """
-    def __init__(self, config, strategy):
+    def __init__(self, config, strategy, user_data_stream=None, symbol=None, binance_client=None):
         """Initialise the trader.
 
         Args:
             config (Config): Instance of the Config class - holds settings for the bot.
             strategy (Strategy): An instance of the strategy class for the chosen strategy.
+            user_data_stream (UserDataStream): Balance and order cache for live mode, should already be started.
+            symbol (str): The symbol pair being traded, defaults to watch_pair_symbol from the config.
+            binance_client: Instance of the Binance client, used for placing orders in live mode.
         """
         self.config = config
         self.strategy = strategy
+        self.user_data_stream = user_data_stream
+        self.symbol = symbol or config.watch_symbol_pair
+        self.name = config.name or self.symbol
+        self.strategy_runner = StrategyRunner(strategy, candle_buffer_length(strategy, config.max_candles),
+                                              config.strategy_time_budget_ms / 1000, self.symbol)
+        self.ledger = Ledger.shared(config.ledger_path) if config.ledger_path else None
+        self.csv_path = f"trades_{config.name}.csv" if config.name else CSV_PATH
+        self.order_book = None
+        self.exit_monitor = None
+        self.binance_client = binance_client
+        self.symbol_filters = None
+        self.oco_order_list_id = None
+        self.oco_order_ids = []
+        self.lock = threading.RLock()
         self.position = config.start_position
         self.coin_balance = 0
         self.fiat_balance = 0
+        self.entry_quantity = 0.0
         self.set_initial_balance()
         self.candles = None
         self.newest_buy_price = 0.0
+        self.entry_fiat = 0.0
         self.current_trade_profit = 0.0
         self.buy_count = 0
         self.sell_count = 0
 
+        # Record live order updates and fills from the user data stream
+        if self.ledger and self.user_data_stream:
+            self.user_data_stream.order_listeners.append(self.record_order_update)
+
+        # Follow the protective OCO, which can close the position on the exchange without the bot
+        if self.user_data_stream:
+            self.user_data_stream.order_listeners.append(self.handle_oco_update)
+
     def set_initial_balance(self):
         """Checks the starting coin balance is available in the spot wallet.
 
-        For test mode, no verifications take place on the balance.
+        For test mode, no verifications take place on the balance. In live mode a long start position holds
+        start_balance coin, at most the coin in the account, so several bots can share the coin of one account.
         """
         if self.config.test_mode:
             if self.config.start_position == "long":
@@ -48,13 +107,83 @@ class Trader:
             else:
                 self.fiat_balance = self.config.start_balance
         else:
-            pass
+            if self.config.start_position == "long" and self.user_data_stream:
+                account_coin = self.user_data_stream.get_balance(self.config.coin_symbol)
+                self.entry_quantity = min(self.config.start_balance or account_coin, account_coin)
+            self.refresh_balances()
+
+    def refresh_balances(self):
+        """Reads the live fiat balance from the user data stream cache, and sets the coin balance to the coin this
+        trader holds.
+
+        The cache is kept up to date by the websocket, so this does not make any requests to the binance api. Other
+        bots (and timeframe traders) may hold the same coin in the account, so the coin balance is the quantity bought
+        by this trader rather than the account balance.
+        """
+        if self.user_data_stream:
+            self.coin_balance = self.entry_quantity
+            self.fiat_balance = self.user_data_stream.get_balance(self.config.fiat_symbol)
+
+    @property
+    def client_order_id_prefix(self):
+        """str: Start of the client order ids of this trader's orders, the name with unsupported characters replaced."""
+        return re.sub(r"[^A-Za-z0-9_]", "_", self.name)[:CLIENT_ORDER_ID_PREFIX_LENGTH]
+
+    def new_client_order_id(self, tag):
+        """Creates a client order id for an order placed by this trader.
+
+        Args:
+            tag (str): Short tag for the kind of order, e.g. "b" for a buy.
+
+        Returns:
+            str: Client order id, the prefix, a dash, the tag and the time in ms.
+        """
+        return f"{self.client_order_id_prefix}-{tag}{int(time.time() * 1000)}"
+
+    def is_own_order(self, report):
+        """Checks whether an execution report belongs to an order placed by this trader.
+
+        Several traders may trade the same pair on one account (named bots and timeframe traders), so orders are
+        matched on the client order id prefix. Cancels report the id of the cancel request, and the order's own id
+        as the original client order id.
+
+        Args:
+            report (dict): Human readable execution report.
+
+        Returns:
+            bool: Whether the order is this trader's.
+        """
+        client_order_id = report.get("original_client_order_id") or report["client_order_id"]
+        return report["symbol"] == self.symbol and \
+            client_order_id.rpartition("-")[0] == self.client_order_id_prefix
+
+    def record_order_update(self, report):
+        """Records an update of one of this trader's live orders from the user data stream in the ledger.
+
+        Args:
+            report (dict): Human readable execution report.
+        """
+        if not self.is_own_order(report):
+            return
+
+        self.ledger.record_order(report["event_time_ms"], report["symbol"], report["order_id"], report["side"],
+                                 report["order_type"], report["order_price"], report["order_quantity"],
+                                 report["order_status"])
+
+        if report["execution_type"] == "TRADE":
+            realized_pnl = 0.0
+            if report["side"] == "SELL":
+                realized_pnl = report["last_quote_quantity"] - report["last_executed_quantity"] * self.newest_buy_price
+            self.ledger.record_fill(report["transaction_time_ms"], report["symbol"], report["order_id"],
+                                    report["side"], report["last_executed_price"], report["last_executed_quantity"],
+                                    report["last_quote_quantity"], report["commission"], report["commission_asset"],
+                                    realized_pnl)
 
     @staticmethod
-    def write_csv_row(row):
-        file_exists = os.path.isfile(CSV_PATH)
+    def write_csv_row(row, path=CSV_PATH):
+        file_exists = os.path.isfile(path)
 
-        with open(CSV_PATH, 'a') as csvfile:
+        with open(path, 'a') as csvfile:
             headers = row.keys()
             writer = csv.DictWriter(csvfile, delimiter=',', lineterminator='\n', fieldnames=headers)
 
@@ -68,6 +197,9 @@ class Trader:
 
         Includes information such as current position and profit from most recent buy.
         """
+        # In live mode, pick up any balance changes pushed through the user data stream
+        if not self.config.test_mode:
+            self.refresh_balances()
 
         # Get newest candle data
         open_price = self.candles[-1]["open_price"]
@@ -111,16 +243,81 @@ class Trader:
         }
 
         # Print results to csv
-        self.write_csv_row(status_json)
+        self.write_csv_row(status_json, self.csv_path)
+
+        # Store the snapshot in the ledger
+        if self.ledger:
+            self.ledger.record_status(self.candles[-1]["candle_close_time_ms"], self.symbol, self.fiat_balance,
+                                      self.coin_balance, fiat_value, coin_value, self.name)
+
+    @property
+    def profit_factor(self):
+        """float: Factor applied to the price change in the trade profit formula.
+
+        Test mode keeps the simulated fee in the formula. In live mode the profit target and stop loss are plain
+        percentages of the buy price, so the exchange OCO prices match the configured values.
+        """
+        return 1 - self.config.test_fee if self.config.test_mode else 1.0
 
-    def fake_buy(self):
+    def trade_profit(self, price):
+        """Calculates the profit of the open position at a price.
+
+        Args:
+            price (float): The price to value the position at.
+
+        Returns:
+            float: Trade profit expressed as a percentage.
+        """
+        return 100 * self.profit_factor * (price - self.newest_buy_price) / self.newest_buy_price
+
+    def price_for_profit(self, buy_price, profit):
+        """Inverts the trade profit formula to get the price for a given profit.
+
+        Args:
+            buy_price (float): The buy price of the position.
+            profit (float): Trade profit expressed as a percentage.
+
+        Returns:
+            float: The price at which the trade profit equals the given profit.
+        """
+        return buy_price * (1 + profit / (100 * self.profit_factor))
+
+    def estimate_fill_price(self, side, price, quantity=None, quote_quantity=None):
+        """Estimates the average fill price of a market order from the local order book.
+
+        Args:
+            side (str): "buy" or "sell".
+            price (float): Price to use if there is no synchronised order book, e.g. the close price.
+            quantity (float): Coin quantity of the order.
+            quote_quantity (float): Fiat amount of the order (instead of a coin quantity).
+
+        Returns:
+            float: Estimated average fill price.
+        """
+        if not self.order_book or not self.order_book.is_synced:
+            return price
+
+        fill_price = self.order_book.vwap(side, quantity, quote_quantity)
+        if fill_price is None:
+            print("Order is larger than the visible order book depth, using the close price")
+            return price
+
+        slippage = self.order_book.slippage(side, quantity, quote_quantity)
+        print(f"Estimated {side} fill price {fill_price} {self.config.fiat_symbol} (slippage {slippage:.4f}%)")
+        return fill_price
+
+    def fake_buy(self, price=None, time_ms=None):
         """Simulates a buy order.
 
         Takes into account the current price and modifies the balances on the Bot instance.
 
+        Args:
+            price (float): Buy price, defaults to the close price of the newest candle.
+            time_ms (int): Time of the buy in ms, defaults to the close time of the newest candle.
         """
-        # Get current price
-        price = self.candles[-1]["close_price"]
+        # Get current price, walking the order book if there is one
+        if price is None:
+            price = self.estimate_fill_price("buy", self.candles[-1]["close_price"], quote_quantity=self.fiat_balance)
 
         # Calculate coin buy quantity with current funds
         coin_buy_quantity = self.fiat_balance / price
@@ -129,24 +326,35 @@ class Trader:
         coin_buy_quantity *= 1 - self.config.test_fee / 100
 
         # Make the fake purchase
+        self.entry_fiat = self.fiat_balance
         self.fiat_balance = 0
         self.coin_balance = coin_buy_quantity
         self.buy_count += 1
 
+        if self.ledger:
+            time_ms = time_ms or self.candles[-1]["candle_close_time_ms"]
+            self.ledger.record_fill(time_ms, self.symbol, None, "BUY", price, coin_buy_quantity, self.entry_fiat,
+                                    self.entry_fiat * self.config.test_fee / 100, self.config.fiat_symbol)
+            self.ledger.record_position(time_ms, self.symbol, "long", coin_buy_quantity, price)
+
         # Output message
         print(f"Bought {coin_buy_quantity} {self.config.coin_symbol} at price of {price} {self.config.fiat_symbol}")
 
         # Store the most recent buy price
         self.newest_buy_price = price
 
-    def fake_sell(self):
+    def fake_sell(self, price=None, time_ms=None):
         """Simulates a sell order.
 
         Takes into account the current price and modifies the balances on the Bot instance.
 
+        Args:
+            price (float): Sell price, defaults to the close price of the newest candle.
+            time_ms (int): Time of the sell in ms, defaults to the close time of the newest candle.
         """
-        # Get current price
-        price = self.candles[-1]["close_price"]
+        # Get current price, walking the order book if there is one
+        if price is None:
+            price = self.estimate_fill_price("sell", self.candles[-1]["close_price"], quantity=self.coin_balance)
 
         # Calculate fiat buy quantity with current funds
         fiat_buy_quantity = price * self.coin_balance
@@ -155,35 +363,397 @@ class Trader:
         fiat_buy_quantity *= 1 - self.config.test_fee / 100
 
         # Make the fake sell
+        coin_sell_quantity = self.coin_balance
         self.coin_balance = 0
         self.fiat_balance = fiat_buy_quantity
         self.sell_count += 1
 
+        if self.ledger:
+            time_ms = time_ms or self.candles[-1]["candle_close_time_ms"]
+            self.ledger.record_fill(time_ms, self.symbol, None, "SELL", price, coin_sell_quantity, fiat_buy_quantity,
+                                    price * coin_sell_quantity * self.config.test_fee / 100, self.config.fiat_symbol,
+                                    fiat_buy_quantity - self.entry_fiat)
+            self.ledger.record_position(time_ms, self.symbol, "short", 0.0, self.newest_buy_price)
+
         # Output message
         print(f"Sold {self.config.coin_symbol} at price of {price} {self.config.fiat_symbol} for {fiat_buy_quantity}"
               f" {self.config.fiat_symbol}")
 
-    def buy(self):
+    def live_buy(self):
+        """Places a market buy for the fiat balance (up to max_order_value), then protects the position with an OCO if
+        enabled.
+
+        The fill price and quantity are taken from the order response, net of any commission paid in the coin. An order
+        which Binance refuses, or which fills nothing, leaves the trader short.
+
+        Returns:
+            bool: Whether the buy was placed, the position goes back to short if not.
+        """
+        # Imported here so the Binance library is only loaded when trading live
+        from binance.exceptions import BinanceAPIException
+
+        self.refresh_balances()
+        precision = self.symbol_filters.symbol_info.get("quoteAssetPrecision", 8)
+        fiat_to_spend = min(self.fiat_balance, self.config.max_order_value or self.fiat_balance)
+        quote_quantity = math.floor(fiat_to_spend * 10 ** precision) / 10 ** precision
+        if quote_quantity < self.symbol_filters.min_notional:
+            print(f"Fiat balance {quote_quantity} {self.config.fiat_symbol} is below the minimum order value")
+            self.position = "short"
+            return False
+
+        try:
+            order = self.binance_client.order_market_buy(symbol=self.symbol,
+                                                         quoteOrderQty=f"{quote_quantity:.{precision}f}",
+                                                         newClientOrderId=self.new_client_order_id("b"))
+        except BinanceAPIException as err:
+            print(f"Buy order failed, staying short: {err}")
+            self.position = "short"
+            return False
+        executed = float(order["executedQty"])
+        spent = float(order["cummulativeQuoteQty"])
+        if not executed:
+            print(f"Buy order {order.get('orderId')} filled nothing, staying short")
+            self.position = "short"
+            return False
+        commission = sum(float(fill["commission"]) for fill in order.get("fills", [])
+                         if fill["commissionAsset"] == self.config.coin_symbol)
+
+        self.newest_buy_price = spent / executed
+        self.entry_fiat = spent
+        self.entry_quantity = executed - commission
+        self.buy_count += 1
+        if self.ledger:
+            self.ledger.record_position(int(time.time() * 1000), self.symbol, "long", self.entry_quantity,
+                                        self.newest_buy_price)
+        print(f"Bought {executed} {self.config.coin_symbol} at price of {self.newest_buy_price} "
+              f"{self.config.fiat_symbol}")
+
+        if self.config.oco_orders:
+            self.place_oco(self.entry_quantity)
+        return True
+
+    def place_oco(self, quantity):
+        """Places an exchange-side OCO protecting the current position.
+
+        The take-profit limit and the stop-limit prices come from profit_target and stop_loss, with the stop-limit
+        price oco_stop_limit_offset percent below its trigger so it still fills in a fast move. Prices and quantity are
+        rounded to the symbol filters.
+
+        See the following link for OCO orders:
+        https://github.com/binance/binance-spot-api-docs/blob/master/rest-api.md#new-oco-trade
+
+        Args:
+            quantity (float): Coin quantity held.
+        """
+        if not (self.config.profit_target and self.config.stop_loss):
+            print("OCO orders need both a profit target and a stop loss, exits are checked by the bot only")
+            return
+
+        filters = self.symbol_filters
+        quantity = filters.round_quantity(quantity)
+        take_profit_price = filters.round_price(self.price_for_profit(self.newest_buy_price,
+                                                                      self.config.profit_target))
+        stop_price = filters.round_price(self.price_for_profit(self.newest_buy_price, self.config.stop_loss))
+        stop_limit_price = filters.round_price(stop_price * (1 - self.config.oco_stop_limit_offset / 100))
+
+        if not (filters.is_valid_order(take_profit_price, quantity) and
+                filters.is_valid_order(stop_limit_price, quantity)):
+            print(f"OCO for {quantity} {self.config.coin_symbol} does not pass the symbol filters, "
+                  f"exits are checked by the bot only")
+            return
+
+        order_list = self.binance_client.create_oco_order(
+            symbol=self.symbol,
+            side="SELL",
+            quantity=f"{quantity:.{filters.quantity_decimals}f}",
+            price=f"{take_profit_price:.{filters.price_decimals}f}",
+            stopPrice=f"{stop_price:.{filters.price_decimals}f}",
+            stopLimitPrice=f"{stop_limit_price:.{filters.price_decimals}f}",
+            stopLimitTimeInForce="GTC",
+            limitClientOrderId=self.new_client_order_id("tp"),
+            stopClientOrderId=self.new_client_order_id("sl")
+        )
+        self.oco_order_list_id = order_list["orderListId"]
+        self.oco_order_ids = [order["orderId"] for order in order_list["orders"]]
+        print(f"Placed OCO: take profit at {take_profit_price}, stop at {stop_price} (limit {stop_limit_price}) "
+              f"{self.config.fiat_symbol}")
+
+    def cancel_oco(self):
+        """Cancels the open OCO, if there is one.
+
+        Cancelling either leg cancels the whole order list. If the OCO has already filled or been cancelled on the
+        exchange, the error is reported and ignored.
+        """
+        if self.oco_order_list_id is None:
+            return
+
+        # Imported here so the Binance library is only loaded when trading live
+        from binance.exceptions import BinanceAPIException
+
+        try:
+            self.binance_client.cancel_order(symbol=self.symbol, orderId=self.oco_order_ids[0])
+            print("Cancelled OCO")
+        except BinanceAPIException as err:
+            print(f"OCO could not be cancelled: {err}")
+        self.oco_order_list_id = None
+        self.oco_order_ids = []
+
+    def handle_oco_update(self, report):
+        """Closes the position when the OCO fills on the exchange, called from the user data stream.
+
+        Args:
+            report (dict): Human readable execution report.
+        """
+        if self.oco_order_list_id is None or report["order_list_id"] != self.oco_order_list_id \
+                or report["order_status"] != "FILLED":
+            return
+
+        with self.lock:
+            print(f"OCO {report['order_type']} filled at {report['last_executed_price']} {self.config.fiat_symbol}"
+                  f" - position closed on the exchange")
+            self.oco_order_list_id = None
+            self.oco_order_ids = []
+            self.entry_quantity = 0.0
+            self.position = "short"
+            self.sell_count += 1
+            if self.ledger:
+                self.ledger.record_position(report["transaction_time_ms"], self.symbol, "short", 0.0,
+                                            self.newest_buy_price)
+            self.refresh_balances()
+            if self.exit_monitor:
+                self.exit_monitor.disarm()
+
+    def live_sell(self):
+        """Cancels the protective OCO, then places a market sell for the coin this trader holds.
+
+        The quantity comes from the buy order rather than the balance cache, which still shows the coin as locked by
+        the OCO until the user data stream reports the cancel, and which includes coin held by other bots.
+
+        Returns:
+            bool: Whether the sell was placed, the position goes back to long if not.
+        """
+        # Imported here so the Binance library is only loaded when trading live
+        from binance.exceptions import BinanceAPIException
+
+        self.cancel_oco()
+        quantity = self.symbol_filters.round_quantity(self.entry_quantity)
+        if quantity < self.symbol_filters.market_min_qty or quantity < self.symbol_filters.min_qty:
+            print(f"Coin quantity {quantity} {self.config.coin_symbol} is below the minimum order quantity, "
+                  f"staying long")
+            self.position = "long"
+            return False
+
+        try:
+            order = self.binance_client.order_market_sell(
+                symbol=self.symbol,
+                quantity=f"{quantity:.{self.symbol_filters.quantity_decimals}f}",
+                newClientOrderId=self.new_client_order_id("s")
+            )
+        except BinanceAPIException as err:
+            print(f"Sell order failed, staying long: {err}")
+            self.position = "long"
+            return False
+        executed = float(order["executedQty"])
+        received = float(order["cummulativeQuoteQty"])
+        if not executed:
+            print(f"Sell order {order.get('orderId')} filled nothing, staying long")
+            self.position = "long"
+            return False
+        self.entry_quantity = 0.0
+        self.sell_count += 1
+        if self.ledger:
+            self.ledger.record_position(int(time.time() * 1000), self.symbol, "short", 0.0, self.newest_buy_price)
+        print(f"Sold {executed} {self.config.coin_symbol} at price of {received / executed} "
+              f"{self.config.fiat_symbol} for {received} {self.config.fiat_symbol}")
+        return True
+
+    def buy(self, price=None, time_ms=None):
         """Function triggered when a long position is requested by the strategy
 
-        TODO: Currently operates in test mode only, write real buy code
+        Args:
+            price (float): Buy price for test mode, defaults to the close price of the newest candle.
+            time_ms (int): Time of the buy in ms for test mode, defaults to the close time of the newest candle.
 
+        Returns:
+            bool: Whether the buy was made (a live order can be refused, the position then goes back to short).
         """
         if self.config.test_mode:
-            self.fake_buy()
-        else:
-            pass
+            self.fake_buy(price, time_ms)
+            return True
+        with self.lock:
+            return self.live_buy()
 
-    def sell(self):
+    def sell(self, price=None, time_ms=None):
         """Function triggered when a short position is requested by the strategy
 
-        TODO: Currently operates in test mode only, write real sell code
+        Args:
+            price (float): Sell price for test mode, defaults to the close price of the newest candle.
+            time_ms (int): Time of the sell in ms for test mode, defaults to the close time of the newest candle.
 
+        Returns:
+            bool: Whether the sell was made (a live order can fail, the position then goes back to long and the exits
+                are checked again when the next candle closes).
         """
+        if self.exit_monitor:
+            self.exit_monitor.disarm()
+
         if self.config.test_mode:
-            self.fake_sell()
+            self.fake_sell(price, time_ms)
+            return True
+        with self.lock:
+            return self.live_sell()
+
+    def exit_position(self, reason, price):
+        """Sells a long position between candle closes, called by the exit monitor.
+
+        Args:
+            reason (str): Why the position is being closed, e.g. "Stop loss reached".
+            price (float): The best bid that crossed the exit threshold.
+        """
+        if self.position != "long":
+            return
+
+        print(f"{reason} at bid of {price} {self.config.fiat_symbol} - selling")
+        self.current_trade_profit = self.trade_profit(price)
+        self.position = "short"
+        self.sell(price, int(time.time() * 1000))
+
+    def set_strategy(self, strategy, max_candles, candles):
+        """Swaps in a new strategy, e.g. after the settings are reloaded, without fetching the history again.
+
+        Args:
+            strategy (Strategy): The new strategy.
+            max_candles (int): Candle buffer length for the new strategy.
+            candles (list of dict): The most recent list of closed historic candles.
+        """
+        self.strategy = strategy
+        self.strategy_runner.replace_strategy(strategy, max_candles, candles)
+
+    def refresh_exits(self):
+        """Re-prices the exit monitor of an open position after the profit target or stop loss changed.
+
+        An OCO already placed on the exchange keeps its prices until the position is closed.
+        """
+        if not self.exit_monitor or self.position != "long":
+            return
+        if self.config.profit_target or self.config.stop_loss:
+            self.exit_monitor.arm(self.newest_buy_price)
         else:
-            pass
+            self.exit_monitor.disarm()
+
+    def get_state(self):
+        """Gets the position, balances, trade counts and strategy state for a snapshot.
+
+        Returns:
+            dict: Picklable trader state.
+        """
+        with self.lock:
+            return {
+                "symbol": self.symbol,
+                "position": self.position,
+                "coin_balance": self.coin_balance,
+                "fiat_balance": self.fiat_balance,
+                "newest_buy_price": self.newest_buy_price,
+                "entry_fiat": self.entry_fiat,
+                "entry_quantity": self.entry_quantity,
+                "current_trade_profit": self.current_trade_profit,
+                "buy_count": self.buy_count,
+                "sell_count": self.sell_count,
+                "oco_order_list_id": self.oco_order_list_id,
+                "oco_order_ids": list(self.oco_order_ids),
+                "strategy_runner": self.strategy_runner.get_state()
+            }
+
+    def set_state(self, snapshot, candles):
+        """Restores the state from a snapshot taken by get_state, instead of the start position and balance.
+
+        In live mode the position is checked against the exchange (see reconcile_position), the balances are read
+        from the user data stream again, and the exit monitor of an open position is armed.
+
+        Args:
+            snapshot (dict): Trader state from get_state.
+            candles (list of dict): The restored candles.
+        """
+        if snapshot["symbol"] != self.symbol:
+            print(f"Snapshot is for {snapshot['symbol']}, not restoring the {self.symbol} trader")
+            return
+
+        with self.lock:
+            for name in ("position", "coin_balance", "fiat_balance", "newest_buy_price", "entry_fiat", "entry_quantity",
+                         "current_trade_profit", "buy_count", "sell_count", "oco_order_list_id", "oco_order_ids"):
+                setattr(self, name, snapshot[name])
+            if not self.config.test_mode:
+                self.reconcile_position()
+                self.refresh_balances()
+        self.strategy_runner.set_state(snapshot["strategy_runner"])
+        self.candles = candles or None
+        self.refresh_exits()
+
+    def reconcile_position(self):
+        """Checks a position restored from a snapshot against the exchange, which may have moved on while the bot was
+        down.
+
+        The legs of the protective OCO are queried: if one filled the position was closed on the exchange, and if both
+        were cancelled the OCO is dropped. A long position is then capped at the coin in the account (free plus
+        locked), and dropped if less than the minimum order quantity is left.
+        """
+        # Imported here so the Binance library is only loaded when trading live
+        from binance.exceptions import BinanceAPIException
+
+        if self.oco_order_list_id is not None:
+            try:
+                statuses = [self.binance_client.get_order(symbol=self.symbol, orderId=order_id)["status"]
+                            for order_id in self.oco_order_ids]
+            except BinanceAPIException as err:
+                print(f"Could not check the restored OCO, keeping it: {err}")
+                statuses = []
+            if "FILLED" in statuses:
+                print("The OCO filled while the bot was stopped - position closed on the exchange")
+                self.position = "short"
+                self.entry_quantity = 0.0
+                self.sell_count += 1
+            if "FILLED" in statuses or (statuses and all(status in ("CANCELED", "EXPIRED", "REJECTED")
+                                                         for status in statuses)):
+                self.oco_order_list_id = None
+                self.oco_order_ids = []
+
+        if self.position == "long" and self.user_data_stream:
+            account_coin = self.user_data_stream.get_total_balance(self.config.coin_symbol)
+            if account_coin < self.entry_quantity:
+                print(f"Only {account_coin} of the restored {self.entry_quantity} {self.config.coin_symbol} are left "
+                      f"in the account")
+                self.entry_quantity = account_coin
+            min_qty = max(self.symbol_filters.min_qty, self.symbol_filters.market_min_qty) if self.symbol_filters \
+                else 0.0
+            if self.entry_quantity <= 0 or self.entry_quantity < min_qty:
+                print("The restored position is no longer held, going short")
+                self.position = "short"
+                self.entry_quantity = 0.0
+
+    def set_provisional_position(self, candle, recommended_action):
+        """Acts on a signal from the candle still in progress, between candle closes.
+
+        Only entries and strategy exits are handled here, the profit target and stop loss are left to set_position
+        and the exit monitor. No status is output, as the candle has not closed.
+
+        Args:
+            candle (dict): The candle in progress.
+            recommended_action (str): The action recommended by the strategy (options: "none", "buy", "sell").
+        """
+        if self.candles is None:
+            return
+
+        if self.position == "long" and recommended_action == "sell":
+            print("Provisional strategy sell indicator triggered - selling")
+            price = self.estimate_fill_price("sell", candle["close_price"], quantity=self.coin_balance)
+            self.position = "short"
+            self.sell(price, candle["event_time_ms"])
+        elif self.position == "short" and recommended_action == "buy":
+            print("Provisional strategy buy indicator triggered - going long")
+            price = self.estimate_fill_price("buy", candle["close_price"], quote_quantity=self.fiat_balance)
+            self.position = "long"
+            if self.buy(price, candle["event_time_ms"]) and self.exit_monitor:
+                self.exit_monitor.arm(self.newest_buy_price)
 
     def set_position(self, candles):
         """Main decision function for signalling.
@@ -205,14 +775,13 @@ class Trader:
 
         # If long, set the current profit from this trade
         if self.position == "long":
-            self.current_trade_profit = 100 * (1 - self.config.test_fee) * (newest_price - self.newest_buy_price)\
-                                        / self.newest_buy_price
+            self.current_trade_profit = self.trade_profit(newest_price)
         else:
             self.current_trade_profit = 0.0
 
-        # Query the strategy for the current recommended position
+        # Query the strategy for the current recommended position (only the candles it has not seen are passed on)
         print("Scouting for trades")
-        recommended_action = self.strategy.scout(candles)
+        recommended_action = self.strategy_runner.next_action(candles)
         print(f"Recommended action: {recommended_action}")
 
         # Check for exits
@@ -241,7 +810,10 @@ class Trader:
                 # if the strategy position changes to long, handle the move to long position
                 print("Going long")
                 self.position = "long"
-                self.buy()
+
+                # Watch the exit thresholds on every best bid/ask update until the next candle closes
+                if self.buy() and self.exit_monitor:
+                    self.exit_monitor.arm(self.newest_buy_price)
 
         # Log current balances
         self.output_status()
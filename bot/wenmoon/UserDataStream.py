@@ -0,0 +1,189 @@
+import json
+import threading
+import time
+
+import websocket
+
+from wenmoon.bot_utils import format_account_position, format_balance_update, format_execution_report
+
+# Binance invalidates a listen key after 60 minutes without a keepalive, so ping well within that
+KEEPALIVE_INTERVAL_S = 30 * 60
+
+# Time to wait before reconnecting after the user data websocket closes
+RECONNECT_DELAY_S = 10
+
+
+class UserDataStream:
+    """Keeps a Binance user data stream open and caches account balances and order states in memory.
+
+    The account balances are fetched once through the REST api when the stream is started. After that, every change
+    is pushed through the websocket (outboundAccountPosition, balanceUpdate and executionReport events), so the Trader
+    can read balances and fills without spending request weight.
+
+    See the following link for the events sent on the user data stream:
+    https://github.com/binance/binance-spot-api-docs/blob/master/user-data-stream.md
+
+    Attributes:
+        binance_client: Instance of the Binance client, used for creating and keeping alive the listen key.
+        stream_url (str): Base url of the websocket server, the listen key is appended to this.
+        listen_key (str): The listen key for the current user data stream.
+        balances (dict): Free and locked balance for each asset, keyed by asset symbol.
+        orders (dict): Most recent execution report for each order, keyed by order id.
+        last_update_time_ms (int): Event time of the most recent account update.
+        order_listeners (list of callable): Functions called with every execution report.
+        fill_listeners (list of callable): Functions called with each execution report containing a fill.
+    """
+
+    def __init__(self, binance_client, stream_url):
+        """Initialise the user data stream.
+
+        Args:
+            binance_client: Instance of the Binance client, used for creating and keeping alive the listen key.
+            stream_url (str): Base url of the websocket server (a local stand-in server can be used for testing).
+        """
+        self.binance_client = binance_client
+        self.stream_url = stream_url.rstrip("/")
+        self.listen_key = None
+        self.balances = {}
+        self.orders = {}
+        self.last_update_time_ms = 0
+        self.order_listeners = []
+        self.fill_listeners = []
+        self.lock = threading.Lock()
+        self.ws = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        """Seeds the balance cache, opens the user data websocket and starts the keepalive thread."""
+        self.load_balances()
+        self.listen_key = self.binance_client.stream_get_listen_key()
+
+        threading.Thread(target=self.run_websocket, daemon=True).start()
+        threading.Thread(target=self.run_keepalive, daemon=True).start()
+
+    def stop(self):
+        """Closes the websocket and the listen key."""
+        self.stopped.set()
+        if self.ws:
+            self.ws.close()
+        if self.listen_key:
+            self.binance_client.stream_close(self.listen_key)
+
+    def load_balances(self):
+        """Fills the balance cache from a single account request."""
+        account = self.binance_client.get_account()
+        with self.lock:
+            for balance in account["balances"]:
+                self.balances[balance["asset"]] = {
+                    "free": float(balance["free"]),
+                    "locked": float(balance["locked"])
+                }
+            self.last_update_time_ms = account["updateTime"]
+
+    def run_websocket(self):
+        """Runs the user data websocket, reconnecting until the stream is stopped.
+
+        Events sent while the websocket was down are not replayed, so the balance cache is reloaded before each
+        reconnect.
+        """
+        while not self.stopped.is_set():
+            self.ws = websocket.WebSocketApp(
+                f"{self.stream_url}/{self.listen_key}",
+                on_message=lambda ws, message: self.handle_message(message),
+                on_error=lambda ws, error: print(f"ERROR: user data stream: {error}")
+            )
+            self.ws.run_forever()
+
+            if self.stopped.wait(RECONNECT_DELAY_S):
+                break
+            print("User data stream closed, reconnecting")
+            try:
+                self.load_balances()
+            except Exception as err:
+                print(f"ERROR: user data stream balances could not be reloaded: {err}")
+
+    def run_keepalive(self):
+        """Pings the listen key periodically so the stream stays open.
+
+        If the keepalive fails the listen key has probably expired, so a new key is requested and the websocket is
+        restarted with it, which also reloads the balance cache. If the new key cannot be requested either, it is tried
+        again on the next tick.
+        """
+        while not self.stopped.wait(KEEPALIVE_INTERVAL_S):
+            try:
+                self.binance_client.stream_keepalive(self.listen_key)
+            except Exception as err:
+                print(f"ERROR: user data stream keepalive failed: {err}")
+                try:
+                    self.listen_key = self.binance_client.stream_get_listen_key()
+                except Exception as err:
+                    print(f"ERROR: user data stream listen key could not be renewed, retrying: {err}")
+                    continue
+                if self.ws:
+                    self.ws.close()
+
+    def handle_message(self, message):
+        """Updates the caches from a user data stream message.
+
+        Args:
+            message (str): The raw message received from the websocket.
+        """
+        msg = json.loads(message)
+        event_type = msg.get("e")
+
+        if event_type == "outboundAccountPosition":
+            position = format_account_position(msg)
+            with self.lock:
+                self.balances.update(position["balances"])
+                self.last_update_time_ms = position["last_update_time_ms"]
+
+        elif event_type == "balanceUpdate":
+            update = format_balance_update(msg)
+            with self.lock:
+                balance = self.balances.setdefault(update["asset"], {"free": 0.0, "locked": 0.0})
+                balance["free"] += update["balance_delta"]
+
+        elif event_type == "executionReport":
+            report = format_execution_report(msg)
+            with self.lock:
+                self.orders[report["order_id"]] = report
+            for listener in self.order_listeners:
+                listener(report)
+            if report["execution_type"] == "TRADE":
+                for listener in self.fill_listeners:
+                    listener(report)
+
+    def get_balance(self, asset):
+        """Gets the free balance of an asset from the cache.
+
+        Args:
+            asset (str): Asset symbol, e.g. "BTC".
+
+        Returns:
+            float: The free balance, 0.0 if the asset has never been held.
+        """
+        balance = self.balances.get(asset)
+        return balance["free"] if balance else 0.0
+
+    def get_total_balance(self, asset):
+        """Gets the free plus locked balance of an asset from the cache, including coin locked by open orders.
+
+        Args:
+            asset (str): Asset symbol, e.g. "BTC".
+
+        Returns:
+            float: The total balance, 0.0 if the asset has never been held.
+        """
+        balance = self.balances.get(asset)
+        return balance["free"] + balance["locked"] if balance else 0.0
+
+    def get_order(self, order_id):
+        """Gets the most recent state of an order from the cache.
+
+        Args:
+            order_id (int): Binance order id.
+
+        Returns:
+            dict: The most recent execution report for the order, or None if it has not been seen.
+        """
+        return self.orders.get(order_id)
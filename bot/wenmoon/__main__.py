@@ -1,133 +1,261 @@
-import sys
-import websocket
-import threading
-import time
+from wenmoon.StartupTimer import StartupTimer
+
+# Time the startup phases from here, the heavy libraries are imported when they are first needed
+startup_timer = StartupTimer()
 
-from binance import Client
+import signal
+
+import websocket
 
 from wenmoon.Config import Config
+from wenmoon.ConfigWatcher import ConfigWatcher
 from wenmoon.Bot import Bot
-from wenmoon.strategies.macd_rsi_strategy import Strategy
+from wenmoon.ExitMonitor import ExitMonitor
+from wenmoon.LazyClient import LazyClient
+from wenmoon.Ledger import Ledger
+from wenmoon.OrderBook import OrderBook
+from wenmoon.Trader import Trader
+from wenmoon.PortfolioTrader import PortfolioTrader
+from wenmoon.SamplingProfiler import SamplingProfiler
+from wenmoon.Snapshot import Snapshot
+from wenmoon.StrategyRunner import StrategyRunner
+from wenmoon.StreamMux import StreamMux
+from wenmoon.SymbolFilters import SymbolFilterIndex
+from wenmoon.UserDataStream import UserDataStream
+from wenmoon.strategies import create_strategy
+
+startup_timer.mark("Imports")
 
 # Get configurations
 config = Config()
+startup_timer.mark("Configuration")
 
-# Log into the binance client API using the supplied api key and secret
-binance_client = Client(
+# Log into the binance client API using the supplied api key and secret, in the background
+binance_client = LazyClient(
     config.api_key,
     config.secret_key
 )
 
-# Get symbol info
-symbol_info = binance_client.get_symbol_info(config.watch_symbol_pair)
-
-# Get the strategy to be used
-# strategy = get_strategy(config.strategy)
-
-strategy = Strategy(symbol_info)
-# strategy.scout("1", "2")
-# print(strategy)
-
-# Initialise bot
-bot = Bot(config, strategy, binance_client)
-
-# Set up the url for the required websocket stream (URL is case-sensitive)
-socket = f"wss://stream.binance.com:9443/ws/{config.watch_symbol_pair.lower()}@kline_{config.interval}"
+# Pairs traded by the bots defined in [bot:<name>] sections, or by the main section
+traded_symbols = list(dict.fromkeys(bot_config.watch_symbol_pair for bot_config in config.bot_configs)) or \
+    config.watch_symbol_pairs
+
+# Get the trading rules for the traded symbols, from the cache or with a single exchangeInfo request
+if config.exchange_info_cache:
+    symbol_filters = SymbolFilterIndex.from_cache(binance_client, config.exchange_info_cache,
+                                                  config.exchange_info_ttl_s, traded_symbols)
+else:
+    symbol_filters = SymbolFilterIndex.from_client(binance_client)
+symbol_infos = {symbol: symbol_filters.symbol_info(symbol) for symbol in traded_symbols}
+startup_timer.mark("Exchange info")
+
+# In live mode, keep balances and order states up to date through the user data stream
+user_data_stream = None
+if not config.test_mode:
+    user_data_stream = UserDataStream(binance_client, config.user_stream_url)
+    user_data_stream.start()
+    startup_timer.mark("User data stream")
+
+# Initialise bots
+portfolio = None
+if config.bot_configs:
+    # Named bots, each with its own pair, interval, strategy and risk limits. They share the websocket, the client's
+    # connection pool, the exchange info and the historical candles of bots on the same pair and interval.
+    candle_cache = {}
+    bots = []
+    for bot_config in config.bot_configs:
+        symbol = bot_config.watch_symbol_pair
+        symbol_info = symbol_infos[symbol]
+        if (bot_config.coin_symbol, bot_config.fiat_symbol) != (symbol_info["baseAsset"], symbol_info["quoteAsset"]):
+            raise ValueError(f"Bot {bot_config.name} trades {symbol}, so coin_symbol={symbol_info['baseAsset']} and "
+                             f"fiat_symbol={symbol_info['quoteAsset']} are required")
+        bot = Bot(bot_config, create_strategy(bot_config, symbol_info), binance_client,
+                  user_data_stream, symbol=symbol, candle_cache=candle_cache)
+        for interval in bot_config.timeframes:
+            timeframe_strategy = create_strategy(bot_config, symbol_info)
+            timeframe_trader = Trader(bot_config, timeframe_strategy, user_data_stream, symbol, binance_client)
+            bot.add_timeframe(interval, timeframe_trader)
+        bots.append(bot)
+elif len(config.watch_symbol_pairs) == 1:
+    # A single pair
+    symbol = config.watch_symbol_pairs[0]
+    strategy = create_strategy(config, symbol_infos[symbol])
+    bots = [Bot(config, strategy, binance_client, user_data_stream, symbol=symbol)]
+
+    # Higher intervals are resampled from the same kline stream, each with its own strategy and trader
+    for interval in config.timeframes:
+        timeframe_strategy = create_strategy(config, symbol_infos[symbol])
+        bots[0].add_timeframe(interval, Trader(config, timeframe_strategy, user_data_stream, symbol, binance_client))
+else:
+    # Several pairs trade from one shared fiat balance
+    strategies = {
+        symbol: create_strategy(config, symbol_info) for symbol, symbol_info in symbol_infos.items()
+    }
+    coin_symbols = {symbol: symbol_info["baseAsset"] for symbol, symbol_info in symbol_infos.items()}
+    portfolio = PortfolioTrader(config, strategies, coin_symbols)
+    bots = [
+        Bot(config, strategies[symbol], binance_client, symbol=symbol, trader=portfolio.trader_for(symbol))
+        for symbol in config.watch_symbol_pairs
+    ]
+
+startup_timer.mark("Strategies and bots")
+
+
+def report_startup():
+    """Ends the startup timing when the websocket first opens, before the bots fetch their history."""
+    startup_timer.mark("Websocket connection")
+    startup_timer.report(config.startup_target_ms)
+
+
+# Set up the combined websocket with one kline (or aggregate trade) stream per pair and interval, shared by the bots
+# on it (stream names are case-sensitive)
+mux = StreamMux()
+mux.add_open_handler(report_startup)
+order_books = {}
+for bot in bots:
+    if bot.config.bar_type == "time":
+        mux.subscribe(f"{bot.symbol.lower()}@kline_{bot.config.interval}", bot.handle_kline)
+    else:
+        mux.subscribe(f"{bot.symbol.lower()}@aggTrade", bot.handle_agg_trade)
+
+    # Local order book for fill price and slippage estimates, one per pair, rebuilt from a fresh snapshot after each
+    # reconnect
+    if bot.config.order_book and hasattr(bot.trader, "order_book"):
+        if bot.symbol not in order_books:
+            order_books[bot.symbol] = OrderBook(bot.symbol, binance_client)
+            mux.subscribe(f"{bot.symbol.lower()}@depth@100ms", order_books[bot.symbol].handle_depth_update)
+            mux.add_open_handler(order_books[bot.symbol].resync)
+        bot.trader.order_book = order_books[bot.symbol]
+
+    # Trading rules for rounding live order prices and quantities
+    if hasattr(bot.trader, "symbol_filters"):
+        for trader in [bot.trader, *bot.timeframe_traders.values()]:
+            trader.symbol_filters = symbol_filters[bot.symbol]
+
+    # Profit target and stop loss checks on the bookTicker stream, subscribed only while a position is open (not
+    # needed in live mode when the exchange holds an OCO for the exits)
+    live_oco = bot.config.oco_orders and not bot.config.test_mode
+    if bot.config.tick_exits and (bot.config.profit_target or bot.config.stop_loss) and \
+            hasattr(bot.trader, "exit_monitor") and not live_oco:
+        bot.trader.exit_monitor = ExitMonitor(bot.trader, mux)
+        for trader in bot.timeframe_traders.values():
+            trader.exit_monitor = ExitMonitor(trader, mux)
+
+# Carry on from the last snapshot, so the bots only fetch the candles which closed since
+snapshot = Snapshot(config, bots, portfolio)
+if snapshot.restore():
+    startup_timer.mark("Snapshot restore")
+
+# Fetch the history of the bots which need the most candles first, so the others can take theirs from the cache
+for bot in sorted(bots, key=lambda bot: bot.max_candles, reverse=True):
+    mux.add_open_handler(bot.start)
+
+# Strategy runners by bot name (or pair), for the latency reports and the profiler
+runners = {}
+for bot in bots:
+    name = bot.config.name or bot.symbol
+    bot.trader.strategy_runner.name = name
+    runners[name] = bot.trader.strategy_runner
+    for interval, trader in bot.timeframe_traders.items():
+        trader.strategy_runner.name = f"{name}@{interval}"
+        runners[trader.strategy_runner.name] = trader.strategy_runner
+
+profiler = None
+
+
+def print_profile(finished_profiler):
+    """Prints the profile of one strategy and the latency of every strategy."""
+    print(finished_profiler.report())
+    for name, runner in runners.items():
+        print(f"Strategy latency {name}: {runner.latency.summary()}, {runner.overruns} budget overruns")
+
+
+def handle_profile_signal(signum, frame):
+    """Starts profiling the configured strategy on SIGUSR1, or stops the profiler if it is already running."""
+    global profiler
+    if profiler and profiler.running:
+        profiler.stop()
+        return
+    name = config.profile_strategy or next(iter(runners), None)
+    runner = runners.get(name)
+    if runner is None:
+        print(f"Cannot profile unknown strategy {name}, required one of {list(runners)}")
+        return
+    print(f"Profiling strategy {name} for {config.profile_seconds:g}s")
+    profiler = SamplingProfiler(name, lambda: runner.active_thread_id, root_code=StrategyRunner.evaluate.__code__)
+    profiler.start(config.profile_seconds, print_profile)
+
+
+# Attach the profiler on demand with: kill -USR1 <pid> (not available on Windows)
+if hasattr(signal, "SIGUSR1"):
+    signal.signal(signal.SIGUSR1, handle_profile_signal)
+
+
+def reload_settings(running_config, new_config, changed):
+    """Applies changed settings from the settings file to the bots using a configuration, keeping the candle buffers.
+
+    New strategies are created before anything is changed, so an unknown strategy or an invalid parameter rejects
+    the whole change. The strategies created before the error are closed again.
+    """
+    config_bots = [bot for bot in bots if bot.config is running_config]
+    new_strategies = {}
+    if {"strategy", "strategy_parameters", "member_parameters"} & set(changed):
+        try:
+            for bot in config_bots:
+                symbol_info = symbol_infos[bot.symbol]
+                new_strategies[bot] = create_strategy(new_config, symbol_info)
+                for interval in bot.timeframe_traders:
+                    new_strategies[bot, interval] = create_strategy(new_config, symbol_info)
+        except Exception:
+            for strategy in new_strategies.values():
+                if hasattr(strategy, "close"):
+                    strategy.close()
+            raise
+
+    running_config.update(new_config, changed)
+
+    for bot in config_bots:
+        if new_strategies:
+            bot.set_strategy(new_strategies[bot])
+            for interval in bot.timeframe_traders:
+                bot.set_timeframe_strategy(interval, new_strategies[bot, interval])
+        bot.refresh_settings()
+        for trader in [bot.trader, *bot.timeframe_traders.values()]:
+            trader.strategy_runner.set_time_budget(running_config.strategy_time_budget_ms / 1000)
+
+
+# Check the settings file for changes between websocket messages
+config_watcher = ConfigWatcher(config, reload_settings)
+mux.add_poll_handler(config_watcher.poll)
+
+# Save the state of the bots every snapshot_interval_s between websocket messages
+mux.add_poll_handler(snapshot.poll)
+
+startup_timer.mark("Stream setup")
 
 # Disable full websocket logging
 websocket.enableTrace(False)
 
 
-def on_message(ws, message):
-    """Called when the websocket receives a message.
-
-    This function passes the message on to the Bot instance to handle.
-
-    Args:
-        ws: Websocket instance
-        message (str): The decoded message received from the websocket
-    """
-    bot.handle_websocket_message(message)
-
-
-def on_close(ws, close_status_code, close_msg):
-    """Called when the websocket closes.
-
-    This could be due to an error or keyboard interrupt.
-
-    When the websocket connection closes, we attempt to reconnect to it here, and keep trying every 10 seconds.
-
-    Args:
-        ws: Websocket instnace
-        close_status_code (str):
-        close_msg (str):
-    """
-    print("Websocket closed")
-    print(f"Closing with status code {close_status_code}")
-    print("Retry : %s" % time.ctime())
-
-    # Retry websocket reconnect every 10s
-    time.sleep(10)
-    connect_websocket()
-
-
-def on_error(ws, error):
-    """Called when the websocket encounters an error.
-
-    This function simply logs the error.
-
-    After an error, the websocket is automatically closed, and the on_close function is called.
-
-    Args:
-        ws: Websocket instnace
-        error (str): Error message
-    """
-    print(f"ERROR: {error}")
-
-
-def on_open(ws):
-    """Called when the websocket is opened.
-
-    This function calls the bot.start function which handles initialisation of candle data and strategy.
-
-    Args:
-        ws: Websocket instance
-    """
-    print("Starting bot")
-    bot.start()
-
-
-def connect_websocket():
-    """Handles connection to the websocket.
-
-    The socket url is defined outside this scope from the configuration file.
-
-    This function initialises the websocket and specifies the callback functions for opening and closeing the websocket,
-    along with message and error handling.
-
-    The websocket is run on a thread.
-    """
-    print(f"Watching prices on {socket}")
-    ws = websocket.WebSocketApp(
-        socket,
-        on_open=on_open,
-        on_message=on_message,
-        on_error=on_error,
-        on_close=on_close
-    )
-    wst = threading.Thread(target=ws.run_forever())
-    wst.daemon = True
-    wst.start()
+def handle_stop_signal(signum, frame):
+    """Stops the websocket on SIGTERM (e.g. docker stop) or SIGINT (Ctrl+C), so the snapshot is saved on the way out."""
+    print(f"Received {signal.Signals(signum).name}, stopping")
+    mux.stop()
 
 
 # main()
 if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, handle_stop_signal)
+    signal.signal(signal.SIGINT, handle_stop_signal)
     try:
-        connect_websocket()
+        mux.run_forever()
     except Exception as err:
         print(err)
         print("Connect failed")
-
-
-
-
+    finally:
+        if config.snapshot_path:
+            snapshot.save()
+        for bot in bots:
+            if bot.archive:
+                bot.archive.close()
+        Ledger.close_shared()
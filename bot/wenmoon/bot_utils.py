@@ -1,5 +1,8 @@
 from datetime import datetime, timezone, timedelta
 
+# Candle buffer length for strategies which do not declare a lookback, when max_candles is automatic
+DEFAULT_MAX_CANDLES = 50
+
 
 def format_websocket_result(msg):
     """Rewrites the message from the websocket into a more readable format.
@@ -19,7 +22,9 @@ def format_websocket_result(msg):
         "event_time_ms": msg["E"],
         "event_time": str(datetime.fromtimestamp(msg["E"]/1000, tz=timezone.utc)),
         "symbol": msg["s"],
+        "candle_start_time_ms": msg["k"]["t"],
         "candle_start_time": msg["k"]["t"],
+        "candle_close_time_ms": msg["k"]["T"],
         "candle_close_time": msg["k"]["T"],
         "interval": msg["k"]["i"],
         "first_trade_id": msg["k"]["f"],
@@ -28,7 +33,7 @@ def format_websocket_result(msg):
         "close_price": float(msg["k"]["c"]),
         "high_price": float(msg["k"]["h"]),
         "low_price": float(msg["k"]["l"]),
-        "volume": msg["k"]["v"],
+        "volume": float(msg["k"]["v"]),
         "number_of_trades": int(msg["k"]["n"]),
         "is_candle_closed": msg["k"]["x"],
         "quote_asset_volume": float(msg["k"]["q"]),
@@ -37,6 +42,86 @@ def format_websocket_result(msg):
     }
 
 
+def format_account_position(msg):
+    """Rewrites an account update from the user data stream into a more readable format.
+
+    See the following link for the data structure returned from the websocket:
+    https://github.com/binance/binance-spot-api-docs/blob/master/user-data-stream.md#account-update
+
+    Args:
+        msg (dict): The raw outboundAccountPosition message from the websocket.
+
+    Returns:
+        dict: Human readable account update, with free and locked balances keyed by asset.
+    """
+    return {
+        "event_type": msg["e"],
+        "event_time_ms": msg["E"],
+        "last_update_time_ms": msg["u"],
+        "balances": {
+            balance["a"]: {"free": float(balance["f"]), "locked": float(balance["l"])} for balance in msg["B"]
+        }
+    }
+
+
+def format_balance_update(msg):
+    """Rewrites a balance update (deposit, withdrawal or transfer) from the user data stream.
+
+    Args:
+        msg (dict): The raw balanceUpdate message from the websocket.
+
+    Returns:
+        dict: Human readable balance update.
+    """
+    return {
+        "event_type": msg["e"],
+        "event_time_ms": msg["E"],
+        "asset": msg["a"],
+        "balance_delta": float(msg["d"]),
+        "clear_time_ms": msg["T"]
+    }
+
+
+def format_execution_report(msg):
+    """Rewrites an order update from the user data stream into a more readable format.
+
+    See the following link for the data structure returned from the websocket:
+    https://github.com/binance/binance-spot-api-docs/blob/master/user-data-stream.md#order-update
+
+    Args:
+        msg (dict): The raw executionReport message from the websocket.
+
+    Returns:
+        dict: Human readable order update.
+    """
+    return {
+        "event_type": msg["e"],
+        "event_time_ms": msg["E"],
+        "symbol": msg["s"],
+        "client_order_id": msg["c"],
+        "original_client_order_id": msg.get("C", ""),
+        "side": msg["S"],
+        "order_type": msg["o"],
+        "order_quantity": float(msg["q"]),
+        "order_price": float(msg["p"]),
+        "stop_price": float(msg["P"]),
+        "order_list_id": msg["g"],
+        "execution_type": msg["x"],
+        "order_status": msg["X"],
+        "reject_reason": msg["r"],
+        "order_id": msg["i"],
+        "last_executed_quantity": float(msg["l"]),
+        "cumulative_filled_quantity": float(msg["z"]),
+        "last_executed_price": float(msg["L"]),
+        "commission": float(msg["n"]),
+        "commission_asset": msg["N"],
+        "transaction_time_ms": msg["T"],
+        "trade_id": msg["t"],
+        "cumulative_quote_quantity": float(msg["Z"]),
+        "last_quote_quantity": float(msg["Y"])
+    }
+
+
 def format_historical_candle(candle):
     """Rewrites a candle into a more readable format.
 
@@ -101,3 +186,64 @@ def calculate_start_date(time_span, time_unit):
         return datetime.utcnow() - timedelta(minutes=time_span)
     elif time_unit == "h":
         return datetime.utcnow() - timedelta(hours=time_span)
+
+
+def interval_to_milliseconds(interval):
+    """Converts a candle interval into milliseconds.
+
+    Args:
+        interval (str): Candle interval, e.g. "1m", "4h", "1d", "1w".
+
+    Returns:
+        int: Length of the interval in ms.
+    """
+    unit_ms = {"s": 1000, "m": 60 * 1000, "h": 60 * 60 * 1000, "d": 24 * 60 * 60 * 1000, "w": 7 * 24 * 60 * 60 * 1000}
+    return int(interval[:-1]) * unit_ms[interval[-1]]
+
+
+def candle_order_key(candle):
+    """Gets a key which orders closed candles and bars, and tells apart bars which start in the same ms.
+
+    Several tick, volume or dollar bars can start in the same ms, so the bar number set by the BarBuilder breaks the
+    tie. Time candles do not have one and are ordered by their start time.
+
+    Args:
+        candle (dict): Human readable closed candle or bar.
+
+    Returns:
+        tuple: Start time and bar number (0 for time candles).
+    """
+    return candle["candle_start_time_ms"], candle.get("bar_number", 0)
+
+
+def strategy_lookback(strategy):
+    """Gets the candle history a strategy declares it needs.
+
+    Args:
+        strategy (Strategy): The strategy, optionally with lookback and converged_lookback methods.
+
+    Returns:
+        int: Minimum number of closed candles (None if not declared).
+        int: Number of closed candles for converged indicators, at least the minimum (None if not declared).
+    """
+    minimum = strategy.lookback() if hasattr(strategy, "lookback") else None
+    converged = strategy.converged_lookback() if hasattr(strategy, "converged_lookback") else minimum
+    if minimum is not None and converged is not None:
+        converged = max(minimum, converged)
+    return minimum, converged
+
+
+def candle_buffer_length(strategy, max_candles):
+    """Gets the number of closed candles to fetch and keep for a strategy.
+
+    Args:
+        strategy (Strategy): The strategy the candles are for.
+        max_candles (int): The configured buffer length, 0 to size the buffer from the strategy's converged lookback.
+
+    Returns:
+        int: Candle buffer length.
+    """
+    if max_candles:
+        return max_candles
+    minimum, converged = strategy_lookback(strategy)
+    return converged or DEFAULT_MAX_CANDLES
@@ -0,0 +1,294 @@
+"""Bulk importer for the Binance public kline dumps (https://data.binance.vision).
+
+The dumps are daily or monthly zip files containing one CSV in the same 12 column layout as the klines endpoint. They
+are parsed with NumPy in one pass per file and appended to a CandleArchive.
+
+Usage:
+    python -m wenmoon.kline_import BTCUSDT 1m 2021-01 2021-06 --source /path/to/zips --archive-dir candles
+    python -m wenmoon.kline_import BTCUSDT 1m 2021-01 2021-06 --source https://data.binance.vision
+"""
+import argparse
+import io
+import functools
+import itertools
+import os
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from wenmoon.CandleArchive import CandleArchive, CANDLE_DTYPE
+from wenmoon.bot_utils import interval_to_milliseconds
+
+MIRROR_URL = "https://data.binance.vision"
+
+# Column positions in the kline CSV for each archive field (column 11 is unused)
+CSV_COLUMNS = {
+    "candle_start_time_ms": 0,
+    "open_price": 1,
+    "high_price": 2,
+    "low_price": 3,
+    "close_price": 4,
+    "volume": 5,
+    "candle_close_time_ms": 6,
+    "quote_asset_volume": 7,
+    "number_of_trades": 8,
+    "taker_buy_base_asset_volume": 9,
+    "taker_buy_quote_asset_volume": 10
+}
+
+# Number of columns in a kline CSV row
+CSV_COLUMN_COUNT = 12
+
+# Timestamps above this are in microseconds (dumps from 2025 onwards), below it they are in milliseconds
+MICROSECOND_THRESHOLD = 10 ** 14
+
+
+def month_range(start_month, end_month):
+    """Lists the months between two months, inclusive.
+
+    Args:
+        start_month (str): First month, e.g. "2021-01".
+        end_month (str): Last month, e.g. "2021-06".
+
+    Returns:
+        list of str: Months in "YYYY-MM" format.
+    """
+    year, month = map(int, start_month.split("-"))
+    end_year, end = map(int, end_month.split("-"))
+    months = []
+    while (year, month) <= (end_year, end):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def dump_name(symbol, interval, period):
+    """Gets the file name of a kline dump.
+
+    Args:
+        symbol (str): The symbol pair, e.g. "BTCUSDT".
+        interval (str): The candle interval, e.g. "1m".
+        period (str): "YYYY-MM" for a monthly dump or "YYYY-MM-DD" for a daily dump.
+
+    Returns:
+        str: The zip file name.
+    """
+    return f"{symbol}-{interval}-{period}.zip"
+
+
+def read_dump(source, symbol, interval, period):
+    """Reads the raw bytes of a kline dump from a local directory or an HTTP mirror.
+
+    Args:
+        source (str): Local directory, or base url of a mirror with the data.binance.vision layout.
+        symbol (str): The symbol pair, e.g. "BTCUSDT".
+        interval (str): The candle interval, e.g. "1m".
+        period (str): "YYYY-MM" for a monthly dump or "YYYY-MM-DD" for a daily dump.
+
+    Returns:
+        bytes: The zip file contents, or None if the dump does not exist.
+    """
+    name = dump_name(symbol, interval, period)
+
+    if source.startswith(("http://", "https://")):
+        frequency = "daily" if period.count("-") == 2 else "monthly"
+        url = f"{source.rstrip('/')}/data/spot/{frequency}/klines/{symbol}/{interval}/{name}"
+        try:
+            with urllib.request.urlopen(url) as response:
+                return response.read()
+        except urllib.error.HTTPError as err:
+            if err.code == 404:
+                return None
+            raise
+
+    path = os.path.join(source, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as dump_file:
+        return dump_file.read()
+
+
+def parse_kline_csv(data, name="kline CSV"):
+    """Parses a kline CSV into archive records in one vectorised pass.
+
+    The fields are split as bytes and converted by NumPy in one astype() call, rather than with float() each.
+    Timestamps are below 2^53, so they survive the round trip through float64 exactly.
+
+    Args:
+        data (bytes): CSV contents, with or without a header line.
+        name (str): File name for error messages.
+
+    Returns:
+        numpy.ndarray: Structured array with CANDLE_DTYPE.
+
+    Raises:
+        ValueError: If a row does not have CSV_COLUMN_COUNT numeric columns.
+    """
+    data = data.replace(b"\r", b"").strip()
+    # Newer dumps start with a header line
+    if data[:1] and not data[:1].isdigit():
+        data = data[data.index(b"\n") + 1:] if b"\n" in data else b""
+
+    rows = data.count(b"\n") + 1 if data else 0
+    fields = data.replace(b"\n", b",").split(b",") if data else []
+    try:
+        values = np.array(fields, dtype=np.bytes_).astype(np.float64)
+    except ValueError as err:
+        raise ValueError(f"{name} is malformed: {err}") from None
+    if len(values) != rows * CSV_COLUMN_COUNT:
+        raise ValueError(f"{name} is malformed: expected {rows} rows of {CSV_COLUMN_COUNT} numeric columns, "
+                         f"got {len(values)} values")
+    columns = values.reshape(-1, CSV_COLUMN_COUNT)
+
+    records = np.empty(len(columns), dtype=CANDLE_DTYPE)
+    for field, column in CSV_COLUMNS.items():
+        records[field] = columns[:, column]
+
+    # Normalise microsecond timestamps to milliseconds
+    for field in ("candle_start_time_ms", "candle_close_time_ms"):
+        if len(records) and records[field][0] > MICROSECOND_THRESHOLD:
+            records[field] //= 1000
+
+    return records
+
+
+def parse_dump(zip_data):
+    """Parses every CSV inside a kline dump.
+
+    Args:
+        zip_data (bytes): The zip file contents.
+
+    Returns:
+        numpy.ndarray: Structured array with CANDLE_DTYPE.
+    """
+    with zipfile.ZipFile(io.BytesIO(zip_data)) as dump:
+        parts = [parse_kline_csv(dump.read(name), name) for name in dump.namelist() if name.endswith(".csv")]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=CANDLE_DTYPE)
+
+
+def check_continuity(records, interval_ms):
+    """Sorts the records, removes duplicates and reports gaps.
+
+    Args:
+        records (numpy.ndarray): Structured array with CANDLE_DTYPE.
+        interval_ms (int): Candle interval in ms.
+
+    Returns:
+        numpy.ndarray: Sorted records with duplicate start times removed.
+        int: Number of duplicates removed.
+        list of tuple: (start_ms, end_ms) of each gap, end_ms being the start time of the next available candle.
+    """
+    start_times, index = np.unique(records["candle_start_time_ms"], return_index=True)
+    duplicates = len(records) - len(index)
+    records = records[index]
+
+    gap_positions = np.nonzero(np.diff(start_times) != interval_ms)[0]
+    gaps = [(int(start_times[i]) + interval_ms, int(start_times[i + 1])) for i in gap_positions]
+
+    return records, duplicates, gaps
+
+
+def load_period(source, symbol, interval, period):
+    """Downloads (or reads) and parses the kline dump for one period.
+
+    Args:
+        source (str): Local directory, or base url of a mirror with the data.binance.vision layout.
+        symbol (str): The symbol pair, e.g. "BTCUSDT".
+        interval (str): The candle interval, e.g. "1m".
+        period (str): "YYYY-MM" or "YYYY-MM-DD" period to load.
+
+    Returns:
+        numpy.ndarray: Structured array with CANDLE_DTYPE, or None if the dump does not exist.
+        float: Time taken to parse the dump in seconds.
+    """
+    zip_data = read_dump(source, symbol, interval, period)
+    if zip_data is None:
+        return None, 0.0
+    started = time.perf_counter()
+    records = parse_dump(zip_data)
+    return records, time.perf_counter() - started
+
+
+def import_klines(source, archive, symbol, interval, periods, workers=None):
+    """Imports kline dumps into a candle archive.
+
+    Dumps are downloaded and parsed in a process pool, one dump per task, and appended to the archive in time order.
+    At most one dump per worker is submitted ahead of the one being appended, so memory use is bounded by the
+    dumps in flight rather than the whole history.
+
+    Args:
+        source (str): Local directory, or base url of a mirror with the data.binance.vision layout.
+        archive (CandleArchive): Archive to append to.
+        symbol (str): The symbol pair, e.g. "BTCUSDT".
+        interval (str): The candle interval, e.g. "1m".
+        periods (list of str): "YYYY-MM" or "YYYY-MM-DD" periods to import, in time order.
+        workers (int): Number of worker processes, defaults to the number of CPUs.
+
+    Returns:
+        int: Number of candles written.
+    """
+    interval_ms = interval_to_milliseconds(interval)
+    load = functools.partial(load_period, source, symbol, interval)
+    workers = workers or os.cpu_count() or 1
+    total = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        remaining = iter(periods)
+        in_flight = deque((period, executor.submit(load, period)) for period in itertools.islice(remaining, workers))
+        while in_flight:
+            period, future = in_flight.popleft()
+            records, parse_time = future.result()
+            # Keep the workers busy with the next dump while this one is appended
+            for next_period in itertools.islice(remaining, 1):
+                in_flight.append((next_period, executor.submit(load, next_period)))
+
+            if records is None:
+                print(f"{dump_name(symbol, interval, period)} not found, skipping")
+                continue
+
+            records, duplicates, gaps = check_continuity(records, interval_ms)
+
+            # A gap between the end of the archive and this dump counts as well
+            if archive.last_start_time_ms >= 0 and len(records):
+                expected = archive.last_start_time_ms + interval_ms
+                if records["candle_start_time_ms"][0] > expected:
+                    gaps.insert(0, (expected, int(records["candle_start_time_ms"][0])))
+
+            written = archive.extend(records)
+            total += written
+
+            print(f"{period}: {len(records)} candles parsed, {written} written, {duplicates} duplicates, "
+                  f"{len(gaps)} gaps ({len(records) / max(parse_time, 1e-9):,.0f} rows/s per worker)")
+            for gap_start, gap_end in gaps:
+                print(f"  gap: {(gap_end - gap_start) // interval_ms} candles missing from {gap_start} to {gap_end}")
+
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import Binance public kline dumps into the candle archive.")
+    parser.add_argument("symbol", help="Symbol pair, e.g. BTCUSDT")
+    parser.add_argument("interval", help="Candle interval, e.g. 1m")
+    parser.add_argument("start", help="First month (YYYY-MM)")
+    parser.add_argument("end", help="Last month (YYYY-MM)")
+    parser.add_argument("--source", default=MIRROR_URL, help="Directory of zip files or url of a mirror")
+    parser.add_argument("--archive-dir", default="candles", help="Candle archive directory")
+    parser.add_argument("--workers", type=int, default=None, help="Number of parser processes (default: CPUs)")
+    args = parser.parse_args()
+
+    archive = CandleArchive(args.archive_dir, args.symbol, args.interval)
+    periods = month_range(args.start, args.end)
+    try:
+        total = import_klines(args.source, archive, args.symbol, args.interval, periods, args.workers)
+    finally:
+        archive.close()
+    print(f"Imported {total} candles into {archive.path}")
+
+
+if __name__ == "__main__":
+    main()
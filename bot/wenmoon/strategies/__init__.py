@@ -1,15 +1,97 @@
 import importlib
-import os
+import pkgutil
+
+# Strategy modules in this package are named <name>_strategy.py
+STRATEGY_SUFFIX = "_strategy"
+
+# Entry point group for strategies installed from other packages, e.g. in setup.cfg:
+# [options.entry_points]
+# wenmoon.strategies =
+#     my_strategy = my_package.my_module:Strategy
+ENTRY_POINT_GROUP = "wenmoon.strategies"
+
+_strategies = {}
+_entry_points = None
+
+
+def _get_entry_points():
+    """Gets the strategy entry points of installed packages, read once and cached.
+
+    Returns:
+        dict: Entry point for each strategy name.
+    """
+    global _entry_points
+    if _entry_points is None:
+        # Imported here as it is slow to import, and only needed for strategies which are not built-in
+        import importlib.metadata
+        entry_points = importlib.metadata.entry_points()
+        if hasattr(entry_points, "select"):
+            group = entry_points.select(group=ENTRY_POINT_GROUP)
+        else:
+            group = entry_points.get(ENTRY_POINT_GROUP, [])
+        _entry_points = {entry_point.name: entry_point for entry_point in group}
+    return _entry_points
+
+
+def available_strategies():
+    """Lists the names of the built-in strategies and the strategies installed through entry points.
+
+    Returns:
+        list of str: Strategy names, e.g. "macd_rsi".
+    """
+    names = {
+        module.name[:-len(STRATEGY_SUFFIX)] for module in pkgutil.iter_modules(__path__)
+        if module.name.endswith(STRATEGY_SUFFIX)
+    }
+    return sorted(names | set(_get_entry_points()))
 
 
 def get_strategy(name):
-    for dirpath, _, filenames in os.walk(os.path.dirname(__file__)):
-        filename: str
-        for filename in filenames:
-            if filename.endswith("_strategy.py"):
-                if filename.replace("_strategy.py", "") == name:
-                    spec = importlib.util.spec_from_file_location(name, os.path.join(dirpath, filename))
-                    module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
-                    return module.Strategy
-    return None
\ No newline at end of file
+    """Gets a strategy class by name.
+
+    Built-in strategies are imported directly as wenmoon.strategies.<name>_strategy, so the package directory is
+    not searched. Names which are not built-in are looked up in the "wenmoon.strategies" entry points. Each class is
+    imported once and cached.
+
+    Args:
+        name (str): The strategy name, e.g. "macd_rsi".
+
+    Returns:
+        class: The Strategy class.
+    """
+    if name in _strategies:
+        return _strategies[name]
+
+    module_name = f"{__name__}.{name}{STRATEGY_SUFFIX}"
+    try:
+        strategy = importlib.import_module(module_name).Strategy
+    except ModuleNotFoundError as err:
+        # Only fall back to the entry points if the strategy module itself is missing, not one of its imports
+        if err.name != module_name:
+            raise
+        entry_point = _get_entry_points().get(name)
+        if entry_point is None:
+            raise ValueError(f"Unknown strategy {name}, required one of {available_strategies()}") from None
+        strategy = entry_point.load()
+
+    _strategies[name] = strategy
+    return strategy
+
+
+def create_strategy(config, symbol_info):
+    """Creates the strategy set in a configuration, with its parameters, for a symbol.
+
+    Strategies which declare HAS_MEMBERS (e.g. the ensemble) also get the parameters of their members, from the
+    [strategy_parameters:<member>] sections.
+
+    Args:
+        config (Config): The configuration with the strategy and its parameters.
+        symbol_info (dict): Information about the symbol being traded.
+
+    Returns:
+        Strategy: The new strategy.
+    """
+    strategy = get_strategy(config.strategy)
+    if getattr(strategy, "HAS_MEMBERS", False):
+        return strategy(symbol_info, member_parameters=config.member_parameters, **config.strategy_parameters)
+    return strategy(symbol_info, **config.strategy_parameters)
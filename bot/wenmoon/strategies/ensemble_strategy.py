@@ -0,0 +1,372 @@
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from wenmoon.bot_utils import candle_order_key
+from wenmoon.strategies.strategy_utils import CandleFrame, Parameter, StrategyParameters
+
+# Score of each member action, positions reported by older strategies count as the matching action
+ACTION_SCORES = {"buy": 1, "long": 1, "sell": -1, "short": -1}
+
+EXECUTORS = ("thread", "process", "none")
+
+# Number of times in a row the worker process of a member is restarted before the ensemble gives up
+MAX_WORKER_RESTARTS = 3
+
+
+def _split(value):
+    """Splits a comma separated parameter into a list of stripped, non-empty items."""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# Thread pool shared by the thread members of every ensemble in the process, and the number of ensembles using it
+_thread_pool = None
+_thread_pool_users = 0
+_thread_pool_lock = threading.Lock()
+
+
+def _acquire_thread_pool():
+    """Gets the shared thread pool, creating it for the first ensemble which uses it.
+
+    Returns:
+        ThreadPoolExecutor: The shared pool.
+    """
+    global _thread_pool, _thread_pool_users
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(thread_name_prefix="ensemble")
+        _thread_pool_users += 1
+        return _thread_pool
+
+
+def _release_thread_pool():
+    """Stops using the shared thread pool, shutting it down once no ensemble uses it."""
+    global _thread_pool, _thread_pool_users
+    with _thread_pool_lock:
+        _thread_pool_users -= 1
+        if _thread_pool_users == 0 and _thread_pool is not None:
+            _thread_pool.shutdown(wait=False)
+            _thread_pool = None
+
+
+def _run_member_worker(connection, strategy):
+    """Keeps a member strategy and its candle buffer in a worker process, scouting each batch of new candles.
+
+    Each message is (reset, new_candles, max_candles), the candles are added to the buffer (cleared first if reset)
+    and the action, or the error raised by scout, is sent back. None ends the worker.
+
+    Args:
+        connection (multiprocessing.connection.Connection): The worker end of the pipe.
+        strategy (Strategy): The member strategy, with a scout method.
+    """
+    candles = deque()
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        reset, new_candles, max_candles = message
+        if reset:
+            candles.clear()
+        candles.extend(new_candles)
+        while len(candles) > max_candles:
+            candles.popleft()
+        try:
+            connection.send(strategy.scout(list(candles)))
+        except Exception as err:
+            connection.send(err)
+    connection.close()
+
+
+class MemberProcessError(RuntimeError):
+    """Raised when the worker process of a member keeps stopping, so the ensemble cannot vote as configured."""
+
+
+class MemberProcess:
+    """Runs a member strategy in its own worker process, which keeps the member and its candles between calls.
+
+    Only the candles the worker has not seen are sent on each call, so neither the candle buffer nor the strategy is
+    pickled every candle, and any state the member keeps stays in the worker.
+
+    A worker which stops (e.g. killed or out of memory) is restarted from the original member and sent the whole
+    candle buffer again. After MAX_WORKER_RESTARTS restarts in a row a MemberProcessError is raised.
+
+    Attributes:
+        name (str): Name of the member, for the worker process name.
+        strategy (Strategy): The member as it was created, copied into each worker.
+        last_candle_key (tuple): candle_order_key of the newest candle sent to the worker (None before the first).
+        candles (list of dict): Candles of the call in progress, sent again if the worker is restarted.
+        send_error (Exception): Error from sending the call in progress to the worker (None if it was sent).
+        restarts (int): Number of restarts since the worker last returned an action.
+    """
+
+    def __init__(self, strategy, name):
+        """Starts the worker process.
+
+        Args:
+            strategy (Strategy): The member strategy, copied into the worker.
+            name (str): Name of the member.
+        """
+        self.name = name
+        self.strategy = strategy
+        self.candles = []
+        self.send_error = None
+        self.restarts = 0
+        self.start_worker()
+
+    def start_worker(self):
+        """Starts a worker process with a fresh copy of the member and an empty candle buffer."""
+        self.last_candle_key = None
+        self._connection, worker_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_run_member_worker, args=(worker_connection, self.strategy),
+                                                name=f"ensemble-{self.name}", daemon=True)
+        self._process.start()
+        worker_connection.close()
+
+    def restart_worker(self, err):
+        """Replaces a worker which stopped.
+
+        Args:
+            err (Exception): The error which showed the worker had stopped.
+
+        Raises:
+            MemberProcessError: If the worker was already restarted MAX_WORKER_RESTARTS times in a row.
+        """
+        self.restarts += 1
+        if self.restarts > MAX_WORKER_RESTARTS:
+            raise MemberProcessError(f"Worker process of ensemble member {self.name} stopped "
+                                     f"{self.restarts} times in a row: {err!r}")
+        print(f"Worker process of ensemble member {self.name} stopped ({err!r}), restarting it")
+        self.close()
+        self.start_worker()
+
+    def send(self, historical_candles):
+        """Sends the candles the worker has not seen yet.
+
+        Args:
+            historical_candles (list of dict): Historical market candles for the selected trading symbol
+
+        Returns:
+            Exception: The error if the worker could not be reached, None if the candles were sent.
+        """
+        first_new = len(historical_candles)
+        while first_new > 0 and (self.last_candle_key is None or
+                                 candle_order_key(historical_candles[first_new - 1]) > self.last_candle_key):
+            first_new -= 1
+        # Start again from the full buffer when it no longer joins up with what the worker has, e.g. after a refetch
+        reset = first_new == 0 or candle_order_key(historical_candles[first_new - 1]) != self.last_candle_key
+        if reset:
+            first_new = 0
+        self.last_candle_key = candle_order_key(historical_candles[-1]) if historical_candles else None
+        try:
+            self._connection.send((reset, list(historical_candles[first_new:]), len(historical_candles)))
+        except OSError as err:
+            return err
+        return None
+
+    def submit(self, historical_candles):
+        """Sends the candles the worker has not seen yet and starts it scouting.
+
+        Args:
+            historical_candles (list of dict): Historical market candles for the selected trading symbol
+        """
+        self.candles = historical_candles
+        self.send_error = self.send(historical_candles)
+
+    def result(self):
+        """Waits for the action of the call started by submit, restarting the worker if it has stopped.
+
+        Returns:
+            string: The action recommended by the member.
+
+        Raises:
+            MemberProcessError: If the worker keeps stopping.
+        """
+        while True:
+            err = self.send_error
+            if err is None:
+                try:
+                    result = self._connection.recv()
+                    break
+                except (EOFError, OSError) as recv_err:
+                    err = recv_err
+            self.restart_worker(err)
+            self.send_error = self.send(self.candles)
+
+        self.restarts = 0
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def __reduce__(self):
+        """Refuses to be pickled, the worker only lives as long as this process (e.g. it is left out of snapshots)."""
+        raise TypeError(f"The worker process of ensemble member {self.name} cannot be pickled")
+
+    def close(self):
+        """Stops the worker process."""
+        try:
+            self._connection.send(None)
+        except OSError:
+            pass
+        self._connection.close()
+        self._process.join(timeout=1)
+        if self._process.is_alive():
+            self._process.terminate()
+
+
+class Strategy:
+    """Runs several strategies on the same candles and combines their actions by weighted vote.
+
+    Every member scouts the same CandleFrame, a view of the Bot's candle list, so columns and indicators requested
+    through get_indicator are extracted and calculated once for all members. Members are evaluated concurrently:
+
+    - "thread" members run in a thread pool shared by every ensemble in the process, best for members whose work is
+      in NumPy (which releases the GIL),
+    - "process" members each run in their own worker process (see MemberProcess), best for pure Python members. The
+      worker keeps the member and its candles, so it only receives the new candles and does not share the frame
+      cache,
+    - "none" members run in the calling thread.
+
+    Each member gets the parameters of its [strategy_parameters:<member>] section. close() releases the thread pool
+    and stops the worker processes, the StrategyRunner calls it when the strategy is replaced.
+
+    Each member action scores +1 (buy) or -1 (sell), times its weight. The ensemble buys when the weighted average
+    score reaches the threshold and sells when it reaches -threshold, so with equal weights and a threshold of 0.5 a
+    strict majority is needed. A member which fails counts as "none", but a process member whose worker keeps stopping
+    raises MemberProcessError.
+
+    Attributes:
+        parameters (StrategyParameters): Parameter values for this instance.
+        members (list of Strategy): The member strategies.
+        names (list of str): Name of each member, for logging.
+        weights (list of float): Weight of each member.
+        executors (list of str): Executor for each member (options: "thread", "process", "none").
+        processes (dict): MemberProcess of each "process" member, by member index.
+    """
+    # Tells create_strategy to pass the [strategy_parameters:<member>] overrides
+    HAS_MEMBERS = True
+
+    PARAMETERS = (
+        Parameter("members", str, "macd_rsi,rsi_simple", description="Comma separated member strategy names"),
+        Parameter("weights", str, "", description="Comma separated member weights above 0 (empty for equal weights)"),
+        Parameter("executors", str, "", description="Comma separated executor per member (empty for all thread)"),
+        Parameter("threshold", float, 0.5, minimum=0, maximum=1, description="Weighted score needed to act")
+    )
+
+    def __init__(self, symbol_info, member_strategies=None, member_parameters=None, **parameters):
+        """Initialise the ensemble.
+
+        Args:
+            symbol_info (dict): Information about the symbol being traded.
+            member_strategies (list of Strategy): Member instances to use instead of the members parameter, e.g. several
+                differently tuned instances of one strategy.
+            member_parameters (dict): Parameter values for each member strategy, by member name.
+            **parameters: Values to use instead of the PARAMETERS defaults.
+        """
+        # Imported here as the registry lives in the package this module belongs to
+        from wenmoon.strategies import get_strategy
+
+        self.symbol_info = symbol_info
+        self.parameters = StrategyParameters(self.PARAMETERS, parameters)
+
+        if member_strategies is None:
+            self.names = _split(self.parameters.members)
+            member_parameters = member_parameters or {}
+            self.members = [get_strategy(name)(symbol_info, **member_parameters.get(name, {})) for name in self.names]
+        else:
+            self.names = [f"{type(member).__module__.split('.')[-1]}[{i}]"
+                          for i, member in enumerate(member_strategies)]
+            self.members = list(member_strategies)
+        if not self.members:
+            raise ValueError("The ensemble strategy needs at least one member")
+
+        self.weights = [float(weight) for weight in _split(self.parameters.weights)] or [1.0] * len(self.members)
+        self.executors = _split(self.parameters.executors) or ["thread"] * len(self.members)
+        if len(self.weights) != len(self.members) or len(self.executors) != len(self.members):
+            raise ValueError("The ensemble needs one weight and one executor per member")
+        if any(weight <= 0 for weight in self.weights):
+            raise ValueError("Ensemble weights must be above 0")
+        if any(executor not in EXECUTORS for executor in self.executors):
+            raise ValueError(f"Ensemble executor is invalid, required one of {EXECUTORS}")
+
+        self.thread_pool = _acquire_thread_pool() if "thread" in self.executors else None
+        self.processes = {i: MemberProcess(member, self.names[i])
+                          for i, (member, executor) in enumerate(zip(self.members, self.executors))
+                          if executor == "process"}
+
+    def close(self):
+        """Releases the shared thread pool and stops the worker processes, the ensemble cannot scout afterwards."""
+        if self.thread_pool is not None:
+            self.thread_pool = None
+            _release_thread_pool()
+        for process in self.processes.values():
+            process.close()
+        self.processes = {}
+
+    def lookback(self):
+        """Gets the number of closed candles scout needs, the most needed by any member.
+
+        Returns:
+            int: Minimum candle buffer length.
+        """
+        return max((member.lookback() for member in self.members if hasattr(member, "lookback")), default=0)
+
+    def converged_lookback(self):
+        """Gets the number of closed candles the members need for converged indicators, the most needed by any member.
+
+        Returns:
+            int: Recommended candle buffer length.
+        """
+        return max((getattr(member, "converged_lookback", member.lookback)() for member in self.members
+                    if hasattr(member, "lookback")), default=0)
+
+    def scout(self, historical_candles):
+        """Scouts every member concurrently and combines their actions.
+
+        Args:
+            historical_candles (list of dict): Historical market candles for the selected trading symbol
+
+        Returns:
+            string: The position chosen by the ensemble (options: "none", "buy", "sell")
+        """
+        frame = CandleFrame(historical_candles)
+
+        # Start the pooled members first, then run the inline members while they work
+        futures = {}
+        for i, (member, executor) in enumerate(zip(self.members, self.executors)):
+            if executor == "thread":
+                futures[i] = self.thread_pool.submit(member.scout, frame)
+            elif executor == "process":
+                self.processes[i].submit(historical_candles)
+
+        actions = []
+        for i, (member, executor) in enumerate(zip(self.members, self.executors)):
+            try:
+                if executor == "none":
+                    action = member.scout(frame)
+                elif executor == "process":
+                    action = self.processes[i].result()
+                else:
+                    action = futures[i].result()
+            except MemberProcessError:
+                raise
+            except Exception as err:
+                print(f"Ensemble member {self.names[i]} failed: {err!r}")
+                action = "none"
+            actions.append(action)
+
+        score = sum(weight * ACTION_SCORES.get(action, 0) for weight, action in zip(self.weights, actions))
+        score /= sum(self.weights)
+
+        action = "none"
+        if score > 0 and score >= self.parameters.threshold:
+            action = "buy"
+        elif score < 0 and score <= -self.parameters.threshold:
+            action = "sell"
+
+        print("Ensemble strategy data")
+        for name, weight, member_action in zip(self.names, self.weights, actions):
+            print(f"  {name} (weight {weight}): {member_action}")
+        print(f"  Weighted score = {score:.3f} (threshold {self.parameters.threshold})")
+
+        return action
@@ -1,3 +1,4 @@
+from wenmoon.SymbolFilters import SymbolFilters
 from wenmoon.strategies.strategy_utils import f_ema, f_macd, f_atr, f_ohlc4, get_candle_values_as_list
 
 # Parameters
@@ -12,6 +13,7 @@ class Strategy:
         self.long_stop_prev = None
         self.short_stop_prev = None
         self.symbol_info = symbol_info
+        self.min_tick_size = SymbolFilters(symbol_info).tick_size
 
     def scout(self, historical_candles):
         """Strategy function should be stored in scout function.
@@ -31,9 +33,6 @@ class Strategy:
         low_prices = get_candle_values_as_list(historical_candles, "low_price")
         volumes = get_candle_values_as_list(historical_candles, "volume")
 
-        # Get minimum ticker size
-        min_tick_size = next(r for r in self.symbol_info["filters"] if r["filterType"] == "PRICE_FILTER")["tickSize"]
-
         print(historical_candles)
 
 
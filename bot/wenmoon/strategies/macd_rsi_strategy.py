@@ -1,11 +1,41 @@
-from wenmoon.strategies.strategy_utils import f_macd, f_rsi, get_candle_values_as_list
+from wenmoon.strategies.strategy_utils import f_macd, f_rsi, get_candle_values_as_list, MacdState, RsiState, \
+    TriggerLevels, Parameter, StrategyParameters, get_indicator, ema_warm_up
 
-# Parameters
-RSI_WINDOW = 14
-FAST_WINDOW = 17
-SLOW_WINDOW = 37
-SIGNAL_WINDOW = 9
-RSI_CUTOFF = 35
+
+def get_action(previous_histogram, macd_line, macd_histogram, rsi, rsi_cutoff):
+    """Applies the buy and sell conditions to the newest indicator values.
+
+    Args:
+        previous_histogram (float): MACD histogram of the previous candle.
+        macd_line (float): MACD line of the newest candle.
+        macd_histogram (float): MACD histogram of the newest candle.
+        rsi (float): RSI of the newest candle.
+        rsi_cutoff (float): Only buy while the RSI is at or below this value.
+
+    Returns:
+        string: The position chosen by the strategy (options: "none", "buy", "sell")
+    """
+    if previous_histogram is None or macd_histogram is None or rsi is None:
+        return "none"
+    if previous_histogram > 0 and macd_histogram < 0 and macd_line > 0:
+        return "sell"
+    if previous_histogram < 0 and macd_histogram > 0 and rsi <= rsi_cutoff and macd_line < 0:
+        return "buy"
+    return "none"
+
+
+class IndicatorState:
+    """Persistent MACD and RSI state for the incremental strategy interface.
+
+    Attributes:
+        macd (MacdState): Incremental MACD of the close prices.
+        rsi (RsiState): Incremental RSI of the close prices.
+    """
+    __slots__ = ("macd", "rsi")
+
+    def __init__(self, parameters):
+        self.macd = MacdState(parameters.slow_window, parameters.fast_window, parameters.signal_window)
+        self.rsi = RsiState(parameters.rsi_window)
 
 
 class Strategy:
@@ -20,13 +50,52 @@ class Strategy:
         Initial testing in bot.
         Deploying on server.
 
+    Attributes:
+        parameters (StrategyParameters): Parameter values for this instance.
     """
+    PARAMETERS = (
+        Parameter("rsi_window", int, 14, minimum=2, description="RSI window"),
+        Parameter("fast_window", int, 17, minimum=1, description="MACD fast EMA window"),
+        Parameter("slow_window", int, 37, minimum=2, description="MACD slow EMA window"),
+        Parameter("signal_window", int, 9, minimum=1, description="MACD signal EMA window"),
+        Parameter("rsi_cutoff", float, 35, minimum=1, maximum=99, description="Only buy at or below this RSI")
+    )
+
+    def __init__(self, symbol_info, candles_type="normal", **parameters):
+        """Initialise the strategy.
 
-    def __init__(self, symbol_info, candles_type="normal"):
+        Args:
+            symbol_info (dict): Information about the symbol being traded.
+            candles_type (str): Candle type (options: "normal").
+            **parameters: Values to use instead of the PARAMETERS defaults.
+        """
         self.long_stop_prev = None
         self.short_stop_prev = None
         self.symbol_info = symbol_info
         self.candles_type = candles_type
+        self.parameters = StrategyParameters(self.PARAMETERS, parameters)
+        if self.parameters.fast_window >= self.parameters.slow_window:
+            raise ValueError("MACD fast_window must be shorter than slow_window")
+        self.indicators = None
+
+    def lookback(self):
+        """Gets the number of closed candles scout needs.
+
+        Returns:
+            int: Minimum candle buffer length.
+        """
+        parameters = self.parameters
+        # Two histogram values for the crossover, and one RSI value
+        return max(parameters.slow_window + parameters.signal_window, parameters.rsi_window + 1)
+
+    def converged_lookback(self):
+        """Gets the number of closed candles scout needs for its EMAs to be independent of where the buffer starts.
+
+        Returns:
+            int: Recommended candle buffer length.
+        """
+        # The RSI is a simple moving average, the signal EMA settles faster than the slow EMA
+        return self.lookback() + ema_warm_up(self.parameters.slow_window)
 
     def scout(self, historical_candles):
         """Strategy function should be stored in scout function.
@@ -46,18 +115,22 @@ class Strategy:
         low_prices = get_candle_values_as_list(historical_candles, "low_price")
         volumes = get_candle_values_as_list(historical_candles, "volume")
 
-        # Calculate rsi
-        rsi = f_rsi(close_prices, RSI_WINDOW)
+        parameters = self.parameters
+
+        # Calculate rsi (shared with other strategies on the same candle frame)
+        rsi = get_indicator(historical_candles, f_rsi, "close_price", parameters.rsi_window)
 
         # Calculte MACD indicator
-        macd_line, macd_signal, macd_histogram = f_macd(close_prices, SLOW_WINDOW, FAST_WINDOW, SIGNAL_WINDOW)
+        macd_line, macd_signal, macd_histogram = get_indicator(historical_candles, f_macd, "close_price",
+                                                               parameters.slow_window, parameters.fast_window,
+                                                               parameters.signal_window)
 
         # Set up conditions - Buy
         # Check MACD histogram has just changed from negative to positive
         buy_condition_1 = macd_histogram[-2] < 0 and macd_histogram[-1] > 0
 
         # Check rsi is below the cutoff
-        buy_condition_2 = rsi[-1] <= RSI_CUTOFF
+        buy_condition_2 = rsi[-1] <= parameters.rsi_cutoff
 
         # Check MACD line is below zero
         buy_condition_3 = macd_line[-1] < 0
@@ -86,7 +159,7 @@ class Strategy:
         print(f"  macd_histogram[-2] = {macd_histogram[-2]}")
         print(f"  macd_histogram[-1] = {macd_histogram[-1]}")
         print(f"  Condition 1 met?: {buy_condition_1}")
-        print(f"Buy condition 2: rsi[-1] <= {RSI_CUTOFF}")
+        print(f"Buy condition 2: rsi[-1] <= {parameters.rsi_cutoff}")
         print(f"  rsi[-1] = {rsi[-1]}")
         print(f"  Buy condition 2 met?: {buy_condition_2}")
         print("Buy condition 3: macd_line[-1] < 0")
@@ -101,3 +174,111 @@ class Strategy:
         print(f"  Sell condition 2 met?: {sell_condition_2}")
 
         return action
+
+    def new_state(self):
+        """Creates the persistent indicator state for the incremental interface.
+
+        Returns:
+            IndicatorState: Empty MACD and RSI state.
+        """
+        return IndicatorState(self.parameters)
+
+    def state_key(self):
+        """Gets the parameters the indicator state depends on, so the state can be kept when only others change.
+
+        Returns:
+            tuple: The indicator windows.
+        """
+        parameters = self.parameters
+        return parameters.slow_window, parameters.fast_window, parameters.signal_window, parameters.rsi_window
+
+    def warm_up(self, candle, state):
+        """Commits a historical candle to the indicator state.
+
+        Args:
+            candle (dict): Human readable closed candle.
+            state (IndicatorState): Persistent indicator state.
+        """
+        state.macd.update(candle["close_price"])
+        state.rsi.update(candle["close_price"])
+
+    def on_candle(self, candle, state):
+        """Incremental version of scout: commits a closed candle to the indicator state and checks the conditions.
+
+        Args:
+            candle (dict): Human readable closed candle.
+            state (IndicatorState): Persistent indicator state.
+
+        Returns:
+            string: The position chosen by the strategy (options: "none", "buy", "sell")
+        """
+        previous_histogram = state.macd.histogram
+        macd_line, macd_signal, macd_histogram = state.macd.update(candle["close_price"])
+        rsi = state.rsi.update(candle["close_price"])
+        return get_action(previous_histogram, macd_line, macd_histogram, rsi, self.parameters.rsi_cutoff)
+
+    def prime(self, historical_candles):
+        """Rebuilds the incremental indicator state used by peek from the committed candles.
+
+        Args:
+            historical_candles (list of dict): Historical market candles for the selected trading symbol
+        """
+        self.indicators = self.new_state()
+        for candle in historical_candles:
+            self.update(candle)
+
+    def update(self, candle):
+        """Commits a closed candle to the incremental indicator state used by peek.
+
+        Args:
+            candle (dict): The newest closed candle.
+        """
+        self.warm_up(candle, self.indicators)
+
+    def peek(self, candle):
+        """Evaluates the strategy as if the candle in progress closed now, without changing the committed state.
+
+        Uses the same conditions as scout, with the MACD and RSI updated in constant time instead of being
+        recalculated over the whole candle buffer.
+
+        Args:
+            candle (dict): The candle in progress.
+
+        Returns:
+            string: The position chosen by the strategy (options: "none", "buy", "sell")
+        """
+        macd, rsi = self.indicators.macd, self.indicators.rsi
+        macd_line, macd_signal, macd_histogram = macd.peek(candle["close_price"])
+        return get_action(macd.histogram, macd_line, macd_histogram, rsi.peek(candle["close_price"]),
+                          self.parameters.rsi_cutoff)
+
+    def trigger_levels(self):
+        """Solves the buy and sell conditions of peek for the close price of the candle in progress.
+
+        The MACD histogram and line are linear in the next close price and the RSI rises with it, so each condition
+        becomes a price bound:
+
+        - buy: histogram turns positive (price above the histogram zero), MACD line stays negative (price below the
+          line zero) and the RSI stays at or below the cutoff (price below the RSI cutoff price),
+        - sell: histogram turns negative (price below the histogram zero) and MACD line stays positive (price above
+          the line zero).
+
+        Returns:
+            TriggerLevels: Price bands for the candle in progress.
+        """
+        macd = self.indicators.macd
+        previous_histogram = macd.histogram
+        histogram_zero = macd.histogram_zero_price()
+        line_zero = macd.line_zero_price()
+        rsi_cutoff = self.indicators.rsi.price_for_rsi(self.parameters.rsi_cutoff)
+        if previous_histogram is None or histogram_zero is None or rsi_cutoff is None:
+            return TriggerLevels()
+
+        return TriggerLevels(
+            buy_above=histogram_zero,
+            buy_below=min(line_zero, rsi_cutoff),
+            sell_above=line_zero,
+            sell_below=histogram_zero,
+            can_buy=previous_histogram < 0,
+            can_sell=previous_histogram > 0
+        )
@@ -1,15 +1,34 @@
-from wenmoon.strategies.strategy_utils import f_ema, f_macd, f_atr, f_ohlc4, get_candle_values_as_list
-
-# Parameters
-MACD_WINDOW_SLOW = 37
-MACD_WINDOW_FAST = 17
-MACD_WINDOW_SIGNAL = 9
+from wenmoon.strategies.strategy_utils import f_ema, f_macd, f_atr, f_ohlc4, get_candle_values_as_list, \
+    Parameter, StrategyParameters, get_indicator, ema_warm_up
 
 
 class Strategy:
+    PARAMETERS = (
+        Parameter("macd_window_slow", int, 37, minimum=2, description="MACD slow EMA window"),
+        Parameter("macd_window_fast", int, 17, minimum=1, description="MACD fast EMA window"),
+        Parameter("macd_window_signal", int, 9, minimum=1, description="MACD signal EMA window")
+    )
 
-    def __init__(self, symbol_info):
+    def __init__(self, symbol_info, **parameters):
         self.symbol_info = symbol_info
+        self.parameters = StrategyParameters(self.PARAMETERS, parameters)
+
+    def lookback(self):
+        """Gets the number of closed candles scout needs.
+
+        Returns:
+            int: Minimum candle buffer length.
+        """
+        return self.parameters.macd_window_slow + self.parameters.macd_window_signal - 1
+
+    def converged_lookback(self):
+        """Gets the number of closed candles scout needs for its EMAs to be independent of where the buffer starts.
+
+        Returns:
+            int: Recommended candle buffer length.
+        """
+        # The signal EMA settles faster than the slow EMA
+        return self.lookback() + ema_warm_up(self.parameters.macd_window_slow)
 
     def scout(self, historical_candles):
         """Strategy function should be stored in scout function.
@@ -29,7 +48,8 @@ class Strategy:
         low_prices = get_candle_values_as_list(historical_candles, "low_price")
 
         # Get indicators
-        macd_hist = f_macd(close_prices, MACD_WINDOW_SLOW, MACD_WINDOW_FAST, MACD_WINDOW_SIGNAL)
+        macd_hist = get_indicator(historical_candles, f_macd, "close_price", self.parameters.macd_window_slow,
+                                  self.parameters.macd_window_fast, self.parameters.macd_window_signal)
 
         if macd_hist[-1] > 0:
             position = "long"
@@ -1,19 +1,40 @@
-from wenmoon.strategies.strategy_utils import f_ema, f_rsi, get_candle_values_as_list
-
-# Parameters
-FAST_WINDOW = 6
-MID_WINDOW = 12
-SLOW_WINDOW = 24
-EMA_WINDOW = 9
+from wenmoon.strategies.strategy_utils import f_ema, f_rsi, get_candle_values_as_list, Parameter, StrategyParameters, \
+    get_indicator, ema_warm_up
 
 
 class Strategy:
+    PARAMETERS = (
+        Parameter("fast_window", int, 6, minimum=2, description="Fast RSI window"),
+        Parameter("mid_window", int, 12, minimum=2, description="Medium RSI window"),
+        Parameter("slow_window", int, 24, minimum=2, description="Slow RSI window"),
+        Parameter("ema_window", int, 9, minimum=1, description="EMA window applied to each RSI")
+    )
 
-    def __init__(self, symbol_info, candles_type="normal"):
+    def __init__(self, symbol_info, candles_type="normal", **parameters):
         self.long_stop_prev = None
         self.short_stop_prev = None
         self.symbol_info = symbol_info
         self.candles_type = candles_type
+        self.parameters = StrategyParameters(self.PARAMETERS, parameters)
+
+    def lookback(self):
+        """Gets the number of closed candles scout needs.
+
+        Returns:
+            int: Minimum candle buffer length.
+        """
+        # Two slow RSI values, and a full EMA window over each RSI
+        slowest = max(self.parameters.fast_window, self.parameters.mid_window, self.parameters.slow_window)
+        return slowest + max(2, self.parameters.ema_window)
+
+    def converged_lookback(self):
+        """Gets the number of closed candles scout needs for its EMAs to be independent of where the buffer starts.
+
+        Returns:
+            int: Recommended candle buffer length.
+        """
+        # The RSIs are simple moving averages, only the EMAs over them need to settle
+        return self.lookback() + ema_warm_up(self.parameters.ema_window)
 
     def scout(self, historical_candles):
         """Strategy function should be stored in scout function.
@@ -34,14 +55,14 @@ class Strategy:
         volumes = get_candle_values_as_list(historical_candles, "volume")
 
         # Calculate fast, medium, slow rsi
-        rsi_fast = f_rsi(close_prices, FAST_WINDOW)
-        rsi_mid = f_rsi(close_prices, MID_WINDOW)
-        rsi_slow = f_rsi(close_prices, SLOW_WINDOW)
+        rsi_fast = get_indicator(historical_candles, f_rsi, "close_price", self.parameters.fast_window)
+        rsi_mid = get_indicator(historical_candles, f_rsi, "close_price", self.parameters.mid_window)
+        rsi_slow = get_indicator(historical_candles, f_rsi, "close_price", self.parameters.slow_window)
 
         # Calculte EMA for each RSI
-        ema_rsi_fast = f_ema(rsi_fast, EMA_WINDOW)
-        ema_rsi_mid = f_ema(rsi_mid, EMA_WINDOW)
-        ema_rsi_slow = f_ema(rsi_slow, EMA_WINDOW)
+        ema_rsi_fast = f_ema(rsi_fast, self.parameters.ema_window)
+        ema_rsi_mid = f_ema(rsi_mid, self.parameters.ema_window)
+        ema_rsi_slow = f_ema(rsi_slow, self.parameters.ema_window)
 
         # Calculate flags
         flag_a = rsi_slow[-1] > rsi_slow[-2]
@@ -1,16 +1,199 @@
-import numpy as np
+import math
+from collections import deque
+
+# NumPy is imported by the functions which use it, so loading a strategy which does not use it stays fast
+
+# Largest weight an EMA seed may keep in a converged EMA (see ema_warm_up)
+EMA_TOLERANCE = 0.001
+
+# Smallest RSI price_for_rsi solves for, as the relative strength of an RSI of 0 is 0 and cannot be divided by
+MIN_RSI = 1e-9
+
+
+class Parameter:
+    """Declaration of a typed strategy parameter.
+
+    Strategies list their parameters in a PARAMETERS class attribute, and read the values for an instance from
+    self.parameters, so differently tuned instances of the same strategy can run side by side.
+
+    Attributes:
+        name (str): Parameter name, also the keyword argument and config option used to override it.
+        type (type): Type the value is converted to (int, float, bool or str).
+        default: Default value.
+        minimum: Smallest allowed value (None for no limit).
+        maximum: Largest allowed value (None for no limit).
+        description (str): What the parameter controls.
+    """
+    __slots__ = ("name", "type", "default", "minimum", "maximum", "description")
+
+    def __init__(self, name, type, default, minimum=None, maximum=None, description=""):
+        self.name = name
+        self.type = type
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.description = description
+
+    def convert(self, value):
+        """Converts and validates a value for the parameter, e.g. a string from the config file.
+
+        Args:
+            value: The value to convert.
+
+        Returns:
+            The value converted to the parameter type.
+        """
+        if self.type is bool and isinstance(value, str):
+            value = value.strip().lower() in ("1", "yes", "true", "on")
+        else:
+            value = self.type(value)
+
+        if (self.minimum is not None and value < self.minimum) or (self.maximum is not None and value > self.maximum):
+            raise ValueError(f"Strategy parameter {self.name}={value} is outside the range {self.minimum} to "
+                             f"{self.maximum}")
+        return value
+
+
+class StrategyParameters:
+    """Parameter values for one strategy instance, read as attributes (e.g. self.parameters.fast_window).
+
+    Attributes:
+        values (dict): Value for each declared parameter.
+    """
+
+    def __init__(self, declarations, overrides=None):
+        """Resolves the parameter values from the declared defaults and any overrides.
+
+        Args:
+            declarations (tuple of Parameter): The parameters declared by the strategy.
+            overrides (dict): Values to use instead of the defaults, by parameter name.
+        """
+        overrides = dict(overrides or {})
+        unknown = set(overrides) - {parameter.name for parameter in declarations}
+        if unknown:
+            raise ValueError(f"Unknown strategy parameters {sorted(unknown)}, required some of "
+                             f"{[parameter.name for parameter in declarations]}")
+
+        self.values = {
+            parameter.name: parameter.convert(overrides.get(parameter.name, parameter.default))
+            for parameter in declarations
+        }
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["values"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return ", ".join(f"{name}={value}" for name, value in self.values.items())
+
+
+class CandleFrame:
+    """Read-only view of a candle list which caches columns and indicators, so several strategies can share them.
+
+    The frame wraps the candle list without copying it, and behaves like the list (len, indexing and iteration), so
+    it can be passed to scout unchanged. Each column is extracted once, and each indicator is calculated once per
+    set of arguments, however many strategies ask for it. Returned columns and indicators are shared, so they must
+    not be modified.
+
+    Attributes:
+        candles (list of dict): The wrapped candles.
+        columns (dict): Cached list of values for each candle key.
+        arrays (dict): Cached NumPy array for each candle key.
+        indicators (dict): Cached result for each (function, key, arguments).
+    """
+
+    def __init__(self, candles):
+        self.candles = candles
+        self.columns = {}
+        self.arrays = {}
+        self.indicators = {}
+
+    def __len__(self):
+        return len(self.candles)
+
+    def __getitem__(self, index):
+        return self.candles[index]
+
+    def __iter__(self):
+        return iter(self.candles)
+
+    def column(self, key):
+        """Gets the values of a key for every candle.
+
+        Args:
+            key (str): Candle key, e.g. "close_price".
+
+        Returns:
+            list: The shared column.
+        """
+        if key not in self.columns:
+            self.columns.setdefault(key, [candle[key] for candle in self.candles])
+        return self.columns[key]
+
+    def array(self, key):
+        """Gets the values of a key for every candle as a NumPy array.
+
+        Args:
+            key (str): Candle key, e.g. "close_price".
+
+        Returns:
+            numpy.ndarray: The shared column.
+        """
+        if key not in self.arrays:
+            import numpy as np
+            self.arrays.setdefault(key, np.array(self.column(key), dtype=np.float64))
+        return self.arrays[key]
+
+    def indicator(self, function, key, *args):
+        """Calculates an indicator on a column, or returns the cached result.
+
+        Args:
+            function (callable): Indicator function taking the column and then args, e.g. f_rsi.
+            key (str): Candle key of the column, e.g. "close_price".
+            *args: Further arguments for the function, e.g. the window.
+
+        Returns:
+            The shared indicator result.
+        """
+        cache_key = (function, key, args)
+        if cache_key not in self.indicators:
+            # Threads asking for the same indicator at once may both calculate it, but only one result is kept
+            self.indicators.setdefault(cache_key, function(self.column(key), *args))
+        return self.indicators[cache_key]
+
+
+def get_indicator(candles, function, key, *args):
+    """Calculates an indicator on a candle column, shared with other strategies when candles is a CandleFrame.
+
+    Args:
+        candles (list of dict or CandleFrame): Candles (human readable format).
+        function (callable): Indicator function taking the column and then args, e.g. f_rsi.
+        key (str): Candle key of the column, e.g. "close_price".
+        *args: Further arguments for the function, e.g. the window.
+
+    Returns:
+        The indicator result.
+    """
+    if isinstance(candles, CandleFrame):
+        return candles.indicator(function, key, *args)
+    return function(get_candle_values_as_list(candles, key), *args)
 
 
 def get_candle_values_as_list(candles, key):
     """Extracts all values from single key in a list of candles.
 
     Args:
-        candles (list of dict): Candles (human readable format).
+        candles (list of dict or CandleFrame): Candles (human readable format).
         key (str): Key to extract from the list of Klines.
 
     Returns:
-        list: The extracted value from each of the candles.
+        list: The extracted value from each of the candles (shared, for a CandleFrame).
     """
+    if isinstance(candles, CandleFrame):
+        return candles.column(key)
+
     result = []
     for candle in candles:
         result.append(candle[key])
@@ -29,6 +212,8 @@ def get_heikin_ashi_candles(open_prices, high_prices, low_prices, close_prices):
     Returns:
 
     """
+    import numpy as np
+
     open_ha = []
     low_ha = []
     high_ha = []
@@ -85,6 +270,8 @@ def subtract(list_1, list_2):
     Returns:
         list of float: result of list_1 - list_2
     """
+    import numpy as np
+
     offset = len(list_1) - len(list_2)
     return list(np.array(list_1[offset:]) - np.array(list_2))
 
@@ -147,6 +334,25 @@ def f_ema(close_prices, window):
     return ema
 
 
+def ema_warm_up(window, tolerance=EMA_TOLERANCE):
+    """Calculates how many values an EMA needs after its seed before the seed no longer matters.
+
+    f_ema seeds the EMA with the simple average of the first window values, and the weight of that seed shrinks by
+    (1 - 2 / (window + 1)) with each later value, so an EMA calculated over a longer history only agrees with this
+    one to within the tolerance after this many extra values (about 3.45 * (window + 1) for the default tolerance).
+
+    Args:
+        window (int): The EMA window.
+        tolerance (float): Largest acceptable weight of the seed.
+
+    Returns:
+        int: Number of values needed after the first window values.
+    """
+    if window <= 1:
+        return 0
+    return math.ceil(math.log(tolerance) / math.log(1 - 2 / (window + 1)))
+
+
 def f_macd(close_prices, window_slow, window_fast, window_signal):
     """Calculates moving average convergence divergence (MACD)
 
@@ -218,6 +424,8 @@ def f_ohlc4(open_prices, high_prices, low_prices, close_prices, window):
     Returns:
         list of float: Average OHLC values
     """
+    import numpy as np
+
     ohlc4 = []
     for i in range(window):
         ohlc4.append(np.average([
@@ -357,4 +565,293 @@ def f_rsi(close_prices, window, mode="sma"):
     return rsi
 
 
+class EmaState:
+    """Incremental exponential moving average, matching f_ema for a series fed from its first value.
+
+    The first value is the simple average of the first window values, as in f_ema, so the state is not ready until
+    window values have been added.
 
+    Attributes:
+        window (int): The moving window to take averages over.
+        smooth (float): Smoothing factor.
+        value (float): The EMA after the most recent committed value (None until ready).
+        count (int): Number of values committed.
+    """
+    __slots__ = ("window", "smooth", "value", "count", "seed_total")
+
+    def __init__(self, window):
+        self.window = window
+        self.smooth = 2.0/(window + 1.0)
+        self.value = None
+        self.count = 0
+        self.seed_total = 0.0
+
+    def peek(self, price):
+        """Gets the EMA if the price were added, without changing the state.
+
+        Args:
+            price (float): The next value in the series.
+
+        Returns:
+            float: The EMA including the price (None until ready).
+        """
+        if self.value is not None:
+            return price*self.smooth + self.value*(1.0-self.smooth)
+        if self.count + 1 == self.window:
+            return (self.seed_total + price)/self.window
+        return None
+
+    def update(self, price):
+        """Adds the next value in the series.
+
+        Args:
+            price (float): The next value in the series.
+
+        Returns:
+            float: The new EMA (None until ready).
+        """
+        value = self.peek(price)
+        if value is None:
+            self.seed_total += price
+        self.value = value
+        self.count += 1
+        return value
+
+
+class MacdState:
+    """Incremental moving average convergence divergence, matching f_macd for a series fed from its first value.
+
+    Attributes:
+        ema_slow (EmaState): Slow EMA of the close prices.
+        ema_fast (EmaState): Fast EMA of the close prices.
+        ema_signal (EmaState): EMA of the MACD line.
+        line (float): The most recent committed MACD line value (None until ready).
+        signal (float): The most recent committed MACD signal value (None until ready).
+        histogram (float): The most recent committed MACD histogram value (None until ready).
+    """
+    __slots__ = ("ema_slow", "ema_fast", "ema_signal", "line", "signal", "histogram")
+
+    def __init__(self, window_slow, window_fast, window_signal):
+        self.ema_slow = EmaState(window_slow)
+        self.ema_fast = EmaState(window_fast)
+        self.ema_signal = EmaState(window_signal)
+        self.line = None
+        self.signal = None
+        self.histogram = None
+
+    def peek(self, price):
+        """Gets the MACD values if the price were added, without changing the state.
+
+        Args:
+            price (float): The next close price.
+
+        Returns:
+            float: MACD line (None until ready).
+            float: MACD signal (None until ready).
+            float: MACD histogram (None until ready).
+        """
+        slow = self.ema_slow.peek(price)
+        if slow is None:
+            return None, None, None
+        line = self.ema_fast.peek(price) - slow
+        signal = self.ema_signal.peek(line)
+        if signal is None:
+            return line, None, None
+        return line, signal, line - signal
+
+    def line_offset(self):
+        """Gets the MACD line for the next close price p as slope * p + offset.
+
+        Returns:
+            float: Slope of the MACD line in p (positive, as the fast EMA reacts more than the slow one).
+            float: Offset of the MACD line.
+        """
+        fast, slow = self.ema_fast, self.ema_slow
+        return fast.smooth - slow.smooth, (1.0-fast.smooth)*fast.value - (1.0-slow.smooth)*slow.value
+
+    def line_zero_price(self):
+        """Solves for the next close price at which the MACD line is zero.
+
+        The line rises with the price, so it is positive above this price and negative below it.
+
+        Returns:
+            float: The price, or None until the signal is ready.
+        """
+        if self.ema_signal.value is None:
+            return None
+        slope, offset = self.line_offset()
+        return -offset/slope
+
+    def histogram_zero_price(self):
+        """Solves for the next close price at which the MACD histogram is zero.
+
+        The histogram is (1 - smooth) * (line - previous signal), so it crosses zero where the new MACD line equals the
+        previous signal value. It is positive above this price and negative below it.
+
+        Returns:
+            float: The price, or None until the signal is ready.
+        """
+        if self.ema_signal.value is None:
+            return None
+        slope, offset = self.line_offset()
+        return (self.ema_signal.value - offset)/slope
+
+    def update(self, price):
+        """Adds the next close price.
+
+        Args:
+            price (float): The next close price.
+
+        Returns:
+            float: MACD line (None until ready).
+            float: MACD signal (None until ready).
+            float: MACD histogram (None until ready).
+        """
+        self.line, self.signal, self.histogram = self.peek(price)
+        self.ema_fast.update(price)
+        self.ema_slow.update(price)
+        if self.line is not None:
+            self.ema_signal.update(self.line)
+        return self.line, self.signal, self.histogram
+
+
+class RsiState:
+    """Incremental relative strength index, matching f_rsi with the standard moving average mode.
+
+    Only the last window price changes are kept, so the result is the same as f_rsi over any candle buffer which
+    includes them.
+
+    Attributes:
+        window (int): The window / period to use in moving averages.
+        previous_price (float): The most recent committed close price.
+        up_moves (deque of float): The last window upward movements.
+        down_moves (deque of float): The last window downward movements.
+        value (float): The most recent committed RSI (None until ready).
+    """
+    __slots__ = ("window", "previous_price", "up_moves", "down_moves", "value")
+
+    def __init__(self, window):
+        self.window = window
+        self.previous_price = None
+        self.up_moves = deque(maxlen=window)
+        self.down_moves = deque(maxlen=window)
+        self.value = None
+
+    def peek(self, price):
+        """Gets the RSI if the price were added, without changing the state.
+
+        Args:
+            price (float): The next close price.
+
+        Returns:
+            float: The RSI including the price (None until ready).
+        """
+        if self.previous_price is None or len(self.up_moves) + 1 < self.window:
+            return None
+
+        change = price - self.previous_price
+        # The oldest movement drops out of the window when the new one is added
+        up_total = sum(self.up_moves) - (self.up_moves[0] if len(self.up_moves) == self.window else 0)
+        down_total = sum(self.down_moves) - (self.down_moves[0] if len(self.down_moves) == self.window else 0)
+        if change > 0:
+            up_total += change
+        else:
+            down_total -= change
+
+        if not down_total:
+            return 100.0
+        return 100 - (100/(up_total/down_total + 1))
+
+    def price_for_rsi(self, rsi):
+        """Solves for the next close price at which the RSI equals a value.
+
+        The RSI rises with the price, so it is above the value above this price and below it below this price.
+
+        Args:
+            rsi (float): Target RSI, between 0 and 100. An RSI of 0 is clamped to just above it, so without upward
+                movements in the window the price is the previous close and otherwise it is far below any real
+                price.
+
+        Returns:
+            float: The price, or None until ready and for an RSI of 100, which no single price reaches.
+        """
+        if self.previous_price is None or len(self.up_moves) + 1 < self.window or rsi >= 100:
+            return None
+        rsi = max(rsi, MIN_RSI)
+
+        # Totals of the movements which stay in the window when the next one is added
+        up_total = sum(self.up_moves) - (self.up_moves[0] if len(self.up_moves) == self.window else 0)
+        down_total = sum(self.down_moves) - (self.down_moves[0] if len(self.down_moves) == self.window else 0)
+
+        # RSI = target where the relative strength up_total / down_total equals this ratio
+        ratio = rsi/(100 - rsi)
+        if up_total <= ratio*down_total:
+            # Reached on an upward movement
+            return self.previous_price + ratio*down_total - up_total
+        # Reached on a downward movement
+        return self.previous_price - (up_total/ratio - down_total)
+
+    def update(self, price):
+        """Adds the next close price.
+
+        Args:
+            price (float): The next close price.
+
+        Returns:
+            float: The new RSI (None until ready).
+        """
+        self.value = self.peek(price)
+        if self.previous_price is not None:
+            change = price - self.previous_price
+            self.up_moves.append(change if change > 0 else 0)
+            self.down_moves.append(0 if change > 0 else -change)
+        self.previous_price = price
+        return self.value
+
+
+class TriggerLevels:
+    """Price bands, solved after a candle closes, in which the strategy signal flips on the candle in progress.
+
+    A strategy that publishes trigger levels lets the tick path replace a full evaluation with a couple of
+    comparisons. Bands are open intervals, None meaning unbounded on that side.
+
+    Attributes:
+        buy_above (float): Buy if the price is above this level.
+        buy_below (float): Buy if the price is below this level.
+        sell_above (float): Sell if the price is above this level.
+        sell_below (float): Sell if the price is below this level.
+        can_buy (bool): Whether a buy is possible on this candle.
+        can_sell (bool): Whether a sell is possible on this candle.
+    """
+    __slots__ = ("buy_above", "buy_below", "sell_above", "sell_below", "can_buy", "can_sell")
+
+    def __init__(self, buy_above=None, buy_below=None, sell_above=None, sell_below=None, can_buy=False,
+                 can_sell=False):
+        self.buy_above = buy_above
+        self.buy_below = buy_below
+        self.sell_above = sell_above
+        self.sell_below = sell_below
+        self.can_buy = can_buy and (buy_above is None or buy_below is None or buy_above < buy_below)
+        self.can_sell = can_sell and (sell_above is None or sell_below is None or sell_above < sell_below)
+
+    def check(self, price):
+        """Compares a live price with the levels.
+
+        Args:
+            price (float): The live price, i.e. the close price of the candle in progress.
+
+        Returns:
+            string: The action triggered by the price (options: "none", "buy", "sell")
+        """
+        if self.can_sell and (self.sell_above is None or price > self.sell_above) and \
+                (self.sell_below is None or price < self.sell_below):
+            return "sell"
+        if self.can_buy and (self.buy_above is None or price > self.buy_above) and \
+                (self.buy_below is None or price < self.buy_below):
+            return "buy"
+        return "none"
+
+    def __repr__(self):
+        buy = f"{self.buy_above} < price < {self.buy_below}" if self.can_buy else "never"
+        sell = f"{self.sell_above} < price < {self.sell_below}" if self.can_sell else "never"
+        return f"TriggerLevels(buy: {buy}, sell: {sell})"
@@ -1,20 +1,43 @@
-from wenmoon.strategies.strategy_utils import f_ema, f_macd, f_atr, f_ohlc4, get_candle_values_as_list
-
-# Parameters
-EMA_WINDOW = 10
-MACD_WINDOW_SLOW = 27
-MACD_WINDOW_FAST = 12
-MACD_WINDOW_SIGNAL = 7
-ATR_WINDOW = 20
-ATR_MULTIPLIER = 2.0
+from wenmoon.strategies.strategy_utils import f_ema, f_macd, f_atr, f_ohlc4, get_candle_values_as_list, \
+    Parameter, StrategyParameters, ema_warm_up
 
 
 class Strategy:
-
-    def __init__(self, symbol_info):
+    PARAMETERS = (
+        Parameter("ema_window", int, 10, minimum=1, description="EMA window"),
+        Parameter("macd_window_slow", int, 27, minimum=2, description="MACD slow EMA window"),
+        Parameter("macd_window_fast", int, 12, minimum=1, description="MACD fast EMA window"),
+        Parameter("macd_window_signal", int, 7, minimum=1, description="MACD signal EMA window"),
+        Parameter("atr_window", int, 20, minimum=1, description="ATR window, also the chandelier exit lookback"),
+        Parameter("atr_multiplier", float, 2.0, minimum=0, description="ATR multiplier for the chandelier exit")
+    )
+
+    def __init__(self, symbol_info, **parameters):
         self.long_stop_prev = None
         self.short_stop_prev = None
         self.symbol_info = symbol_info
+        self.parameters = StrategyParameters(self.PARAMETERS, parameters)
+
+    def lookback(self):
+        """Gets the number of closed candles scout needs.
+
+        Returns:
+            int: Minimum candle buffer length.
+        """
+        parameters = self.parameters
+        return max(parameters.macd_window_slow + parameters.macd_window_signal - 1, parameters.atr_window + 1)
+
+    def converged_lookback(self):
+        """Gets the number of closed candles scout needs for its EMAs to be independent of where the buffer starts.
+
+        Returns:
+            int: Recommended candle buffer length.
+        """
+        parameters = self.parameters
+        # The ATR is an EMA of the true range
+        return max(parameters.macd_window_slow + parameters.macd_window_signal - 1
+                   + ema_warm_up(parameters.macd_window_slow),
+                   parameters.atr_window + 1 + ema_warm_up(parameters.atr_window))
 
     def scout(self, historical_candles):
         """Strategy function should be stored in scout function.
@@ -33,10 +56,13 @@ class Strategy:
         high_prices = get_candle_values_as_list(historical_candles, "high_price")
         low_prices = get_candle_values_as_list(historical_candles, "low_price")
 
+        parameters = self.parameters
+
         # Get indicators
-        macd_hist = f_macd(close_prices, MACD_WINDOW_SLOW, MACD_WINDOW_FAST, MACD_WINDOW_SIGNAL)
-        atr = f_atr(high_prices, low_prices, close_prices, ATR_WINDOW) * ATR_MULTIPLIER
-        ohlc4 = f_ohlc4(open_prices, high_prices, low_prices, close_prices, ATR_WINDOW)
+        macd_hist = f_macd(close_prices, parameters.macd_window_slow, parameters.macd_window_fast,
+                           parameters.macd_window_signal)
+        atr = f_atr(high_prices, low_prices, close_prices, parameters.atr_window) * parameters.atr_multiplier
+        ohlc4 = f_ohlc4(open_prices, high_prices, low_prices, close_prices, parameters.atr_window)
 
         # Chandelier exit
         long_stop = max(ohlc4) - atr[-1]